@@ -0,0 +1,1137 @@
+"""Vectorised evaluation of carrier and defect concentrations.
+
+The functions in this module evaluate the same model as ``DefectSystem``,
+``DefectSpecies`` and ``DefectChargeState``, but over arrays of conditions
+(Fermi energy, temperature, formation energy shifts and fixed
+concentrations) so that many self-consistent Fermi energies can be found in a
+single call rather than one ``DefectSystem.get_sc_fermi()`` call per point.
+"""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from numpy.typing import ArrayLike
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from py_sc_fermi.dos import DOS, kboltz
+from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.defect_table import DefectTable, shared_table
+
+
+#: stride between the points solved first in a warm-started sweep
+WARM_START_STRIDE = 8
+
+
+class ChargeStateArrays(NamedTuple):
+    """Flat array representation of a list of ``DefectSpecies``.
+
+    Charge states are stored contiguously in species order, and in the order
+    of each ``DefectSpecies.charge_states`` dictionary. Missing values (an undefined
+    formation energy, or a concentration that is free to vary) are ``nan``.
+    """
+
+    species_names: Tuple[str, ...]
+    species_index: np.ndarray
+    charges: np.ndarray
+    energies: np.ndarray
+    degeneracies: np.ndarray
+    nsites: np.ndarray
+    species_fixed: np.ndarray
+    charge_state_fixed: np.ndarray
+
+    @property
+    def n_species(self) -> int:
+        return len(self.species_names)
+
+    @property
+    def n_charge_states(self) -> int:
+        return len(self.charges)
+
+
+def charge_state_arrays(defect_species: List[DefectSpecies]) -> ChargeStateArrays:
+    """build a ``ChargeStateArrays`` from a list of ``DefectSpecies``
+
+    Args:
+        defect_species (List[DefectSpecies]): defect species to tabulate
+
+    Returns:
+        ChargeStateArrays: flat array representation of ``defect_species``
+    """
+    table = shared_table(defect_species)
+    if table is not None:
+        return table_arrays(table, [ds.index for ds in defect_species])  # type: ignore
+    species_index, charges, energies, degeneracies, cs_fixed = [], [], [], [], []
+    for i, ds in enumerate(defect_species):
+        for q, cs in ds.charge_states.items():
+            species_index.append(i)
+            charges.append(q)
+            energies.append(np.nan if cs.energy is None else cs.energy)
+            degeneracies.append(cs.degeneracy)
+            cs_fixed.append(
+                np.nan if cs.fixed_concentration is None else cs.fixed_concentration
+            )
+    return ChargeStateArrays(
+        species_names=tuple(ds.name for ds in defect_species),
+        species_index=np.array(species_index, dtype=int),
+        charges=np.array(charges, dtype=float),
+        energies=np.array(energies, dtype=float),
+        degeneracies=np.array(degeneracies, dtype=float),
+        nsites=np.array([ds.nsites for ds in defect_species], dtype=float),
+        species_fixed=np.array(
+            [
+                np.nan if ds.fixed_concentration is None else ds.fixed_concentration
+                for ds in defect_species
+            ],
+            dtype=float,
+        ),
+        charge_state_fixed=np.array(cs_fixed, dtype=float),
+    )
+
+
+def table_arrays(
+    table: DefectTable, species: Optional[List[int]] = None
+) -> ChargeStateArrays:
+    """build a ``ChargeStateArrays`` from the columns of a ``DefectTable``
+
+    Args:
+        table (DefectTable): table of charge states
+        species (Optional[List[int]]): indices of the species to include, in
+          order. Defaults to ``None`` (every species in table order).
+
+    Returns:
+        ChargeStateArrays: flat array representation of the selected species
+    """
+    if species is None:
+        species = list(range(table.n_species))
+    rows = table.row_indices(species)
+    counts = [table.rows(i).stop - table.rows(i).start for i in species]
+    return ChargeStateArrays(
+        species_names=tuple(table.species_names[i] for i in species),
+        species_index=np.repeat(np.arange(len(species)), counts),
+        charges=table.charges[rows].astype(float),
+        energies=table.energies[rows],
+        degeneracies=table.degeneracies[rows],
+        nsites=table.nsites[species],
+        species_fixed=table.species_fixed_concentrations[species],
+        charge_state_fixed=table.fixed_concentrations[rows],
+    )
+
+
+class Conditions(NamedTuple):
+    """Per-point conditions for a batch of solves. Optional arrays are
+    ``None`` where every point uses the values in the ``ChargeStateArrays``.
+    """
+
+    temperature: np.ndarray
+    energy_shifts: Optional[np.ndarray] = None
+    species_fixed: Optional[np.ndarray] = None
+    charge_state_fixed: Optional[np.ndarray] = None
+
+    @property
+    def n_points(self) -> int:
+        return len(self.temperature)
+
+    def select(self, index: Union[slice, np.ndarray]) -> "Conditions":
+        """conditions for a subset of the points
+
+        Args:
+            index (Union[slice, np.ndarray]): points to select
+
+        Returns:
+            Conditions: conditions at the selected points
+        """
+        return Conditions(
+            self.temperature[index],
+            None if self.energy_shifts is None else self.energy_shifts[index],
+            None if self.species_fixed is None else self.species_fixed[index],
+            None if self.charge_state_fixed is None else self.charge_state_fixed[index],
+        )
+
+
+def charge_state_mask(arrays: ChargeStateArrays, key: Union[str, Tuple[str, int]]) -> np.ndarray:
+    """boolean mask selecting the charge states described by ``key``
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        key (Union[str, Tuple[str, int]]): either a species name, selecting
+          every charge state of that species, or a ``(name, charge)`` tuple
+          selecting a single charge state.
+
+    Raises:
+        ValueError: if ``key`` does not match any charge state
+
+    Returns:
+        np.ndarray: mask over the charge states
+    """
+    name, charge = key if isinstance(key, tuple) else (key, None)
+    if name not in arrays.species_names:
+        raise ValueError(f"{name} is not a defect species of this system")
+    mask = arrays.species_index == arrays.species_names.index(name)
+    if charge is not None:
+        mask &= arrays.charges == charge
+        if not np.any(mask):
+            raise ValueError(f"{name} has no charge state with charge {charge}")
+    return mask
+
+
+def build_conditions(
+    arrays: ChargeStateArrays,
+    temperature: ArrayLike,
+    energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+    fixed: Optional[Mapping[Any, ArrayLike]] = None,
+) -> Tuple[Tuple[int, ...], Conditions]:
+    """build flat per-point ``Conditions`` from values that broadcast together.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        temperature (ArrayLike): temperature(s)
+        energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy shifts
+          keyed by species name (applied to every charge state) or by
+          ``(name, charge)``. Defaults to ``None``.
+        fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per unit
+          cell keyed by species name or by ``(name, charge)``. Defaults to
+          ``None``.
+
+    Returns:
+        Tuple[Tuple[int, ...], Conditions]: shape the values broadcast to, and
+        the flattened conditions.
+    """
+    energy_shifts = energy_shifts or {}
+    fixed = fixed or {}
+    values = [temperature, *energy_shifts.values(), *fixed.values()]
+    shape = np.broadcast_shapes(*[np.shape(v) for v in values])
+    n_points = int(np.prod(shape))
+
+    def flat(value: ArrayLike) -> np.ndarray:
+        return np.broadcast_to(np.asarray(value, dtype=float), shape).reshape(n_points)
+
+    shifts = None
+    if energy_shifts:
+        shifts = np.zeros((n_points, arrays.n_charge_states))
+        for key, value in energy_shifts.items():
+            shifts[:, charge_state_mask(arrays, key)] += flat(value)[:, None]
+    species_fixed = None
+    charge_state_fixed = None
+    for key, value in fixed.items():
+        mask = charge_state_mask(arrays, key)
+        if isinstance(key, tuple):
+            if charge_state_fixed is None:
+                charge_state_fixed = np.tile(arrays.charge_state_fixed, (n_points, 1))
+            charge_state_fixed[:, mask] = flat(value)[:, None]
+        else:
+            if species_fixed is None:
+                species_fixed = np.tile(arrays.species_fixed, (n_points, 1))
+            species_fixed[:, arrays.species_names.index(key)] = flat(value)
+    return shape, Conditions(flat(temperature), shifts, species_fixed, charge_state_fixed)
+
+
+def species_sum(arrays: ChargeStateArrays, values: np.ndarray) -> np.ndarray:
+    """sum per-charge-state values over the charge states of each species
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        values (np.ndarray): array with charge states along the last axis
+
+    Returns:
+        np.ndarray: array with species along the last axis
+    """
+    return _species_reduce(np.add, arrays, values, 0.0)
+
+
+def species_max(arrays: ChargeStateArrays, values: np.ndarray) -> np.ndarray:
+    """maximum of per-charge-state values over the charge states of each species
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        values (np.ndarray): array with charge states along the last axis
+
+    Returns:
+        np.ndarray: array with species along the last axis, ``-inf`` for
+        species without charge states
+    """
+    return _species_reduce(np.maximum, arrays, values, -np.inf)
+
+
+def _species_reduce(
+    ufunc: np.ufunc, arrays: ChargeStateArrays, values: np.ndarray, empty: float
+) -> np.ndarray:
+    """reduce contiguous per-species blocks of charge states with ``ufunc``"""
+    counts = np.bincount(arrays.species_index, minlength=arrays.n_species)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int)
+    reduced = np.full(values.shape[:-1] + (arrays.n_species,), empty)
+    if values.shape[-1]:
+        occupied = counts > 0
+        reduced[..., occupied] = ufunc.reduceat(values, starts[occupied], axis=-1)
+    return reduced
+
+
+def carrier_concentrations(
+    dos: DOS, e_fermi: np.ndarray, temperature: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """vectorised equivalent of ``DOS.carrier_concentrations``
+
+    Args:
+        dos (DOS): density-of-states
+        e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+        temperature (np.ndarray): temperatures, shape ``(N,)``
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: hole and electron concentrations per
+        unit cell, each of shape ``(N,)``
+    """
+    p_index = dos._p0_index() + 1
+    n_index = dos._n0_index()
+    kt = kboltz * np.asarray(temperature, dtype=float)[:, None]
+    e_fermi = np.asarray(e_fermi, dtype=float)[:, None]
+    with np.errstate(over="ignore"):
+        p_func = np.exp((e_fermi - dos.edos[:p_index]) / kt)
+        p_func += 1.0
+        n_func = np.exp((dos.edos[n_index:] - e_fermi) / kt)
+        n_func += 1.0
+    # integrate with the trapezoidal rule as a matrix-vector product
+    p0 = np.reciprocal(p_func, out=p_func) @ (
+        dos.dos[:p_index] * _trapezoid_weights(dos.edos[:p_index])
+    )
+    n0 = np.reciprocal(n_func, out=n_func) @ (
+        dos.dos[n_index:] * _trapezoid_weights(dos.edos[n_index:])
+    )
+    return p0, n0
+
+
+def _trapezoid_weights(x: np.ndarray) -> np.ndarray:
+    """weights such that ``y @ weights == trapezoid(y, x)``"""
+    weights = np.zeros(len(x))
+    if len(x) > 1:
+        dx = np.diff(x)
+        weights[:-1] += 0.5 * dx
+        weights[1:] += 0.5 * dx
+    return weights
+
+
+def charge_state_concentrations(
+    arrays: ChargeStateArrays,
+    e_fermi: np.ndarray,
+    temperature: np.ndarray,
+    energy_shifts: Optional[np.ndarray] = None,
+    species_fixed: Optional[np.ndarray] = None,
+    charge_state_fixed: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """vectorised equivalent of ``DefectSpecies.charge_state_concentrations``
+    for every charge state of every species.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+        temperature (np.ndarray): temperatures, shape ``(N,)``
+        energy_shifts (Optional[np.ndarray]): shifts applied to the
+          formation energy of each charge state, shape ``(N, n_charge_states)``.
+          Defaults to ``None``.
+        species_fixed (Optional[np.ndarray]): fixed concentration of each
+          species, shape ``(N, n_species)``, ``nan`` where free to vary.
+          Defaults to ``arrays.species_fixed``.
+        charge_state_fixed (Optional[np.ndarray]): fixed concentration of each
+          charge state, shape ``(N, n_charge_states)``, ``nan`` where free to
+          vary. Defaults to ``arrays.charge_state_fixed``.
+
+    Returns:
+        np.ndarray: concentrations per unit cell, shape ``(N, n_charge_states)``
+    """
+    if species_fixed is None:
+        species_fixed = arrays.species_fixed
+    if charge_state_fixed is None:
+        charge_state_fixed = arrays.charge_state_fixed
+    energies = arrays.energies + arrays.charges * np.asarray(e_fermi)[:, None]
+    if energy_shifts is not None:
+        energies = energies + energy_shifts
+    kt = kboltz * np.asarray(temperature, dtype=float)[:, None]
+    with np.errstate(divide="ignore"):
+        log_weights = np.log(arrays.degeneracies * arrays.nsites[arrays.species_index])
+    log_weights = log_weights - energies / kt
+    with np.errstate(over="ignore"):
+        variable = np.exp(log_weights)
+    is_fixed = ~np.isnan(charge_state_fixed)
+    concentrations = np.where(is_fixed, charge_state_fixed, variable)
+
+    species_fixed = np.broadcast_to(
+        species_fixed, concentrations.shape[:-1] + (arrays.n_species,)
+    )
+    if np.any(~np.isnan(species_fixed)):
+        # the variable charge states of a fixed-concentration species share
+        # what remains of the fixed total in proportion to their Boltzmann
+        # weights, evaluated relative to the largest weight of the species so
+        # that the ratio cannot overflow.
+        log_weights = np.where(is_fixed, -np.inf, log_weights)
+        peak = species_max(arrays, log_weights)
+        peak = np.where(np.isfinite(peak), peak, 0.0)
+        weights = np.exp(log_weights - peak[..., arrays.species_index])
+        weight_sum = species_sum(arrays, weights)
+        fixed_sum = species_sum(arrays, np.where(is_fixed, concentrations, 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = (species_fixed - fixed_sum) / weight_sum
+            scaled = weights * share[..., arrays.species_index]
+        rescale = ~is_fixed & ~np.isnan(species_fixed[..., arrays.species_index])
+        concentrations = np.where(rescale, scaled, concentrations)
+    return concentrations
+
+
+def species_concentrations(
+    arrays: ChargeStateArrays,
+    charge_state_concentrations: np.ndarray,
+    species_fixed: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """vectorised equivalent of ``DefectSpecies.get_concentration``
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        charge_state_concentrations (np.ndarray): concentration of each charge
+          state, shape ``(N, n_charge_states)``
+        species_fixed (Optional[np.ndarray]): fixed concentration of each
+          species, shape ``(N, n_species)``. Defaults to ``arrays.species_fixed``.
+
+    Returns:
+        np.ndarray: total concentration of each species, shape ``(N, n_species)``
+    """
+    if species_fixed is None:
+        species_fixed = arrays.species_fixed
+    totals = species_sum(arrays, charge_state_concentrations)
+    return np.where(np.isnan(species_fixed) | (species_fixed == 0), totals, species_fixed)
+
+
+def charge_balance(
+    arrays: ChargeStateArrays,
+    dos: DOS,
+    e_fermi: np.ndarray,
+    temperature: np.ndarray,
+    energy_shifts: Optional[np.ndarray] = None,
+    species_fixed: Optional[np.ndarray] = None,
+    charge_state_fixed: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """vectorised equivalent of the positive (``lhs``) and negative (``rhs``)
+    charge densities compared in ``DefectSystem.q_tot``.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        dos (DOS): density-of-states
+        e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+        temperature (np.ndarray): temperatures, shape ``(N,)``
+        energy_shifts (Optional[np.ndarray]): see ``charge_state_concentrations``
+        species_fixed (Optional[np.ndarray]): see ``charge_state_concentrations``
+        charge_state_fixed (Optional[np.ndarray]): see ``charge_state_concentrations``
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: positive charge density (holes and
+        positive defects) and negative charge density (electrons and negative
+        defects), each of shape ``(N,)``
+    """
+    p0, n0 = carrier_concentrations(dos, e_fermi, temperature)
+    concentrations = charge_state_concentrations(
+        arrays, e_fermi, temperature, energy_shifts, species_fixed, charge_state_fixed
+    )
+    positive, negative = defect_charge(arrays, concentrations)
+    return p0 + positive, n0 + negative
+
+
+def defect_charge(
+    arrays: ChargeStateArrays, charge_state_concentrations: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """positive and negative charge densities of the defects alone
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        charge_state_concentrations (np.ndarray): concentration of each charge
+          state, shape ``(N, n_charge_states)``
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: charge density of the positive and
+        (as a positive number) of the negative charge states, each of shape
+        ``(N,)``
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        charge = charge_state_concentrations * arrays.charges
+        positive = np.sum(np.where(arrays.charges > 0, charge, 0.0), axis=-1)
+        negative = -np.sum(np.where(arrays.charges < 0, charge, 0.0), axis=-1)
+    return positive, negative
+
+
+def q_tot(
+    arrays: ChargeStateArrays,
+    dos: DOS,
+    e_fermi: np.ndarray,
+    temperature: np.ndarray,
+    energy_shifts: Optional[np.ndarray] = None,
+    species_fixed: Optional[np.ndarray] = None,
+    charge_state_fixed: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """vectorised equivalent of ``DefectSystem.q_tot``
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        dos (DOS): density-of-states
+        e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+        temperature (np.ndarray): temperatures, shape ``(N,)``
+        energy_shifts (Optional[np.ndarray]): see ``charge_state_concentrations``
+        species_fixed (Optional[np.ndarray]): see ``charge_state_concentrations``
+        charge_state_fixed (Optional[np.ndarray]): see ``charge_state_concentrations``
+
+    Returns:
+        np.ndarray: net charge density at each point, shape ``(N,)``
+    """
+    positive, negative = charge_balance(
+        arrays, dos, e_fermi, temperature, energy_shifts, species_fixed, charge_state_fixed
+    )
+    return negative - positive
+
+
+def find_fermi_energy(
+    balance: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    emin: float,
+    emax: float,
+    n_points: int,
+    convergence_tolerance: float = 1e-18,
+    n_trial_steps: int = 1500,
+    e_fermi_guess: Optional[np.ndarray] = None,
+    window: float = 0.1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """find the charge neutral Fermi energy at ``n_points`` points at once.
+
+    The net charge is an increasing function of the Fermi energy, so each
+    point has a single root between ``emin`` and ``emax``. The root is
+    bracketed throughout, and the bracket is narrowed by regula falsi (with
+    the Illinois modification) on ``log(negative) - log(positive)``, which
+    is close to linear in the Fermi energy, falling back to bisection where
+    that is undefined.
+
+    Args:
+        balance (Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]):
+          function taking an array of Fermi energies and the indices of the
+          points they belong to, and returning the positive and negative
+          charge densities at those points.
+        emin (float): minimum Fermi energy
+        emax (float): maximum Fermi energy
+        n_points (int): number of points to solve for
+        convergence_tolerance (float): charge neutrality tolerance. Defaults
+          to ``1e-18``.
+        n_trial_steps (int): maximum number of solver steps. Defaults to 1500.
+        e_fermi_guess (Optional[np.ndarray]): initial guess for each point.
+          If given, the search starts from a bracket of width ``2 * window``
+          around the guess where that bracket contains the root. Defaults to
+          ``None``.
+        window (float): half-width of the initial bracket around
+          ``e_fermi_guess``. Defaults to 0.1 eV.
+
+    Raises:
+        RuntimeError: if any point has no solution between ``emin`` and ``emax``
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Fermi energies and residuals
+    """
+
+    def evaluate(e: np.ndarray, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        positive, negative = balance(e, index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return negative - positive, np.log(negative) - np.log(positive)
+
+    index = np.arange(n_points)
+    lo = np.full(n_points, emin, dtype=float)
+    hi = np.full(n_points, emax, dtype=float)
+    q_lo, g_lo = np.full(n_points, np.nan), np.full(n_points, np.nan)
+    q_hi, g_hi = np.full(n_points, np.nan), np.full(n_points, np.nan)
+
+    if e_fermi_guess is not None:
+        guess = np.broadcast_to(np.asarray(e_fermi_guess, dtype=float), (n_points,))
+        trials = [
+            np.clip(guess - window, emin, emax),
+            np.clip(guess + window, emin, emax),
+        ]
+        evaluated = [(trial, *evaluate(trial, index)) for trial in trials]
+        # trial points below the root raise the lower bound of the bracket and
+        # those above the root lower the upper bound
+        for trial, q_trial, g_trial in evaluated:
+            below = q_trial <= 0.0
+            lo = np.where(below, trial, lo)
+            q_lo = np.where(below, q_trial, q_lo)
+            g_lo = np.where(below, g_trial, g_lo)
+        for trial, q_trial, g_trial in reversed(evaluated):
+            above = q_trial >= 0.0
+            hi = np.where(above, trial, hi)
+            q_hi = np.where(above, q_trial, q_hi)
+            g_hi = np.where(above, g_trial, g_hi)
+
+    for bound, q_bound, g_bound, energy in (
+        (lo, q_lo, g_lo, emin),
+        (hi, q_hi, g_hi, emax),
+    ):
+        missing = np.flatnonzero(np.isnan(q_bound))
+        if missing.size:
+            bound[missing] = energy
+            q_bound[missing], g_bound[missing] = evaluate(bound[missing], missing)
+    n_failed = np.count_nonzero((q_lo > 0.0) | (q_hi < 0.0))
+    if n_failed:
+        raise RuntimeError(
+            f"No solution found between {emin} and {emax} for {n_failed} of {n_points} points"
+        )
+    return _illinois(
+        evaluate, lo, hi, q_lo, q_hi, g_lo, g_hi, convergence_tolerance, n_trial_steps
+    )
+
+
+def _illinois(
+    evaluate: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    lo: np.ndarray,
+    hi: np.ndarray,
+    q_lo: np.ndarray,
+    q_hi: np.ndarray,
+    g_lo: np.ndarray,
+    g_hi: np.ndarray,
+    tolerance: float,
+    max_iterations: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """narrow the brackets ``[lo, hi]`` of many roots at once by regula falsi
+    with the Illinois modification, falling back to bisection where the
+    interpolation is undefined. Shared by ``find_fermi_energy`` and
+    ``find_root``.
+
+    Args:
+        evaluate (Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]):
+          function taking trial values and the indices of the points they
+          belong to, and returning the residual ``q``, which increases
+          through zero across each bracket, and the function ``g`` with the
+          same sign that is interpolated to place the next trial
+        lo (np.ndarray): lower bound of each bracket, where ``q <= 0``
+        hi (np.ndarray): upper bound of each bracket, where ``q >= 0``
+        q_lo (np.ndarray): ``q`` at ``lo``
+        q_hi (np.ndarray): ``q`` at ``hi``
+        g_lo (np.ndarray): ``g`` at ``lo``
+        g_hi (np.ndarray): ``g`` at ``hi``
+        tolerance (float): stop once ``abs(q) < tolerance``
+        max_iterations (int): maximum number of iterations
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the trial with the smallest ``abs(q)``
+        at each point, and that ``abs(q)``
+    """
+    lo, hi = lo.copy(), hi.copy()
+    g_lo, g_hi = g_lo.copy(), g_hi.copy()
+    root = np.where(np.abs(q_lo) < np.abs(q_hi), lo, hi)
+    residual = np.fmin(np.abs(q_lo), np.abs(q_hi))
+
+    side = np.zeros(len(lo), dtype=int)
+    active = ~(residual < tolerance)
+    for _ in range(max_iterations):
+        if not np.any(active):
+            break
+        index = np.flatnonzero(active)
+        a, b, g_a, g_b = lo[index], hi[index], g_lo[index], g_hi[index]
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            trial = a - g_a * (b - a) / (g_b - g_a)
+        interpolate = np.isfinite(trial) & (trial > a) & (trial < b)
+        trial = np.where(interpolate, trial, 0.5 * (a + b))
+        stalled = (trial <= a) | (trial >= b)
+        q_trial, g_trial = evaluate(trial, index)
+
+        better = np.abs(q_trial) < residual[index]
+        root[index[better]] = trial[better]
+        residual[index[better]] = np.abs(q_trial[better])
+
+        below = q_trial < 0.0
+        above = q_trial > 0.0
+        lo[index] = np.where(below, trial, a)
+        g_lo[index] = np.where(below, g_trial, np.where(above & (side[index] == 1), 0.5 * g_a, g_a))
+        hi[index] = np.where(above, trial, b)
+        g_hi[index] = np.where(above, g_trial, np.where(below & (side[index] == -1), 0.5 * g_b, g_b))
+        side[index] = np.where(below, -1, np.where(above, 1, 0))
+        # stop once the bracket cannot be split further in floating point or
+        # the residual is resolved to machine precision
+        converged = (np.abs(q_trial) < tolerance) | stalled
+        converged |= np.abs(g_trial) <= 4.0 * np.finfo(float).eps
+        converged |= (hi[index] - lo[index]) <= 2.0 * np.spacing(np.abs(trial))
+        active[index] = ~converged & ~np.isnan(q_trial)
+    return root, residual
+
+
+def solve(
+    arrays: ChargeStateArrays,
+    dos: DOS,
+    conditions: Conditions,
+    convergence_tolerance: float = 1e-18,
+    n_trial_steps: int = 1500,
+    e_fermi_guess: Optional[np.ndarray] = None,
+    chunk_size: int = 1024,
+    warm_start: bool = False,
+    n_jobs: int = 1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """solve for the self-consistent Fermi energy at every point of an array
+    of conditions.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        dos (DOS): density-of-states
+        conditions (Conditions): conditions at each of the ``N`` points
+        convergence_tolerance (float): charge neutrality tolerance. Defaults
+          to ``1e-18``.
+        n_trial_steps (int): maximum number of solver steps. Defaults to 1500.
+        e_fermi_guess (Optional[np.ndarray]): initial guess for each point.
+          Defaults to ``None``.
+        chunk_size (int): maximum number of points solved simultaneously,
+          which bounds the memory used for the carrier concentration integrals.
+          Defaults to 1024.
+        warm_start (bool): if ``True``, treat the points as an ordered sweep:
+          every ``WARM_START_STRIDE``-th point is solved first, and the
+          remaining points start from a narrow bracket around the
+          interpolated solution. Defaults to ``False``.
+        n_jobs (int): number of chunks solved concurrently in separate
+          threads. Defaults to 1.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Fermi energies and residuals, each of
+        shape ``(N,)``
+    """
+    n_points = conditions.n_points
+    if warm_start and e_fermi_guess is None and n_points > 2 * WARM_START_STRIDE:
+        coarse = np.unique(
+            np.append(np.arange(0, n_points, WARM_START_STRIDE), n_points - 1)
+        )
+        fine = np.setdiff1d(np.arange(n_points), coarse)
+        e_fermi = np.empty(n_points)
+        residual = np.empty(n_points)
+        e_fermi[coarse], residual[coarse] = solve(
+            arrays,
+            dos,
+            conditions.select(coarse),
+            convergence_tolerance,
+            n_trial_steps,
+            chunk_size=chunk_size,
+            n_jobs=n_jobs,
+        )
+        e_fermi[fine], residual[fine] = solve(
+            arrays,
+            dos,
+            conditions.select(fine),
+            convergence_tolerance,
+            n_trial_steps,
+            e_fermi_guess=np.interp(fine, coarse, e_fermi[coarse]),
+            chunk_size=chunk_size,
+            n_jobs=n_jobs,
+        )
+        return e_fermi, residual
+
+    e_fermi = np.empty(n_points)
+    residual = np.empty(n_points)
+
+    def solve_chunk(chunk: slice) -> None:
+        chunk_conditions = conditions.select(chunk)
+
+        def balance(e: np.ndarray, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            return charge_balance(arrays, dos, e, *chunk_conditions.select(index))
+
+        e_fermi[chunk], residual[chunk] = find_fermi_energy(
+            balance,
+            dos.emin(),
+            dos.emax(),
+            chunk.stop - chunk.start,
+            convergence_tolerance,
+            n_trial_steps,
+            None if e_fermi_guess is None else np.asarray(e_fermi_guess)[chunk],
+        )
+
+    chunks = [
+        slice(start, min(start + chunk_size, n_points))
+        for start in range(0, n_points, chunk_size)
+    ]
+    if n_jobs > 1 and len(chunks) > 1:
+        # the work in each chunk is dominated by numpy operations that
+        # release the GIL, so threads are enough to use several cores.
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            list(executor.map(solve_chunk, chunks))
+    else:
+        for chunk in chunks:
+            solve_chunk(chunk)
+    return e_fermi, residual
+
+
+def concentrations(
+    arrays: ChargeStateArrays,
+    dos: DOS,
+    e_fermi: np.ndarray,
+    conditions: Conditions,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """carrier, charge state and species concentrations per unit cell at
+    given Fermi energies.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        dos (DOS): density-of-states
+        e_fermi (np.ndarray): Fermi energy at each point, shape ``(N,)``
+        conditions (Conditions): conditions at each point
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: hole and
+        electron concentrations, shape ``(N,)``, and charge state and species
+        concentrations, shape ``(N, n_charge_states)`` and ``(N, n_species)``.
+    """
+    p0, n0 = carrier_concentrations(dos, e_fermi, conditions.temperature)
+    cs_concentrations = charge_state_concentrations(arrays, e_fermi, *conditions)
+    sp_concentrations = species_concentrations(
+        arrays, cs_concentrations, conditions.species_fixed
+    )
+    return p0, n0, cs_concentrations, sp_concentrations
+
+
+def results(
+    arrays: ChargeStateArrays,
+    dos: DOS,
+    volume: float,
+    e_fermi: np.ndarray,
+    conditions: Conditions,
+    shape: Tuple[int, ...],
+    per_volume: bool = True,
+) -> Dict[str, np.ndarray]:
+    """Fermi energies and the carrier and species concentrations at them, in
+    the format returned by ``DefectSystem.solve_batch``.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        dos (DOS): density-of-states
+        volume (float): volume of the unit cell in Angstroms cubed
+        e_fermi (np.ndarray): Fermi energy at each point, shape ``(N,)``
+        conditions (Conditions): conditions at each point
+        shape (Tuple[int, ...]): shape of the returned arrays, with ``N``
+          elements
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Defaults to True.
+
+    Returns:
+        Dict[str, np.ndarray]: Fermi energy, hole concentration (``"p0"``),
+        electron concentration (``"n0"``), and the concentration of each
+        species
+    """
+    p0, n0, _, species_concs = concentrations(arrays, dos, e_fermi, conditions)
+    scale = 1e24 / volume if per_volume else 1
+    solution = {
+        "Fermi Energy": e_fermi.reshape(shape),
+        "p0": (p0 * scale).reshape(shape),
+        "n0": (n0 * scale).reshape(shape),
+    }
+    for i, name in enumerate(arrays.species_names):
+        solution[name] = (species_concs[:, i] * scale).reshape(shape)
+    return solution
+
+
+def quench_conditions(
+    arrays: ChargeStateArrays,
+    conditions: Conditions,
+    quench_temperature: np.ndarray,
+    charge_state_concentrations: np.ndarray,
+    frozen_species: np.ndarray,
+    frozen_charge_states: np.ndarray,
+) -> Conditions:
+    """conditions for the quench stage of an anneal-and-quench solve, with
+    the concentrations found at the anneal stage held fixed.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        conditions (Conditions): conditions at the anneal stage
+        quench_temperature (np.ndarray): quench temperatures, shape ``(N,)``
+        charge_state_concentrations (np.ndarray): concentration of each
+          charge state at the anneal stage, shape ``(N, n_charge_states)``
+        frozen_species (np.ndarray): boolean mask of the species whose total
+          concentration is fixed, shape ``(n_species,)``
+        frozen_charge_states (np.ndarray): boolean mask of the charge states
+          whose concentration is fixed, shape ``(n_charge_states,)``
+
+    Returns:
+        Conditions: conditions at the quench stage
+    """
+    shape = charge_state_concentrations.shape
+    species_fixed = (
+        arrays.species_fixed if conditions.species_fixed is None else conditions.species_fixed
+    )
+    charge_state_fixed = (
+        arrays.charge_state_fixed
+        if conditions.charge_state_fixed is None
+        else conditions.charge_state_fixed
+    )
+    totals = species_concentrations(arrays, charge_state_concentrations, species_fixed)
+    return Conditions(
+        np.asarray(quench_temperature, dtype=float),
+        conditions.energy_shifts,
+        np.where(frozen_species, totals, np.broadcast_to(species_fixed, totals.shape)),
+        np.where(
+            frozen_charge_states,
+            charge_state_concentrations,
+            np.broadcast_to(charge_state_fixed, shape),
+        ),
+    )
+
+
+def carrier_derivatives(
+    dos: DOS, e_fermi: np.ndarray, temperature: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """derivatives of the hole and electron concentrations returned by
+    ``carrier_concentrations`` with respect to the Fermi energy and the
+    temperature.
+
+    Args:
+        dos (DOS): density-of-states
+        e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+        temperature (np.ndarray): temperatures, shape ``(N,)``
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: ``dp0/dE_F``,
+        ``dn0/dE_F``, ``dp0/dT`` and ``dn0/dT``, each of shape ``(N,)``
+    """
+    p_index = dos._p0_index() + 1
+    n_index = dos._n0_index()
+    temperature = np.asarray(temperature, dtype=float)[:, None]
+    kt = kboltz * temperature
+    e_fermi = np.asarray(e_fermi, dtype=float)[:, None]
+    p_weights = dos.dos[:p_index] * _trapezoid_weights(dos.edos[:p_index])
+    n_weights = dos.dos[n_index:] * _trapezoid_weights(dos.edos[n_index:])
+    p_offset = e_fermi - dos.edos[:p_index]
+    n_offset = dos.edos[n_index:] - e_fermi
+    with np.errstate(over="ignore"):
+        p_occupation = 1.0 / (1.0 + np.exp(p_offset / kt))
+        n_occupation = 1.0 / (1.0 + np.exp(n_offset / kt))
+    # d/du 1 / (1 + exp(u)) = -f (1 - f)
+    p_slope = p_occupation * (1.0 - p_occupation) / kt
+    n_slope = n_occupation * (1.0 - n_occupation) / kt
+    return (
+        -p_slope @ p_weights,
+        n_slope @ n_weights,
+        (p_slope * p_offset / temperature) @ p_weights,
+        (n_slope * n_offset / temperature) @ n_weights,
+    )
+
+
+def parameter_masks(
+    arrays: ChargeStateArrays,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """the model parameters of a system: its variable charge states (with a
+    defined formation energy and no fixed concentration), its species with a
+    fixed concentration and its charge states with a fixed concentration.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: masks over the charge
+        states, the species and the charge states
+    """
+    charge_state_fixed = ~np.isnan(arrays.charge_state_fixed)
+    return (
+        ~np.isnan(arrays.energies) & ~charge_state_fixed,
+        ~np.isnan(arrays.species_fixed),
+        charge_state_fixed,
+    )
+
+
+def parameter_labels(arrays: ChargeStateArrays) -> List[Tuple]:
+    """labels of the model parameters, in the order used throughout:
+    the formation energy and then the degeneracy of every variable charge
+    state, the temperature, every fixed species concentration and every
+    fixed charge state concentration (see ``parameter_masks``). Labels are
+    ``("energy", name, charge)``, ``("degeneracy", name, charge)``,
+    ``("temperature",)``, ``("fixed_concentration", name)`` and
+    ``("fixed_concentration", name, charge)``.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+
+    Returns:
+        List[Tuple]: parameter labels
+    """
+    variable, species_fixed, charge_state_fixed = parameter_masks(arrays)
+    charge_states = [
+        (arrays.species_names[i], int(q)) for i, q in zip(arrays.species_index, arrays.charges)
+    ]
+    return (
+        [("energy", *cs) for cs, m in zip(charge_states, variable) if m]
+        + [("degeneracy", *cs) for cs, m in zip(charge_states, variable) if m]
+        + [("temperature",)]
+        + [("fixed_concentration", n) for n, m in zip(arrays.species_names, species_fixed) if m]
+        + [("fixed_concentration", *cs) for cs, m in zip(charge_states, charge_state_fixed) if m]
+    )
+
+
+def parameter_columns(arrays: ChargeStateArrays) -> np.ndarray:
+    """mask selecting the columns of ``sensitivities`` labelled by
+    ``parameter_labels``
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+
+    Returns:
+        np.ndarray: mask, shape ``(3 * n_charge_states + 1 + n_species,)``
+    """
+    variable, species_fixed, charge_state_fixed = parameter_masks(arrays)
+    return np.concatenate([variable, variable, [True], species_fixed, charge_state_fixed])
+
+
+def sensitivities(
+    arrays: ChargeStateArrays,
+    dos: DOS,
+    e_fermi: np.ndarray,
+    conditions: Conditions,
+) -> np.ndarray:
+    """Jacobian of the self-consistent solution with respect to the model
+    parameters, by implicit differentiation of the charge neutrality
+    condition ``q_tot(E_F; theta) = 0``:
+
+    ``dE_F/dtheta = -(dq/dtheta) / (dq/dE_F)``
+
+    The rows (outputs) are ordered as the Fermi energy, ``p0``, ``n0`` and the
+    concentration per unit cell of each charge state. The columns
+    (parameters) are ordered as the formation energy of each charge state,
+    the degeneracy of each charge state, the temperature, the fixed
+    concentration of each species and the fixed concentration of each charge
+    state. Columns for fixed concentrations that are not set (``nan``) are
+    zero. ``parameter_columns`` selects the columns of the model parameters,
+    as labelled by ``parameter_labels``.
+
+    Args:
+        arrays (ChargeStateArrays): charge state arrays
+        dos (DOS): density-of-states
+        e_fermi (np.ndarray): self-consistent Fermi energy at each point,
+          shape ``(N,)``
+        conditions (Conditions): conditions at each point
+
+    Returns:
+        np.ndarray: Jacobian, shape
+        ``(N, 3 + n_charge_states, 3 * n_charge_states + 1 + n_species)``
+    """
+    n_cs, n_sp = arrays.n_charge_states, arrays.n_species
+    e_fermi = np.asarray(e_fermi, dtype=float)
+    temperature = np.asarray(conditions.temperature, dtype=float)
+    n_points = len(e_fermi)
+    kt = kboltz * temperature[:, None]
+    species_fixed = np.broadcast_to(
+        arrays.species_fixed if conditions.species_fixed is None else conditions.species_fixed,
+        (n_points, n_sp),
+    )
+    charge_state_fixed = np.broadcast_to(
+        arrays.charge_state_fixed
+        if conditions.charge_state_fixed is None
+        else conditions.charge_state_fixed,
+        (n_points, n_cs),
+    )
+    concs = charge_state_concentrations(arrays, e_fermi, *conditions)
+    energies = arrays.energies + arrays.charges * e_fermi[:, None]
+    if conditions.energy_shifts is not None:
+        energies = energies + conditions.energy_shifts
+
+    is_fixed = ~np.isnan(charge_state_fixed)
+    variable = ~is_fixed
+    rescaled = variable & ~np.isnan(species_fixed[:, arrays.species_index])
+    same_species = arrays.species_index[:, None] == arrays.species_index[None, :]
+    # share of each rescaled charge state in what remains of its species total
+    variable_concs = np.where(rescaled, concs, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = variable_concs / species_sum(arrays, variable_concs)[:, arrays.species_index]
+    share = np.nan_to_num(np.where(rescaled, share, 0.0))
+
+    # dc_j = c_j (A @ dl)_j for a change dl in the log Boltzmann weights,
+    # where the rescaling of a fixed-total species removes the mean change
+    # over its variable charge states.
+    a_matrix = np.eye(n_cs) * variable[:, :, None] - (
+        rescaled[:, :, None] * same_species * share[:, None, :]
+    )
+    c_matrix = np.nan_to_num(concs)[:, :, None] * a_matrix
+
+    def log_weight_response(dl: np.ndarray) -> np.ndarray:
+        return np.einsum("njk,nk...->nj...", c_matrix, dl)
+
+    d_energy = c_matrix * (-1.0 / kt)[:, None, :]
+    with np.errstate(divide="ignore"):
+        d_degeneracy = c_matrix / arrays.degeneracies
+    d_temperature = log_weight_response(energies / (kt * temperature[:, None]))
+    d_e_fermi = log_weight_response(-arrays.charges / kt)
+    d_species_fixed = np.where(
+        (arrays.species_index[:, None] == np.arange(n_sp))[None, :, :],
+        share[:, :, None],
+        0.0,
+    )
+    d_species_fixed = np.where(np.isnan(species_fixed)[:, None, :], 0.0, d_species_fixed)
+    d_charge_state_fixed = (
+        np.eye(n_cs) * is_fixed[:, None, :] - share[:, :, None] * same_species
+    ) * is_fixed[:, None, :]
+
+    # partial derivatives of the charge state concentrations at fixed E_F
+    d_concs = np.concatenate(
+        [
+            d_energy,
+            d_degeneracy,
+            d_temperature[:, :, None],
+            d_species_fixed,
+            d_charge_state_fixed,
+        ],
+        axis=-1,
+    )
+    dp_de, dn_de, dp_dt, dn_dt = carrier_derivatives(dos, e_fermi, temperature)
+    n_params = d_concs.shape[-1]
+    temperature_column = 2 * n_cs
+    d_holes = np.zeros((n_points, n_params))
+    d_electrons = np.zeros((n_points, n_params))
+    d_holes[:, temperature_column] = dp_dt
+    d_electrons[:, temperature_column] = dn_dt
+
+    charges = arrays.charges.astype(float)
+    dq_dtheta = d_electrons - d_holes - np.einsum("j,njp->np", charges, d_concs)
+    dq_de = dn_de - dp_de - d_e_fermi @ charges
+    de_dtheta = -dq_dtheta / dq_de[:, None]
+
+    partial = np.concatenate([d_holes[:, None], d_electrons[:, None], d_concs], axis=1)
+    slope = np.concatenate(
+        [dp_de[:, None], dn_de[:, None], d_e_fermi], axis=1
+    )
+    jacobian = partial + slope[:, :, None] * de_dtheta[:, None, :]
+    return np.concatenate([de_dtheta[:, None, :], jacobian], axis=1)
+
+
+def find_root(
+    objective: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    tolerance: float = 1e-10,
+    max_iterations: int = 200,
+) -> np.ndarray:
+    """find a root of a monotonic function at many points at once, by
+    bracketed regula falsi with the Illinois modification, as in
+    ``find_fermi_energy``.
+
+    Args:
+        objective (Callable[[np.ndarray, np.ndarray], np.ndarray]): function
+          taking an array of trial values and the indices of the points they
+          belong to, and returning the objective at those points
+        lower (np.ndarray): lower bound of the bracket at each point
+        upper (np.ndarray): upper bound of the bracket at each point
+        tolerance (float): stop once ``abs(objective) < tolerance``.
+          Defaults to ``1e-10``.
+        max_iterations (int): maximum number of iterations. Defaults to 200.
+
+    Raises:
+        RuntimeError: if the objective does not change sign between the
+          bounds at any point
+
+    Returns:
+        np.ndarray: root at each point
+    """
+    lo = np.array(lower, dtype=float)
+    hi = np.array(upper, dtype=float)
+    n_points = len(lo)
+    index = np.arange(n_points)
+    g_lo = objective(lo, index)
+    g_hi = objective(hi, index)
+    n_failed = np.count_nonzero(~(np.sign(g_lo) * np.sign(g_hi) <= 0))
+    if n_failed:
+        raise RuntimeError(
+            f"Target not bracketed by the parameter bounds for {n_failed} of {n_points} points"
+        )
+    # orient every point so that the objective increases across the bracket
+    orientation = np.where(g_lo <= g_hi, 1.0, -1.0)
+    g_lo, g_hi = g_lo * orientation, g_hi * orientation
+
+    def evaluate(x: np.ndarray, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        g = objective(x, index) * orientation[index]
+        return g, g
+
+    root, _ = _illinois(evaluate, lo, hi, g_lo, g_hi, g_lo, g_hi, tolerance, max_iterations)
+    return root
@@ -0,0 +1,152 @@
+"""Brouwer diagrams: defect and carrier concentrations as a function of the
+partial pressure of a gas (e.g. O2) in equilibrium with the host.
+
+The chemical potential of the gas-phase element is
+
+``mu = mu_ref + (k_B T / atoms_per_molecule) * ln(p / p_ref)``
+
+and each ``DefectSpecies`` has its formation energies shifted according to
+its ``stoichiometry``, so a ``DefectSystem`` can be solved over a whole
+pressure range in a single call to ``DefectSystem.solve_batch``.
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike
+from typing import Dict, Optional
+
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.dos import kboltz
+
+
+def gas_chemical_potential(
+    partial_pressure: ArrayLike,
+    temperature: ArrayLike,
+    reference_chemical_potential: ArrayLike = 0.0,
+    reference_pressure: float = 1.0,
+    atoms_per_molecule: int = 2,
+) -> np.ndarray:
+    """chemical potential of an element in an ideal gas of its molecules
+
+    Args:
+        partial_pressure (ArrayLike): partial pressure of the gas
+        temperature (ArrayLike): temperature
+        reference_chemical_potential (ArrayLike): chemical potential per atom
+          at ``reference_pressure`` and ``temperature``, relative to the
+          reference used for the formation energies. Defaults to 0.0.
+        reference_pressure (float): reference pressure, in the same units as
+          ``partial_pressure``. Defaults to 1.0.
+        atoms_per_molecule (int): number of atoms of the element per gas
+          molecule. Defaults to 2.
+
+    Returns:
+        np.ndarray: chemical potential per atom
+    """
+    return np.asarray(reference_chemical_potential) + (
+        kboltz
+        * np.asarray(temperature)
+        / atoms_per_molecule
+        * np.log(np.asarray(partial_pressure) / reference_pressure)
+    )
+
+
+def brouwer_diagram(
+    defect_system: DefectSystem,
+    element: str,
+    partial_pressures: ArrayLike,
+    temperature: Optional[float] = None,
+    reference_chemical_potential: float = 0.0,
+    reference_pressure: float = 1.0,
+    atoms_per_molecule: int = 2,
+    chemical_potentials: Optional[Dict[str, float]] = None,
+    host_composition: Optional[Dict[str, float]] = None,
+    host_formation_energy: Optional[float] = None,
+    quench_temperature: Optional[float] = None,
+    per_volume: bool = True,
+) -> Dict[str, np.ndarray]:
+    """Solve a ``DefectSystem`` over a range of partial pressures of a gas.
+
+    The chemical potentials of the other elements are either fixed (given in
+    ``chemical_potentials``) or, for a single host element, set by the host
+    formation energy so that the host remains stable.
+
+    If ``quench_temperature`` is given, the defect concentrations are
+    equilibrated at ``temperature`` and then held fixed, per
+    ``DefectSpecies``, while the Fermi energy and carrier concentrations are
+    solved at ``quench_temperature``.
+
+    Args:
+        defect_system (DefectSystem): defect system, whose ``DefectSpecies``
+          define their ``stoichiometry``
+        element (str): gas-phase element, e.g. ``"O"``
+        partial_pressures (ArrayLike): partial pressures of the gas
+        temperature (Optional[float]): (equilibration) temperature. Defaults
+          to ``defect_system.temperature``.
+        reference_chemical_potential (float): chemical potential per atom of
+          ``element`` at ``reference_pressure`` and ``temperature``. Defaults
+          to 0.0.
+        reference_pressure (float): reference pressure. Defaults to 1.0.
+        atoms_per_molecule (int): atoms of ``element`` per gas molecule.
+          Defaults to 2.
+        chemical_potentials (Optional[Dict[str, float]]): fixed chemical
+          potentials of other elements. Defaults to ``None``.
+        host_composition (Optional[Dict[str, float]]): composition of the host
+          per formula unit. If given with ``host_formation_energy``, the
+          chemical potential of the one host element that is neither
+          ``element`` nor in ``chemical_potentials`` follows from the host
+          formation energy. Defaults to ``None``.
+        host_formation_energy (Optional[float]): formation energy of the host
+          per formula unit. Defaults to ``None``.
+        quench_temperature (Optional[float]): temperature to quench to with
+          defect concentrations frozen. Defaults to ``None``.
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Defaults to True.
+
+    Raises:
+        ValueError: if the host does not leave exactly one element to be set
+          by its formation energy
+
+    Returns:
+        Dict[str, np.ndarray]: ``"partial pressure"``, the ``"chemical
+        potential"`` of ``element``, and the solution at each pressure as
+        returned by ``DefectSystem.solve_batch``.
+    """
+    if temperature is None:
+        temperature = defect_system.temperature
+    partial_pressures = np.asarray(partial_pressures, dtype=float)
+    mu_gas = gas_chemical_potential(
+        partial_pressures,
+        temperature,
+        reference_chemical_potential,
+        reference_pressure,
+        atoms_per_molecule,
+    )
+    mu: Dict[str, ArrayLike] = dict(chemical_potentials or {})
+    mu[element] = mu_gas
+    if host_composition is not None and host_formation_energy is not None:
+        dependent = [e for e in host_composition if e not in mu]
+        if len(dependent) != 1:
+            raise ValueError(
+                "Exactly one host element must be left to be set by the host formation energy."
+            )
+        mu[dependent[0]] = (
+            host_formation_energy
+            - sum(n * np.asarray(mu[e]) for e, n in host_composition.items() if e in mu)
+        ) / host_composition[dependent[0]]
+    energy_shifts = defect_system.chemical_potential_shifts(mu)
+
+    if quench_temperature is None:
+        results = defect_system.solve_batch(
+            temperature=temperature,
+            energy_shifts=energy_shifts,
+            per_volume=per_volume,
+            warm_start=True,
+        )
+    else:
+        _, results = defect_system.solve_quench(
+            temperature,
+            quench_temperature,
+            energy_shifts=energy_shifts,
+            per_volume=per_volume,
+            warm_start=True,
+        )
+    return {"partial pressure": partial_pressures, "chemical potential": mu_gas, **results}
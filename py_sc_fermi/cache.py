@@ -0,0 +1,116 @@
+"""Persistent cache of solver results.
+
+Results are stored as JSON in an SQLite file, keyed by strings built from
+``DefectSystem.fingerprint`` so that they are reused across runs whenever
+the inputs are identical. The number of entries is bounded; once the limit
+is reached the least recently used entries are evicted.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+
+class ResultCache:
+    """Size-bounded, least recently used cache of JSON-serialisable results
+    in an SQLite file.
+
+    Args:
+        path (str): path to the SQLite file, created if it does not exist, or
+          ``":memory:"`` for a cache that lasts only as long as this object
+        max_entries (int): maximum number of entries to keep. Defaults to
+          ``100000``.
+
+    Raises:
+        ValueError: if ``max_entries`` is less than 1
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    def __deepcopy__(self, memo: dict) -> "ResultCache":
+        # a cache is a shared resource, so copies of a ``DefectSystem`` share it
+        return self
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (type(self), (self.path, self.max_entries))
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        """look up a result, marking it as recently used
+
+        Args:
+            key (str): key of the result
+
+        Returns:
+            Optional[Any]: the stored result, or ``None`` if there is none
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time_ns(), key)
+            )
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        """store a result, evicting the least recently used entries if the
+        cache is full
+
+        Args:
+            key (str): key of the result
+            value (Any): JSON-serialisable result
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time_ns()),
+            )
+            self._connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """remove every entry"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        """close the SQLite connection"""
+        self._connection.close()
@@ -0,0 +1,449 @@
+"""Stability regions in elemental chemical potential space.
+
+A host compound is stable, with respect to decomposition into its elements
+and into competing phases, for the chemical potentials (relative to the
+elemental references) that satisfy
+
+* ``sum(n_host[i] * mu[i]) == formation_energy_host``
+* ``mu[i] <= 0`` for every element
+* ``sum(n_phase[i] * mu[i]) <= formation_energy_phase`` for every competing
+  phase
+
+These define a convex polytope. ``StabilityRegion`` enumerates its vertices
+and samples its interior, so that the chemical potentials can be passed
+straight to ``DefectSystem.solve_chemical_potentials``.
+"""
+
+import itertools
+import warnings
+import numpy as np
+from numpy.typing import ArrayLike
+from scipy.optimize import minimize  # type: ignore
+from scipy.stats import qmc  # type: ignore
+from typing import Dict, List, Optional, Tuple
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_system import DefectSystem
+
+
+class StabilityRegion:
+    """Region of chemical potential space in which a host compound is stable.
+
+    Args:
+        host_composition (Dict[str, float]): number of atoms of each element
+          per formula unit of the host, e.g. ``{"Ti": 1, "O": 2}``
+        host_formation_energy (float): formation energy of the host per
+          formula unit, relative to the elemental references
+        competing_phases (Optional[Dict[str, Tuple[Dict[str, float], float]]]):
+          competing phases as ``{name: (composition, formation_energy)}``.
+          Competing phases may only contain elements present in the host.
+          Defaults to ``None``.
+        tolerance (float): tolerance used when testing whether a point
+          satisfies the stability constraints. Defaults to ``1e-8``.
+    """
+
+    def __init__(
+        self,
+        host_composition: Dict[str, float],
+        host_formation_energy: float,
+        competing_phases: Optional[Dict[str, Tuple[Dict[str, float], float]]] = None,
+        tolerance: float = 1e-8,
+    ):
+        if len(host_composition) < 2:
+            raise ValueError("The host must contain at least two elements.")
+        self._elements = list(host_composition)
+        self._host_composition = dict(host_composition)
+        self._host_formation_energy = host_formation_energy
+        self._competing_phases = dict(competing_phases) if competing_phases else {}
+        self._tolerance = tolerance
+        for name, (composition, _) in self._competing_phases.items():
+            extra = set(composition) - set(self._elements)
+            if extra:
+                raise ValueError(
+                    f"Competing phase {name} contains elements not in the host: {', '.join(sorted(extra))}"
+                )
+        self._vertices = self._find_vertices()
+        if len(self._vertices) == 0:
+            raise ValueError(
+                "The host is not stable at any chemical potentials with respect to the competing phases."
+            )
+
+    @property
+    def elements(self) -> List[str]:
+        """elements of the host, in the order used for array representations
+
+        Returns:
+            List[str]: element symbols
+        """
+        return self._elements
+
+    @property
+    def competing_phases(self) -> Dict[str, Tuple[Dict[str, float], float]]:
+        """competing phases as ``{name: (composition, formation_energy)}``
+
+        Returns:
+            Dict[str, Tuple[Dict[str, float], float]]: competing phases
+        """
+        return self._competing_phases
+
+    def constraints(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+        """linear constraints defining the region, ``A @ mu <= b`` and
+        ``host @ mu == host_formation_energy``, with ``mu`` ordered as
+        ``self.elements``.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, float]: ``A``, ``b``,
+            ``host`` and ``host_formation_energy``
+        """
+        n_elements = len(self.elements)
+        rows = [np.eye(n_elements)]
+        limits = [np.zeros(n_elements)]
+        for composition, energy in self._competing_phases.values():
+            rows.append(np.array([[composition.get(e, 0.0) for e in self.elements]]))
+            limits.append(np.array([energy]))
+        host = np.array([self._host_composition[e] for e in self.elements], dtype=float)
+        return (
+            np.vstack(rows).astype(float),
+            np.concatenate(limits).astype(float),
+            host,
+            float(self._host_formation_energy),
+        )
+
+    @property
+    def tolerance(self) -> float:
+        """tolerance used when testing whether a point satisfies the
+        stability constraints
+
+        Returns:
+            float: tolerance
+        """
+        return self._tolerance
+
+    def reduced_constraints(self) -> Tuple[np.ndarray, np.ndarray]:
+        """constraints ``A' @ x <= b'`` on the chemical potentials ``x`` of
+        all but the last element of ``self.elements``, with the last element
+        eliminated using the host formation energy (see ``expand``).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: ``A'`` and ``b'``
+        """
+        a, b, host, energy = self.constraints()
+        # mu[-1] = (energy - host[:-1] @ x) / host[-1]
+        a_reduced = a[:, :-1] - np.outer(a[:, -1], host[:-1] / host[-1])
+        b_reduced = b - a[:, -1] * energy / host[-1]
+        return a_reduced, b_reduced
+
+    def expand(self, x: np.ndarray) -> np.ndarray:
+        """full chemical potentials from reduced chemical potentials, i.e.
+        those of all but the last element of ``self.elements``
+
+        Args:
+            x (np.ndarray): reduced chemical potentials, shape
+              ``(N, n_elements - 1)``
+
+        Returns:
+            np.ndarray: chemical potentials, shape ``(N, n_elements)``, with
+            the last element fixed by the host formation energy
+        """
+        _, _, host, energy = self.constraints()
+        dependent = (energy - x @ host[:-1]) / host[-1]
+        return np.column_stack([x, dependent])
+
+    def _find_vertices(self) -> np.ndarray:
+        """enumerate the vertices of the region by solving for every
+        combination of active constraints and keeping the feasible points."""
+        a, b = self.reduced_constraints()
+        n_dims = a.shape[1]
+        vertices: List[np.ndarray] = []
+        for active in itertools.combinations(range(len(b)), n_dims):
+            rows = list(active)
+            if abs(np.linalg.det(a[rows])) < 1e-12:
+                continue
+            x = np.linalg.solve(a[rows], b[rows])
+            if np.all(a @ x <= b + self._tolerance) and not any(
+                np.allclose(x, v, atol=self._tolerance) for v in vertices
+            ):
+                vertices.append(x)
+        if not vertices:
+            return np.empty((0, n_dims + 1))
+        return self.expand(np.array(vertices))
+
+    def vertices(self) -> Dict[str, np.ndarray]:
+        """chemical potentials at the vertices of the region
+
+        Returns:
+            Dict[str, np.ndarray]: chemical potential of each element at each
+            vertex, ``{element: array}``
+        """
+        return self._as_dict(self._vertices)
+
+    def contains(self, chemical_potentials: Dict[str, np.ndarray]) -> np.ndarray:
+        """test whether points lie inside the region
+
+        Args:
+            chemical_potentials (Dict[str, np.ndarray]): chemical potential of
+              each element at each point
+
+        Returns:
+            np.ndarray: ``True`` where the point satisfies every constraint
+        """
+        a, b, host, energy = self.constraints()
+        mu = np.stack(
+            np.broadcast_arrays(
+                *[np.asarray(chemical_potentials[e], dtype=float) for e in self.elements]
+            ),
+            axis=-1,
+        )
+        return np.all(mu @ a.T <= b + self._tolerance, axis=-1) & (
+            np.abs(mu @ host - energy) <= self._tolerance
+        )
+
+    def grid(self, spacing: float) -> Dict[str, np.ndarray]:
+        """regular grid of points inside the region, with the chemical
+        potential of the last element in ``self.elements`` fixed by the host
+        formation energy.
+
+        Args:
+            spacing (float): grid spacing in eV
+
+        Returns:
+            Dict[str, np.ndarray]: chemical potential of each element at each
+            point, ``{element: array}``
+        """
+        lower = self._vertices[:, :-1].min(axis=0)
+        upper = self._vertices[:, :-1].max(axis=0)
+        axes = [
+            np.linspace(lo, hi, max(int(np.ceil((hi - lo) / spacing)) + 1, 1))
+            for lo, hi in zip(lower, upper)
+        ]
+        x = np.stack([g.ravel() for g in np.meshgrid(*axes, indexing="ij")], axis=-1)
+        return self._as_dict(self._feasible(x))
+
+    def sample(
+        self, n_points: int, seed: Optional[int] = None, max_draws: int = 100
+    ) -> Dict[str, np.ndarray]:
+        """quasi-random (Halton) sample of points inside the region, drawn
+        from its bounding box and kept if they satisfy the constraints. Where
+        the bounding box has no width (within the tolerance), e.g. because a
+        competing phase pins a chemical potential, that chemical potential is
+        held at its pinned value.
+
+        Args:
+            n_points (int): number of points
+            seed (Optional[int]): seed for the scrambled Halton sequence.
+              Defaults to ``None``.
+            max_draws (int): maximum number of batches of ``2 * n_points``
+              candidate points to draw. Defaults to 100.
+
+        Raises:
+            ValueError: if fewer than ``n_points`` points inside the region
+              are found in ``max_draws`` batches, i.e. the region has (nearly)
+              zero volume without being aligned with the axes. Use
+              ``vertices`` or ``grid`` for such regions.
+
+        Returns:
+            Dict[str, np.ndarray]: chemical potential of each element at each
+            point, ``{element: array}``
+        """
+        lower = self._vertices[:, :-1].min(axis=0)
+        upper = self._vertices[:, :-1].max(axis=0)
+        free = upper - lower > self._tolerance
+        centre = 0.5 * (lower + upper)
+        if not np.any(free):
+            return self._as_dict(self.expand(np.tile(centre, (n_points, 1))))
+        engine = qmc.Halton(int(np.count_nonzero(free)), seed=seed)
+        samples = np.empty((0, len(self.elements)))
+        for _ in range(max_draws):
+            x = np.tile(centre, (2 * n_points, 1))
+            x[:, free] = qmc.scale(engine.random(2 * n_points), lower[free], upper[free])
+            samples = np.vstack([samples, self._feasible(x)])
+            if len(samples) >= n_points:
+                return self._as_dict(samples[:n_points])
+        raise ValueError(
+            f"Only {len(samples)} of {n_points} points inside the region were found "
+            f"in {max_draws * 2 * n_points} draws; the region may have (nearly) "
+            "zero volume. Use vertices() or grid() instead."
+        )
+
+    def _feasible(self, x: np.ndarray) -> np.ndarray:
+        """full chemical potentials of the reduced points ``x`` that lie in
+        the region"""
+        a, b = self.reduced_constraints()
+        return self.expand(x[np.all(x @ a.T <= b + self._tolerance, axis=1)])
+
+    def _as_dict(self, mu: np.ndarray) -> Dict[str, np.ndarray]:
+        return {e: mu[:, i] for i, e in enumerate(self.elements)}
+
+
+def solve_stability_region(
+    defect_system: DefectSystem,
+    region: StabilityRegion,
+    spacing: Optional[float] = None,
+    n_points: Optional[int] = None,
+    seed: Optional[int] = None,
+    include_vertices: bool = True,
+    per_volume: bool = True,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """solve a ``DefectSystem`` over a ``StabilityRegion`` in a single batched
+    call to ``DefectSystem.solve_chemical_potentials``.
+
+    Args:
+        defect_system (DefectSystem): defect system, whose ``DefectSpecies``
+          define their ``stoichiometry``
+        region (StabilityRegion): region of chemical potential space
+        spacing (Optional[float]): if given, sample the region on a grid with
+          this spacing in eV. Defaults to ``None``.
+        n_points (Optional[int]): if given (and ``spacing`` is not), sample
+          this many quasi-random points. Defaults to ``None``.
+        seed (Optional[int]): seed for quasi-random sampling. Defaults to ``None``.
+        include_vertices (bool): include the vertices of the region. Defaults
+          to ``True``.
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Defaults to True.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]: chemical
+        potentials of each point, ``{element: array}``, and the solution at
+        each point as returned by ``DefectSystem.solve_batch``.
+    """
+    points = []
+    if include_vertices:
+        points.append(region.vertices())
+    if spacing is not None:
+        points.append(region.grid(spacing))
+    elif n_points is not None:
+        points.append(region.sample(n_points, seed=seed))
+    if not points:
+        raise ValueError("No points requested: give a spacing, n_points or include_vertices.")
+    chemical_potentials = {
+        e: np.concatenate([p[e] for p in points]) for e in region.elements
+    }
+    results = defect_system.solve_chemical_potentials(
+        chemical_potentials, per_volume=per_volume
+    )
+    return chemical_potentials, results
+
+
+def doping_limit(
+    defect_system: DefectSystem,
+    region: StabilityRegion,
+    target: str = "n0",
+    chemical_potentials: Optional[Dict[str, float]] = None,
+    temperature: Optional[float] = None,
+    per_volume: bool = True,
+    tolerance: float = 1e-8,
+    max_iterations: int = 100,
+) -> Tuple[Dict[str, float], Dict[str, np.ndarray]]:
+    """find the chemical potentials inside a ``StabilityRegion`` that
+    maximise the electron (or hole) concentration of a ``DefectSystem``.
+
+    ``log(target)`` is maximised by sequential least squares programming
+    subject to the linear stability constraints of ``region``, starting from
+    the best of its vertices and its centroid. The gradient is evaluated
+    analytically from the formation energy sensitivities of the solution
+    (see ``DefectSystem.sensitivities``) and the stoichiometry of each
+    ``DefectSpecies``, so each iteration costs one Fermi energy solve.
+    If the optimizer fails, or stops outside the region, a warning is issued
+    and the best starting point is returned instead.
+
+    Args:
+        defect_system (DefectSystem): defect system, whose ``DefectSpecies``
+          define their ``stoichiometry``
+        region (StabilityRegion): region of chemical potential space
+        target (str): ``"n0"`` or ``"p0"``. Defaults to ``"n0"``.
+        chemical_potentials (Optional[Dict[str, float]]): fixed chemical
+          potentials of elements not in ``region``, e.g. a dopant at its
+          solubility limit. Defaults to ``None``.
+        temperature (Optional[float]): temperature. Defaults to
+          ``defect_system.temperature``.
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Defaults to True.
+        tolerance (float): convergence tolerance of the optimizer on
+          ``log(target)``. Defaults to ``1e-8``.
+        max_iterations (int): maximum number of optimizer iterations.
+          Defaults to 100.
+
+    Raises:
+        ValueError: if ``target`` is not ``"n0"`` or ``"p0"``
+
+    Returns:
+        Tuple[Dict[str, float], Dict[str, np.ndarray]]: chemical potential of
+        each element at the optimum and the solution there, as returned by
+        ``DefectSystem.solve_chemical_potentials``.
+    """
+    if target not in ("n0", "p0"):
+        raise ValueError(f"target must be n0 or p0, not {target}")
+    if temperature is None:
+        temperature = defect_system.temperature
+    fixed_mu: Dict[str, ArrayLike] = dict(chemical_potentials or {})
+    arrays = batch.charge_state_arrays(defect_system.defect_species)
+    # d(formation energy of each charge state) / d(mu of each host element)
+    energy_gradient = -np.array(
+        [
+            [defect_system.defect_species[i].stoichiometry.get(e, 0) for e in region.elements]
+            for i in arrays.species_index
+        ],
+        dtype=float,
+    )
+    _, _, host, _ = region.constraints()
+    # d(mu) / d(reduced mu), with the last element fixed by the host
+    expansion = np.vstack([np.eye(len(host) - 1), -host[:-1] / host[-1]])
+    a, b = region.reduced_constraints()
+    row = 1 if target == "p0" else 2
+
+    def chemical_potentials_at(x: np.ndarray) -> Dict[str, ArrayLike]:
+        mu = region.expand(np.atleast_2d(x))
+        return {**fixed_mu, **{e: mu[:, i] for i, e in enumerate(region.elements)}}
+
+    def objective(x: np.ndarray) -> Tuple[float, np.ndarray]:
+        shifts = defect_system.chemical_potential_shifts(chemical_potentials_at(x))
+        _, conditions = batch.build_conditions(arrays, [temperature], shifts)
+        e_fermi, _ = batch.solve(
+            arrays,
+            defect_system.dos,
+            conditions,
+            convergence_tolerance=defect_system.convergence_tolerance,
+            n_trial_steps=defect_system.n_trial_steps,
+        )
+        p0, n0 = batch.carrier_concentrations(defect_system.dos, e_fermi, conditions.temperature)
+        value = (p0 if target == "p0" else n0)[0]
+        jacobian = batch.sensitivities(arrays, defect_system.dos, e_fermi, conditions)[0]
+        d_mu = jacobian[row, : arrays.n_charge_states] @ energy_gradient / value
+        return -np.log(value), -(d_mu @ expansion)
+
+    vertices = region.vertices()
+    vertices_x = np.column_stack([vertices[e] for e in region.elements[:-1]])
+    starts = np.vstack([vertices_x, vertices_x.mean(axis=0)])
+    start_results = defect_system.solve_chemical_potentials(
+        chemical_potentials_at(starts), temperature=temperature
+    )
+    x0 = starts[np.argmax(start_results[target])]
+    optimum = minimize(
+        objective,
+        x0,
+        jac=True,
+        method="SLSQP",
+        constraints=[
+            {
+                "type": "ineq",
+                "fun": lambda x: b - a @ x,
+                "jac": lambda x: -a,
+            }
+        ],
+        options={"ftol": tolerance, "maxiter": max_iterations},
+    )
+    # SLSQP can stop at an infeasible iterate when it fails, so its result is
+    # only used if it converged inside the region and improves on the start
+    feasible = np.all(a @ optimum.x <= b + region.tolerance)
+    if not (optimum.success and feasible):
+        warnings.warn(
+            f"The optimizer did not converge inside the stability region "
+            f"({optimum.message}); returning the best starting point instead."
+        )
+        x = x0
+    else:
+        x = optimum.x if optimum.fun <= objective(x0)[0] else x0
+    mu = {e: float(np.ravel(v)[0]) for e, v in chemical_potentials_at(x).items()}
+    return mu, defect_system.solve_chemical_potentials(
+        mu, temperature=temperature, per_volume=per_volume
+    )
@@ -0,0 +1,65 @@
+"""Command line tools, and the helpers they share for reading inputs and
+labelling charge states."""
+
+from typing import Any
+
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.inputs import InputSet
+
+
+def load_defect_system(
+    input_file: str,
+    structure_file: str = "",
+    dos_file: str = "",
+    frozen: bool = False,
+    convergence_tolerance: float = 1e-19,
+    n_trial_steps: int = 1500,
+) -> DefectSystem:
+    """read a ``DefectSystem`` from a ``.yaml`` file or from SC-Fermi
+    formatted input files, as ``sc_fermi_solve`` does.
+
+    Args:
+        input_file (str): path to the input file defining the defect system
+        structure_file (str): path to a structure file giving the volume.
+          Defaults to an empty string.
+        dos_file (str): path to a file giving the density of states. Defaults
+          to an empty string.
+        frozen (bool): whether SC-Fermi inputs include frozen defects.
+          Defaults to False.
+        convergence_tolerance (float): convergence tolerance for SC-Fermi
+          inputs. Defaults to 1e-19.
+        n_trial_steps (int): maximum number of trial steps for SC-Fermi
+          inputs. Defaults to 1500.
+
+    Returns:
+        DefectSystem: the defect system
+    """
+    if input_file.endswith(".yaml"):
+        return DefectSystem.from_yaml(
+            input_file, structure_file=structure_file, dos_file=dos_file
+        )
+    input_data = InputSet.from_sc_fermi_inputs(
+        input_file=input_file,
+        structure_file=structure_file,
+        dos_file=dos_file,
+        frozen=frozen,
+        convergence_tolerance=convergence_tolerance,
+        n_trial_steps=n_trial_steps,
+    )
+    return DefectSystem.from_input_set(input_data)
+
+
+def parse_label(label: str) -> Any:
+    """``"name"`` or ``"name charge"`` as a ``solve_batch`` key
+
+    Args:
+        label (str): species name, or species name and charge
+
+    Returns:
+        Any: ``name`` or ``(name, charge)``
+    """
+    name, _, charge = label.rpartition(" ")
+    try:
+        return (name, int(charge)) if name else label
+    except ValueError:
+        return label
@@ -1,13 +1,28 @@
-from py_sc_fermi.inputs import InputSet
-from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.cli import load_defect_system, server, sweep
+from py_sc_fermi.results import SweepResult
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
 import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import numpy as np
 import yaml
 
+SUMMARY_QUANTITIES = ["temperature", "Fermi Energy", "p0", "n0"]
+OUTPUT_FORMATS = ["yaml", "json", "npz"]
+
 
 def parse_command_line_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        "input_file", type=str, help="Path to input file defining the defect system"
+        "input_files",
+        type=str,
+        nargs="+",
+        help="Paths or glob patterns of input files defining the defect systems, "
+        "or directories containing .yaml input files",
     )
     parser.add_argument(
         "-s",
@@ -38,42 +53,276 @@ def parse_command_line_arguments():
         "-n", "--n_trial", help="maximum number of trial steps", type=int, default=1500
     )
     parser.add_argument("-b", "--band_gap", help="band gap of bulk system")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of worker processes used to solve the inputs",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        help="directory to write outputs to. By default a single input is "
+        "written to py_sc_fermi_out.<format> in the current directory, and each "
+        "of several inputs to <input name>_py_sc_fermi_out.<format> beside the "
+        "input",
+        default=None,
+    )
+    parser.add_argument(
+        "--summary",
+        help="path of the summary table written when solving several inputs",
+        default="py_sc_fermi_summary.csv",
+    )
+    parser.add_argument(
+        "--format",
+        help="format of the output files",
+        choices=OUTPUT_FORMATS,
+        default="yaml",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        help="do not print the report of each solved defect system",
+        action="store_true",
+    )
     return parser.parse_args()
 
 
-def main():
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """expand the input arguments into a list of input files. Glob patterns
+    are expanded, and directories are replaced by the ``.yaml`` files they
+    contain.
+
+    Args:
+        patterns (List[str]): input paths, glob patterns or directories
+
+    Returns:
+        List[str]: input files, in the order given, without repeats
     """
-    read in input files for a defect system and return the defect system dumped
-    to a yaml file.
+    files: List[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.yaml")))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern]
+        files.extend(f for f in matches if f not in files)
+    return files
+
+
+def output_filenames(
+    input_files: List[str], output_dir: Optional[str] = None, output_format: str = "yaml"
+) -> List[str]:
+    """the output file for each input file
+
+    Args:
+        input_files (List[str]): input files
+        output_dir (Optional[str]): directory to write outputs to. Defaults to
+          ``None``.
+        output_format (str): output format, used as the file extension.
+          Defaults to ``"yaml"``.
+
+    Raises:
+        ValueError: if two inputs would be written to the same output file
+
+    Returns:
+        List[str]: output files
     """
-    args = parse_command_line_arguments()
-    input_file = args.input_file
-    structure_file = args.structure_file
-    dos_file = args.dos_file
-    frozen_defects = args.frozen_defects
-    convergence_tol = args.convergence_tol
-    n_trial = args.n_trial
-
-    if input_file.endswith(".yaml"):
-        defect_system = DefectSystem.from_yaml(
-            input_file, structure_file=structure_file, dos_file=dos_file
+    if len(input_files) == 1 and output_dir is None:
+        return [f"py_sc_fermi_out.{output_format}"]
+    outputs = []
+    for input_file in input_files:
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        directory = output_dir if output_dir is not None else os.path.dirname(input_file)
+        outputs.append(os.path.join(directory, f"{stem}_py_sc_fermi_out.{output_format}"))
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(
+            "Several inputs have the same name; their outputs would overwrite "
+            "each other in the output directory"
         )
+    return outputs
+
+
+def write_output(dump_dict: Dict[str, Any], filename: str, output_format: str = "yaml") -> None:
+    """write the decomposed concentrations of a solved defect system
+
+    Args:
+        dump_dict (Dict[str, Any]): ``DefectSystem.concentration_dict`` with
+          ``decomposed=True``, and the ``"temperature"``
+        filename (str): path of the output file
+        output_format (str): ``"yaml"``, ``"json"``, or ``"npz"`` (a one-point
+          ``SweepResult``, with a column for each charge state). Defaults to
+          ``"yaml"``.
+
+    Raises:
+        ValueError: if ``output_format`` is not supported
+    """
+    if output_format == "yaml":
+        with open(filename, "w") as f:
+            yaml.dump(dump_dict, f)
+    elif output_format == "json":
+        with open(filename, "w") as f:
+            json.dump(dump_dict, f, indent=2)
+    elif output_format == "npz":
+        quantities: List[Any] = []
+        values: List[float] = []
+        for key, value in dump_dict.items():
+            if key == "temperature":
+                continue
+            if isinstance(value, dict):
+                quantities.extend((key, q) for q in value)
+                values.extend(value.values())
+            else:
+                quantities.append(key)
+                values.append(value)
+        data = np.array([[dump_dict["temperature"], *values]], dtype=float)
+        SweepResult([("temperature",)], quantities, data).save(filename)
     else:
-        input_data = InputSet.from_sc_fermi_inputs(
-            input_file=input_file,
+        raise ValueError(f"Unsupported output format {output_format!r}")
+
+
+def solve_input(
+    input_file: str,
+    output_file: str,
+    structure_file: str = "",
+    dos_file: str = "",
+    frozen: bool = False,
+    convergence_tolerance: float = 1e-19,
+    n_trial_steps: int = 1500,
+    report: bool = True,
+    output_format: str = "yaml",
+) -> Dict[str, Any]:
+    """solve one input file and write its concentrations to ``output_file``.
+    The self-consistent Fermi energy is found once, and both the report and
+    the output are derived from it. Any error is recorded in the returned
+    summary rather than raised, so that one bad input does not stop a batch.
+
+    Args:
+        input_file (str): path to the input file
+        output_file (str): path of the output file, written in
+          ``output_format``
+        structure_file (str): path to a structure file giving the volume.
+          Defaults to an empty string.
+        dos_file (str): path to a file giving the density of states. Defaults
+          to an empty string.
+        frozen (bool): whether frozen defects are present. Defaults to False.
+        convergence_tolerance (float): convergence tolerance. Defaults to 1e-19.
+        n_trial_steps (int): maximum number of trial steps. Defaults to 1500.
+        report (bool): whether to print the report of the solved system.
+          Defaults to True.
+        output_format (str): format of the output file (see
+          ``write_output``). Defaults to ``"yaml"``.
+
+    Returns:
+        Dict[str, Any]: summary of the input: its name, ``"status"``
+        (``"ok"`` or ``"failed"``), ``"output"``, ``"error"``, and, if it
+        was solved, the temperature, Fermi energy, carrier concentrations and
+        defect species concentrations.
+    """
+    summary: Dict[str, Any] = {
+        "input": input_file,
+        "status": "failed",
+        "output": "",
+        "error": "",
+    }
+    try:
+        defect_system = load_defect_system(
+            input_file,
             structure_file=structure_file,
             dos_file=dos_file,
-            frozen=frozen_defects,
-            convergence_tolerance=convergence_tol,
-            n_trial_steps=n_trial,
+            frozen=frozen,
+            convergence_tolerance=convergence_tolerance,
+            n_trial_steps=n_trial_steps,
         )
-        defect_system = DefectSystem.from_input_set(input_data)
-    defect_system.report()
+        e_fermi = defect_system.get_sc_fermi()[0]
+        if report:
+            defect_system.report(e_fermi)
+
+        dump_dict = defect_system.concentration_dict(decomposed=True, e_fermi=e_fermi)
+        dump_dict["temperature"] = defect_system.temperature
+        write_output(dump_dict, output_file, output_format)
+    except Exception as error:
+        summary["error"] = f"{type(error).__name__}: {error}"
+        return summary
+    summary.update(status="ok", output=output_file)
+    for key, value in dump_dict.items():
+        summary[key] = sum(value.values()) if isinstance(value, dict) else value
+    return summary
+
+
+def write_summary(filename: str, summaries: List[Dict[str, Any]]) -> None:
+    """write the summaries of a batch of inputs as a CSV table, with one row
+    per input and a column for every defect species in any input.
+
+    Args:
+        filename (str): path of the CSV file
+        summaries (List[Dict[str, Any]]): summaries returned by ``solve_input``
+    """
+    columns = ["input", "status", "output", "error"] + SUMMARY_QUANTITIES
+    for summary in summaries:
+        columns.extend(k for k in summary if k not in columns)
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(summaries)
+
+
+def main():
+    """
+    read in input files for one or more defect systems and dump each solved
+    defect system to a yaml file. When several inputs are given, a summary
+    table of all of them is also written. ``sc_fermi_solve serve`` instead
+    starts a solver daemon (see ``py_sc_fermi.cli.server``), and
+    ``sc_fermi_solve sweep`` solves one input over a grid of conditions (see
+    ``py_sc_fermi.cli.sweep``).
+    """
+    if sys.argv[1:2] == ["serve"]:
+        server.main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["sweep"]:
+        sweep.main(sys.argv[2:])
+        return
+    args = parse_command_line_arguments()
+    input_files = expand_inputs(args.input_files)
+    if not input_files:
+        sys.exit("No input files found")
+    try:
+        output_files = output_filenames(input_files, args.output_dir, args.format)
+    except ValueError as error:
+        sys.exit(str(error))
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    n = len(input_files)
+    options = [
+        [args.structure_file] * n,
+        [args.dos_file] * n,
+        [args.frozen_defects] * n,
+        [args.convergence_tol] * n,
+        [args.n_trial] * n,
+        [n == 1 and not args.quiet] * n,
+        [args.format] * n,
+    ]
+    if args.jobs > 1 and n > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            summaries = list(executor.map(solve_input, input_files, output_files, *options))
+    else:
+        summaries = list(map(solve_input, input_files, output_files, *options))
 
-    dump_dict = defect_system.concentration_dict(decomposed=True)
-    dump_dict["temperature"] = defect_system.temperature
-    with open("py_sc_fermi_out.yaml", "w") as f:
-        yaml.dump(dump_dict, f)
+    failed = [s for s in summaries if s["status"] != "ok"]
+    for summary in failed:
+        print(f"{summary['input']}: {summary['error']}", file=sys.stderr)
+    if n > 1:
+        write_summary(args.summary, summaries)
+        if not args.quiet:
+            print(
+                f"Solved {n - len(failed)} of {n} inputs; "
+                f"summary written to {args.summary}"
+            )
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,371 @@
+"""Long-running solver daemon for ``sc_fermi_solve serve``.
+
+The daemon keeps parsed ``DefectSystem`` objects (including their ``DOS``)
+resident between requests, so a client pays the interpreter start-up, import
+and parsing cost once rather than on every solve. Requests and responses are
+single-line JSON objects, read from stdin and written to stdout, or exchanged
+over a Unix socket (one request per line, any number per connection).
+
+Each request names a ``command`` and the input ``system`` it applies to::
+
+    {"id": 1, "command": "solve", "system": "defect_system.yaml"}
+    {"id": 2, "command": "sweep", "system": "defect_system.yaml",
+     "temperature": [300, 600, 900], "energy_shifts": {"V_O": [0, 0.1, 0.2]}}
+    {"id": 3, "command": "update", "system": "defect_system.yaml",
+     "energies": {"V_O 2": 1.2}, "temperature": 500}
+
+``structure_file`` and ``dos_file`` may be given alongside ``system``, as for
+``sc_fermi_solve``. Charge states are labelled ``"name charge"``, as in
+``py_sc_fermi.results.label_name``. Every response echoes the request ``id``
+and has a ``status`` of ``"ok"``, with a ``result``, or ``"error"``, with an
+``error`` message.
+"""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, IO, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from py_sc_fermi.cli import load_defect_system, parse_label
+from py_sc_fermi.defect_system import DefectSystem
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+class _Entry:
+    """a resident ``DefectSystem`` and the lock serialising its use"""
+
+    def __init__(self, defect_system: DefectSystem):
+        self.defect_system = defect_system
+        self.lock = threading.Lock()
+
+
+class SolverServer:
+    """Handles daemon requests, keeping up to ``max_systems`` parsed
+    ``DefectSystem`` objects resident and evicting the least recently used.
+
+    Requests for different systems are handled concurrently; requests for the
+    same system are serialised, because ``update`` modifies it in place. A
+    system is parsed again if its input file has been modified since it was
+    loaded, which discards any updates.
+
+    Args:
+        max_systems (int): maximum number of resident systems. Defaults to 64.
+        frozen (bool): whether SC-Fermi inputs include frozen defects.
+          Defaults to False.
+        convergence_tolerance (float): convergence tolerance for SC-Fermi
+          inputs. Defaults to 1e-19.
+        n_trial_steps (int): maximum number of trial steps for SC-Fermi
+          inputs. Defaults to 1500.
+
+    Raises:
+        ValueError: if ``max_systems`` is less than 1
+    """
+
+    def __init__(
+        self,
+        max_systems: int = 64,
+        frozen: bool = False,
+        convergence_tolerance: float = 1e-19,
+        n_trial_steps: int = 1500,
+    ):
+        if max_systems < 1:
+            raise ValueError("max_systems must be at least 1")
+        self.max_systems = max_systems
+        self.frozen = frozen
+        self.convergence_tolerance = convergence_tolerance
+        self.n_trial_steps = n_trial_steps
+        self._systems: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._commands: Dict[str, Callable[[DefectSystem, Mapping[str, Any]], Any]] = {
+            "solve": self._solve,
+            "sweep": self._sweep,
+            "update": self._update,
+        }
+
+    def __len__(self) -> int:
+        return len(self._systems)
+
+    def _entry(self, request: Mapping[str, Any]) -> _Entry:
+        paths = tuple(
+            os.path.abspath(request[k]) if request.get(k) else ""
+            for k in ("system", "structure_file", "dos_file")
+        )
+        key = paths + tuple(os.path.getmtime(p) if p else 0.0 for p in paths)
+        with self._lock:
+            if key in self._systems:
+                self._systems.move_to_end(key)
+                return self._systems[key]
+        # parse outside the lock, so other systems can be served meanwhile
+        entry = _Entry(
+            load_defect_system(
+                request["system"],
+                structure_file=request.get("structure_file", ""),
+                dos_file=request.get("dos_file", ""),
+                frozen=self.frozen,
+                convergence_tolerance=self.convergence_tolerance,
+                n_trial_steps=self.n_trial_steps,
+            )
+        )
+        with self._lock:
+            entry = self._systems.setdefault(key, entry)
+            self._systems.move_to_end(key)
+            while len(self._systems) > self.max_systems:
+                self._systems.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _solve(
+        defect_system: DefectSystem,
+        request: Mapping[str, Any],
+        e_fermi: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        result = defect_system.concentration_dict(
+            decomposed=request.get("decomposed", False),
+            per_volume=request.get("per_volume", True),
+            e_fermi=e_fermi,
+        )
+        result["temperature"] = defect_system.temperature
+        return result
+
+    @staticmethod
+    def _sweep(defect_system: DefectSystem, request: Mapping[str, Any]) -> Dict[str, Any]:
+        return defect_system.solve_batch(
+            temperature=request.get("temperature"),
+            energy_shifts={
+                parse_label(k): v for k, v in request.get("energy_shifts", {}).items()
+            },
+            fixed={parse_label(k): v for k, v in request.get("fixed", {}).items()},
+            per_volume=request.get("per_volume", True),
+        )
+
+    @classmethod
+    def _update(cls, defect_system: DefectSystem, request: Mapping[str, Any]) -> Dict[str, Any]:
+        def charge_state(label: str):
+            key = parse_label(label)
+            if not isinstance(key, tuple):
+                raise ValueError(f"{label!r} does not name a charge state")
+            return defect_system.defect_species_by_name(key[0]).charge_states[key[1]]
+
+        for label, energy in request.get("energies", {}).items():
+            charge_state(label).set_energy(energy)
+        for label, concentration in request.get("fixed", {}).items():
+            if isinstance(parse_label(label), tuple):
+                charge_state(label).fix_concentration(concentration)
+            else:
+                defect_system.defect_species_by_name(label).fix_concentration(concentration)
+        if "temperature" in request:
+            defect_system.temperature = request["temperature"]
+        # a resident system is updated repeatedly, so only the species that
+        # changed are recomputed, starting from the previous Fermi energy
+        e_fermi, _ = defect_system.get_sc_fermi(incremental=True)
+        return cls._solve(defect_system, request, e_fermi)
+
+    def handle(self, request: Mapping[str, Any]) -> Dict[str, Any]:
+        """handle one request
+
+        Args:
+            request (Mapping[str, Any]): the decoded request
+
+        Returns:
+            Dict[str, Any]: the response. Errors are reported in the response
+            rather than raised.
+        """
+        response: Dict[str, Any] = {"id": request.get("id")}
+        try:
+            command = self._commands.get(request.get("command", ""))
+            if command is None:
+                raise ValueError(f"Unknown command {request.get('command')!r}")
+            if "system" not in request:
+                raise ValueError("Request has no 'system'")
+            entry = self._entry(request)
+            with entry.lock:
+                response["result"] = command(entry.defect_system, request)
+            response["status"] = "ok"
+        except Exception as error:
+            response["status"] = "error"
+            response["error"] = f"{type(error).__name__}: {error}"
+        return response
+
+    def handle_line(self, line: str) -> str:
+        """handle one JSON-encoded request
+
+        Args:
+            line (str): the request, as a line of JSON
+
+        Returns:
+            str: the JSON-encoded response, without a trailing newline
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as error:
+            response: Dict[str, Any] = {"id": None, "status": "error", "error": str(error)}
+        else:
+            response = self.handle(request)
+        return json.dumps(response, default=_json_default)
+
+    def serve_stream(
+        self, infile: IO[str] = sys.stdin, outfile: IO[str] = sys.stdout, n_jobs: int = 4
+    ) -> None:
+        """serve requests read line by line from ``infile`` until it is
+        closed, writing each response to ``outfile`` as soon as it is ready.
+        Up to ``n_jobs`` requests are handled at a time, so responses may be
+        written out of order; match them to requests by ``id``. No more
+        requests are read while ``n_jobs`` are in progress, so a client
+        that writes faster than requests are solved is held back rather
+        than queueing without limit.
+
+        Args:
+            infile (IO[str]): stream to read requests from. Defaults to stdin.
+            outfile (IO[str]): stream to write responses to. Defaults to
+              stdout.
+            n_jobs (int): number of requests handled concurrently. Defaults
+              to 4.
+
+        Raises:
+            ValueError: if ``n_jobs`` is less than 1
+        """
+        if n_jobs < 1:
+            raise ValueError("n_jobs must be at least 1")
+        write_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(n_jobs)
+
+        def respond(line: str) -> None:
+            try:
+                response = self.handle_line(line)
+                with write_lock:
+                    outfile.write(response + "\n")
+                    outfile.flush()
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            for line in infile:
+                if line.strip():
+                    slots.acquire()
+                    executor.submit(respond, line)
+
+    def serve_unix_socket(self, path: str, n_jobs: int = 4) -> None:
+        """serve requests over a Unix socket at ``path`` until interrupted.
+        Each connection is handled in its own thread, and may send any number
+        of requests, one per line; the responses to a connection are written
+        in the order of its requests. Up to ``n_jobs`` requests are handled at
+        a time across all connections.
+
+        Args:
+            path (str): path of the socket, replaced if it already exists
+            n_jobs (int): number of requests handled concurrently. Defaults
+              to 4.
+        """
+        with self.unix_socket_server(path, n_jobs) as server:
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(path)
+
+    def unix_socket_server(
+        self, path: str, n_jobs: int = 4
+    ) -> "socketserver.ThreadingUnixStreamServer":
+        """an unstarted server for requests over a Unix socket at ``path``,
+        as used by ``serve_unix_socket``
+
+        Args:
+            path (str): path of the socket, replaced if it already exists
+            n_jobs (int): number of requests handled concurrently. Defaults
+              to 4.
+
+        Raises:
+            ValueError: if ``n_jobs`` is less than 1
+
+        Returns:
+            socketserver.ThreadingUnixStreamServer: the bound server
+        """
+        if n_jobs < 1:
+            raise ValueError("n_jobs must be at least 1")
+        solver_server = self
+        slots = threading.BoundedSemaphore(n_jobs)
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.decode()
+                    if line.strip():
+                        with slots:
+                            response = solver_server.handle_line(line)
+                        self.wfile.write((response + "\n").encode())
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """run ``sc_fermi_solve serve``
+
+    Args:
+        argv (Optional[List[str]]): command line arguments after ``serve``.
+          Defaults to ``None`` (read from ``sys.argv``).
+    """
+    parser = argparse.ArgumentParser(
+        prog="sc_fermi_solve serve",
+        description="keep defect systems resident and solve JSON requests",
+    )
+    parser.add_argument(
+        "--socket",
+        help="path of a Unix socket to listen on, rather than stdin and stdout",
+        default=None,
+    )
+    parser.add_argument(
+        "-j", "--jobs", help="number of requests handled at a time", type=int, default=4
+    )
+    parser.add_argument(
+        "-m",
+        "--max_systems",
+        help="maximum number of resident defect systems",
+        type=int,
+        default=64,
+    )
+    parser.add_argument(
+        "-f",
+        "--frozen_defects",
+        help="frozen defects present in SC-Fermi input files",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c",
+        "--convergence_tol",
+        help="convergence tolerance",
+        type=float,
+        default=1e-19,
+    )
+    parser.add_argument(
+        "-n", "--n_trial", help="maximum number of trial steps", type=int, default=1500
+    )
+    args = parser.parse_args(argv)
+    server = SolverServer(
+        max_systems=args.max_systems,
+        frozen=args.frozen_defects,
+        convergence_tolerance=args.convergence_tol,
+        n_trial_steps=args.n_trial,
+    )
+    if args.socket:
+        server.serve_unix_socket(args.socket, n_jobs=args.jobs)
+    else:
+        server.serve_stream(n_jobs=args.jobs)
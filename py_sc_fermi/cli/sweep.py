@@ -0,0 +1,310 @@
+"""``sc_fermi_solve sweep``: solve one input over a grid of conditions.
+
+Each swept quantity is given as a range ``start:stop:step`` (``stop``
+included), a comma-separated list of values, or a single value. The grid is
+the outer product of every range, and is solved in one warm-started,
+vectorised call, so the input and its density of states are parsed once.
+Elemental chemical potentials are applied as formation energy shifts through
+the stoichiometry of each defect species. The results are written to a
+columnar ``.npz`` file (see ``py_sc_fermi.results.SweepResult``) or a ``.csv``
+file.
+"""
+
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from py_sc_fermi.cli import load_defect_system, parse_label
+from py_sc_fermi.results import SweepResult, label_name
+
+
+def parse_range(text: str) -> np.ndarray:
+    """values of a range ``start:stop:step`` (including ``stop``), a
+    comma-separated list, or a single value
+
+    Args:
+        text (str): the range
+
+    Raises:
+        argparse.ArgumentTypeError: if ``text`` is not a valid range
+
+    Returns:
+        np.ndarray: the values
+    """
+    try:
+        if ":" in text:
+            start, stop, step = (float(v) for v in text.split(":"))
+            if step == 0 or (stop - start) * step < 0:
+                raise ValueError
+            return np.arange(start, stop + 0.5 * step, step)
+        return np.array([float(v) for v in text.split(",")])
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{text!r} is not a value, a list of values or a range start:stop:step"
+        )
+
+
+def parse_shift(text: str) -> Tuple[Any, np.ndarray]:
+    """a ``solve_batch`` energy shift key and its values from
+    ``"name=range"`` or ``"name charge=range"``
+
+    Args:
+        text (str): the shift
+
+    Raises:
+        argparse.ArgumentTypeError: if ``text`` is not a valid shift
+
+    Returns:
+        Tuple[Any, np.ndarray]: the key and its values
+    """
+    label, equals, values = text.rpartition("=")
+    if not equals or not label:
+        raise argparse.ArgumentTypeError(f"{text!r} is not of the form name=range")
+    return parse_label(label), parse_range(values)
+
+
+def parse_chemical_potential(text: str) -> Tuple[str, np.ndarray]:
+    """an element and its chemical potentials from ``"element=range"``
+
+    Args:
+        text (str): the chemical potential
+
+    Raises:
+        argparse.ArgumentTypeError: if ``text`` is not a valid chemical
+          potential
+
+    Returns:
+        Tuple[str, np.ndarray]: the element and its values
+    """
+    element, equals, values = text.rpartition("=")
+    if not equals or not element.strip():
+        raise argparse.ArgumentTypeError(f"{text!r} is not of the form element=range")
+    return element.strip(), parse_range(values)
+
+
+def grid(axes: List[Tuple[Any, np.ndarray]]) -> Dict[Any, np.ndarray]:
+    """the flattened outer product of several ranges, with the last range
+    varying fastest, so that neighbouring points differ in one value
+
+    Args:
+        axes (List[Tuple[Any, np.ndarray]]): label and values of each range
+
+    Returns:
+        Dict[Any, np.ndarray]: the value of each label at every grid point
+    """
+    shape = tuple(len(values) for _, values in axes)
+    points = {}
+    for i, (label, values) in enumerate(axes):
+        axis_shape = [1] * len(axes)
+        axis_shape[i] = -1
+        points[label] = np.broadcast_to(values.reshape(axis_shape), shape).ravel()
+    return points
+
+
+def parse_command_line_arguments(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="sc_fermi_solve sweep",
+        description="solve a defect system over a grid of temperatures and "
+        "formation energy shifts",
+    )
+    parser.add_argument(
+        "input_file", type=str, help="Path to input file defining the defect system"
+    )
+    parser.add_argument(
+        "-s",
+        "--structure_file",
+        help="Path to structure file giving the volume of a defect system",
+        default="",
+    )
+    parser.add_argument(
+        "-d",
+        "--dos_file",
+        help="Path to file specifying the totdos of the system",
+        default="",
+    )
+    parser.add_argument(
+        "-f",
+        "--frozen_defects",
+        help="frozen defects present in the defect system",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c",
+        "--convergence_tol",
+        help="convergence tolerance",
+        type=float,
+        default=1e-19,
+    )
+    parser.add_argument(
+        "-n", "--n_trial", help="maximum number of trial steps", type=int, default=1500
+    )
+    parser.add_argument(
+        "-t",
+        "--temperature",
+        help="temperatures, e.g. 300:1500:50. Defaults to the input temperature",
+        type=parse_range,
+        default=None,
+    )
+    parser.add_argument(
+        "--anneal_temperature",
+        help="anneal temperatures; requires --quench_temperature",
+        type=parse_range,
+        default=None,
+    )
+    parser.add_argument(
+        "--quench_temperature",
+        help="quench temperatures; requires --anneal_temperature",
+        type=parse_range,
+        default=None,
+    )
+    parser.add_argument(
+        "-e",
+        "--shift",
+        help='formation energy shifts of a species or charge state, e.g. V_O=0:0.5:0.1 '
+        'or "V_O 2=-0.1,0,0.1". May be repeated',
+        type=parse_shift,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--chemical_potential",
+        help="chemical potentials of an element, e.g. O=-2:0:0.1, applied through "
+        "the stoichiometry of each defect species. May be repeated",
+        type=parse_chemical_potential,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--per_cell",
+        help="write concentrations per unit cell rather than per cm^3",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="output file, .csv or else .npz (appended if missing)",
+        default="py_sc_fermi_sweep.npz",
+    )
+    args = parser.parse_args(argv)
+    quench = (args.anneal_temperature is None, args.quench_temperature is None)
+    if quench[0] != quench[1]:
+        parser.error("--anneal_temperature and --quench_temperature must be given together")
+    if len({key for key, _ in args.shift}) != len(args.shift):
+        parser.error("each species or charge state may only be shifted once")
+    elements = [element for element, _ in args.chemical_potential]
+    if len(set(elements)) != len(elements):
+        parser.error("each element may only be given one chemical potential")
+    if not quench[0] and args.temperature is not None:
+        parser.error("--temperature cannot be combined with an anneal and quench")
+    return args
+
+
+def run_sweep(args: argparse.Namespace) -> SweepResult:
+    """solve the sweep described by the parsed command line arguments
+
+    Args:
+        args (argparse.Namespace): parsed arguments
+
+    Raises:
+        ValueError: if chemical potentials are given but not for every element
+          in the stoichiometry of the defect species
+
+    Returns:
+        SweepResult: one row per grid point. For an anneal and quench, the
+        quantities are those after the quench, followed by the anneal
+        quantities labelled ``("anneal", quantity)``.
+    """
+    defect_system = load_defect_system(
+        args.input_file,
+        structure_file=args.structure_file,
+        dos_file=args.dos_file,
+        frozen=args.frozen_defects,
+        convergence_tolerance=args.convergence_tol,
+        n_trial_steps=args.n_trial,
+    )
+    axes: List[Tuple[Any, np.ndarray]]
+    if args.anneal_temperature is not None:
+        axes = [
+            (("anneal_temperature",), args.anneal_temperature),
+            (("quench_temperature",), args.quench_temperature),
+        ]
+    else:
+        temperature = args.temperature
+        if temperature is None:
+            temperature = np.array([float(defect_system.temperature)])
+        axes = [(("temperature",), temperature)]
+    shift_labels = {}
+    for key, values in args.shift:
+        shift_labels[key] = ("energy", *key) if isinstance(key, tuple) else ("energy", key)
+        axes.append((shift_labels[key], values))
+    for element, values in args.chemical_potential:
+        axes.append((("chemical_potential", element), values))
+    points = grid(axes)
+    energy_shifts = {key: points[label] for key, label in shift_labels.items()}
+    if args.chemical_potential:
+        shifts = defect_system.chemical_potential_shifts(
+            {
+                element: points[("chemical_potential", element)]
+                for element, _ in args.chemical_potential
+            }
+        )
+        for name, shift in shifts.items():
+            energy_shifts[name] = energy_shifts.get(name, 0.0) + shift
+
+    results: Dict[Any, np.ndarray]
+    if args.anneal_temperature is not None:
+        anneal, quench = defect_system.solve_quench(
+            points[("anneal_temperature",)],
+            points[("quench_temperature",)],
+            energy_shifts=energy_shifts,
+            per_volume=not args.per_cell,
+            warm_start=True,
+        )
+        results = {**quench, **{("anneal", k): v for k, v in anneal.items()}}
+    else:
+        results = defect_system.solve_batch(
+            temperature=points[("temperature",)],
+            energy_shifts=energy_shifts,
+            per_volume=not args.per_cell,
+            warm_start=True,
+        )
+    data = np.column_stack([*points.values(), *results.values()])
+    return SweepResult(list(points), list(results), data)
+
+
+def write(result: SweepResult, filename: str) -> str:
+    """write a ``SweepResult`` to a ``.csv`` file, or else a ``.npz`` file.
+    As for ``np.savez``, ``.npz`` is appended to any other filename.
+
+    Args:
+        result (SweepResult): the result
+        filename (str): path of the output file
+
+    Returns:
+        str: path of the file written
+    """
+    if filename.endswith(".csv"):
+        header = ",".join(label_name(c) for c in result.columns)
+        np.savetxt(filename, result.data, delimiter=",", header=header, comments="")
+        return filename
+    if not filename.endswith(".npz"):
+        filename += ".npz"
+    result.save(filename)
+    return filename
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """run ``sc_fermi_solve sweep``
+
+    Args:
+        argv (Optional[List[str]]): command line arguments after ``sweep``.
+          Defaults to ``None`` (read from ``sys.argv``).
+    """
+    args = parse_command_line_arguments(argv)
+    try:
+        result = run_sweep(args)
+    except ValueError as error:
+        raise SystemExit(f"sc_fermi_solve sweep: error: {error}")
+    filename = write(result, args.output)
+    print(f"Solved {len(result)} points; results written to {filename}")
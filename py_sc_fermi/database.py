@@ -0,0 +1,412 @@
+"""SQLite database of the results of high-throughput campaigns.
+
+Each solve is stored as a row of a ``results`` table (material, the
+``DefectSystem.fingerprint`` of its inputs, temperature, Fermi energy and
+carrier concentrations) with its chemical potentials and defect
+concentrations in indexed side tables, so that results can be queried by
+material, temperature, chemical potential and species without reading any
+output files.
+
+Writes are buffered and inserted in bulk with ``executemany``, one
+transaction per batch. The
+database uses SQLite's write-ahead log, so several processes (e.g. the
+workers of a ``concurrent.futures.ProcessPoolExecutor``) can each open their
+own ``ResultsDatabase`` on the same file and write to it concurrently.
+"""
+
+import sqlite3
+import time
+import numpy as np
+from itertools import repeat
+from numpy.typing import ArrayLike
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from py_sc_fermi.defect_system import DefectSystem
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    material TEXT NOT NULL,
+    fingerprint TEXT,
+    temperature REAL NOT NULL,
+    e_fermi REAL NOT NULL,
+    p0 REAL NOT NULL,
+    n0 REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chemical_potentials (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    element TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS concentrations (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    species TEXT NOT NULL,
+    charge INTEGER,
+    concentration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_material ON results (material, temperature);
+CREATE INDEX IF NOT EXISTS results_fingerprint ON results (fingerprint);
+CREATE INDEX IF NOT EXISTS chemical_potentials_element
+    ON chemical_potentials (element, value);
+CREATE INDEX IF NOT EXISTS chemical_potentials_result ON chemical_potentials (result_id);
+CREATE INDEX IF NOT EXISTS concentrations_species ON concentrations (species, charge);
+CREATE INDEX IF NOT EXISTS concentrations_result ON concentrations (result_id);
+"""
+
+# result ids bound per query, below the smallest SQLITE_MAX_VARIABLE_NUMBER
+_IDS_PER_QUERY = 500
+
+
+class ResultsDatabase:
+    """Indexed SQLite store of solved ``DefectSystem`` results.
+
+    Args:
+        path (str): path to the database file, created if it does not exist
+        batch_size (int): number of buffered results that triggers a bulk
+          insert. Defaults to 1000.
+        timeout (float): seconds to wait for another writer to release the
+          database. Defaults to 60.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, timeout: float = 60.0):
+        self.path = path
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._initialise(timeout)
+        self._pending: List[Tuple[Tuple[Any, ...], Dict[str, float], Dict[Any, float]]] = []
+
+    def _initialise(self, timeout: float) -> None:
+        """switch to the write-ahead log and create the schema. SQLite may
+        report a newly created database as locked while another connection
+        sets it up, without waiting for the busy timeout, so this is retried
+        for up to ``timeout`` seconds."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self._connection.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                    self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+                self._connection.executescript(_SCHEMA)
+                return
+            except sqlite3.OperationalError as error:
+                if "locked" not in str(error) or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.01)
+
+    def __enter__(self) -> "ResultsDatabase":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def add(
+        self,
+        material: str,
+        temperature: float,
+        results: Mapping[Any, Any],
+        chemical_potentials: Optional[Mapping[str, float]] = None,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """buffer one result for insertion
+
+        Args:
+            material (str): label of the material
+            temperature (float): temperature
+            results (Mapping[Any, Any]): result in the format of
+              ``DefectSystem.concentration_dict``, either summed over charge
+              states or ``decomposed``
+            chemical_potentials (Optional[Mapping[str, float]]): chemical
+              potential of each element. Defaults to ``None``.
+            fingerprint (Optional[str]): ``DefectSystem.fingerprint`` of the
+              inputs. Defaults to ``None``.
+        """
+        concentrations: Dict[Any, float] = {}
+        for key, value in results.items():
+            if key in ("Fermi Energy", "p0", "n0"):
+                continue
+            if isinstance(value, Mapping):
+                for q, c in value.items():
+                    concentrations[(str(key), int(q))] = float(c)
+                concentrations[str(key)] = float(sum(value.values()))
+            else:
+                concentrations[str(key)] = float(value)
+        self._pending.append(
+            (
+                (
+                    material,
+                    fingerprint,
+                    float(temperature),
+                    float(results["Fermi Energy"]),
+                    float(results["p0"]),
+                    float(results["n0"]),
+                ),
+                {k: float(v) for k, v in (chemical_potentials or {}).items()},
+                concentrations,
+            )
+        )
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_batch(
+        self,
+        material: str,
+        temperature: ArrayLike,
+        results: Mapping[str, ArrayLike],
+        chemical_potentials: Optional[Mapping[str, ArrayLike]] = None,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """insert every point of a batch of results, e.g. from
+        ``DefectSystem.solve_batch``, after any buffered results. The points
+        are inserted with ``executemany``, in one transaction per
+        ``batch_size`` points.
+
+        Args:
+            material (str): label of the material
+            temperature (ArrayLike): temperature of each point
+            results (Mapping[str, ArrayLike]): arrays of ``"Fermi Energy"``,
+              ``"p0"``, ``"n0"`` and species concentrations
+            chemical_potentials (Optional[Mapping[str, ArrayLike]]): chemical
+              potential of each element at each point. Defaults to ``None``.
+            fingerprint (Optional[str]): fingerprint of the inputs common to
+              every point. Defaults to ``None``.
+        """
+        chemical_potentials = chemical_potentials or {}
+        arrays = [temperature, *results.values(), *chemical_potentials.values()]
+        shape = np.broadcast_shapes(*[np.shape(a) for a in arrays])
+
+        def flat(value: ArrayLike) -> List[float]:
+            return np.broadcast_to(np.asarray(value, dtype=float), shape).ravel().tolist()
+
+        columns = {key: flat(value) for key, value in results.items()}
+        n_points = int(np.prod(shape))
+        rows = list(
+            zip(
+                repeat(material),
+                repeat(fingerprint),
+                flat(temperature),
+                columns.pop("Fermi Energy"),
+                columns.pop("p0"),
+                columns.pop("n0"),
+            )
+        )
+        mu = {element: flat(value) for element, value in chemical_potentials.items()}
+        self.flush()
+        for start in range(0, n_points, self.batch_size):
+            chunk = slice(start, start + self.batch_size)
+            self._insert(
+                rows[chunk],
+                [
+                    (i, element, value)
+                    for element, values in mu.items()
+                    for i, value in enumerate(values[chunk])
+                ],
+                [
+                    (i, str(name), None, value)
+                    for name, values in columns.items()
+                    for i, value in enumerate(values[chunk])
+                ],
+            )
+
+    def record(
+        self,
+        material: str,
+        defect_system: DefectSystem,
+        chemical_potentials: Optional[Mapping[str, float]] = None,
+        decomposed: bool = False,
+    ) -> Dict[str, Any]:
+        """solve a ``DefectSystem`` and buffer the result
+
+        Args:
+            material (str): label of the material
+            defect_system (DefectSystem): system to solve
+            chemical_potentials (Optional[Mapping[str, float]]): chemical
+              potentials used to set up ``defect_system``. Defaults to
+              ``None``.
+            decomposed (bool): if True, also store the concentration of each
+              charge state. Defaults to False.
+
+        Returns:
+            Dict[str, Any]: the result of ``defect_system.concentration_dict``
+        """
+        results = defect_system.concentration_dict(decomposed=decomposed)
+        self.add(
+            material,
+            defect_system.temperature,
+            results,
+            chemical_potentials,
+            defect_system.fingerprint(),
+        )
+        return results
+
+    def flush(self) -> None:
+        """insert every buffered result in a single transaction"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            self._insert(
+                [row for row, _, _ in pending],
+                [
+                    (i, element, value)
+                    for i, (_, mu, _) in enumerate(pending)
+                    for element, value in mu.items()
+                ],
+                [
+                    (i, *((key, None) if isinstance(key, str) else key), c)
+                    for i, (_, _, concs) in enumerate(pending)
+                    for key, c in concs.items()
+                ],
+            )
+        except BaseException:
+            self._pending = pending + self._pending
+            raise
+
+    def _insert(
+        self,
+        rows: Sequence[Tuple[Any, ...]],
+        chemical_potentials: Sequence[Tuple[Any, ...]],
+        concentrations: Sequence[Tuple[Any, ...]],
+    ) -> None:
+        """insert results with ``executemany`` in a single transaction
+
+        Args:
+            rows (Sequence[Tuple[Any, ...]]): ``(material, fingerprint,
+              temperature, e_fermi, p0, n0)`` of each result
+            chemical_potentials (Sequence[Tuple[Any, ...]]): ``(index,
+              element, value)``, where ``index`` is the position of the result
+              in ``rows``
+            concentrations (Sequence[Tuple[Any, ...]]): ``(index, species,
+              charge, concentration)``, with a ``charge`` of ``None`` for the
+              total of a species
+        """
+        if not rows:
+            return
+        cursor = self._connection.cursor()
+        # an immediate transaction holds the write lock, so the ids assigned
+        # below cannot collide with those of another writer
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            first = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM results").fetchone()[0]
+            cursor.executemany(
+                "INSERT INTO results (id, material, fingerprint, temperature, e_fermi, p0, n0) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(first + i, *row) for i, row in enumerate(rows)],
+            )
+            cursor.executemany(
+                "INSERT INTO chemical_potentials (result_id, element, value) VALUES (?, ?, ?)",
+                [(first + i, *row) for i, *row in chemical_potentials],
+            )
+            cursor.executemany(
+                "INSERT INTO concentrations (result_id, species, charge, concentration) "
+                "VALUES (?, ?, ?, ?)",
+                [(first + i, *row) for i, *row in concentrations],
+            )
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def query(
+        self,
+        material: Optional[str] = None,
+        temperature: Optional[Union[float, Tuple[float, float]]] = None,
+        chemical_potentials: Optional[Mapping[str, float]] = None,
+        species: Optional[List[str]] = None,
+        fingerprint: Optional[str] = None,
+        tolerance: float = 1e-8,
+    ) -> List[Dict[Any, Any]]:
+        """find stored results
+
+        Args:
+            material (Optional[str]): material label. Defaults to ``None``
+              (any material).
+            temperature (Optional[Union[float, Tuple[float, float]]]): a
+              temperature, or an inclusive ``(minimum, maximum)`` range.
+              Defaults to ``None``.
+            chemical_potentials (Optional[Mapping[str, float]]): chemical
+              potentials that must match (to within ``tolerance``). Defaults
+              to ``None``.
+            species (Optional[List[str]]): species whose concentrations are
+              returned. Defaults to ``None`` (every species).
+            fingerprint (Optional[str]): ``DefectSystem.fingerprint`` of the
+              inputs. Defaults to ``None``.
+            tolerance (float): tolerance for matching temperatures and
+              chemical potentials. Defaults to ``1e-8``.
+
+        Returns:
+            List[Dict[Any, Any]]: matching results in insertion order, each
+            with ``"material"``, ``"fingerprint"``, ``"temperature"``,
+            ``"chemical_potentials"``, ``"Fermi Energy"``, ``"p0"``, ``"n0"``
+            and the concentration of each species (keyed by name) and, where
+            stored, each charge state (keyed by ``(name, charge)``)
+        """
+        self.flush()
+        conditions: List[str] = []
+        parameters: List[Any] = []
+        if material is not None:
+            conditions.append("material = ?")
+            parameters.append(material)
+        if fingerprint is not None:
+            conditions.append("fingerprint = ?")
+            parameters.append(fingerprint)
+        if temperature is not None:
+            low, high = temperature if isinstance(temperature, tuple) else (temperature, temperature)
+            conditions.append("temperature BETWEEN ? AND ?")
+            parameters += [low - tolerance, high + tolerance]
+        for element, value in (chemical_potentials or {}).items():
+            conditions.append(
+                "id IN (SELECT result_id FROM chemical_potentials "
+                "WHERE element = ? AND value BETWEEN ? AND ?)"
+            )
+            parameters += [element, value - tolerance, value + tolerance]
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(
+            "SELECT id, material, fingerprint, temperature, e_fermi, p0, n0 "
+            f"FROM results{where} ORDER BY id",
+            parameters,
+        ).fetchall()
+        results: Dict[int, Dict[Any, Any]] = {
+            row[0]: {
+                "material": row[1],
+                "fingerprint": row[2],
+                "temperature": row[3],
+                "chemical_potentials": {},
+                "Fermi Energy": row[4],
+                "p0": row[5],
+                "n0": row[6],
+            }
+            for row in rows
+        }
+        if not results:
+            return []
+        species_filter = ""
+        species_parameters: List[Any] = []
+        if species is not None:
+            species_filter = f" AND species IN ({', '.join('?' * len(species))})"
+            species_parameters = list(species)
+        ids = list(results)
+        for start in range(0, len(ids), _IDS_PER_QUERY):
+            chunk = ids[start : start + _IDS_PER_QUERY]
+            in_chunk = f"result_id IN ({', '.join('?' * len(chunk))})"
+            for result_id, element, value in self._connection.execute(
+                f"SELECT result_id, element, value FROM chemical_potentials WHERE {in_chunk}",
+                chunk,
+            ):
+                results[result_id]["chemical_potentials"][element] = value
+            for result_id, name, charge, concentration in self._connection.execute(
+                "SELECT result_id, species, charge, concentration FROM concentrations "
+                f"WHERE {in_chunk}{species_filter}",
+                (*chunk, *species_parameters),
+            ):
+                key = name if charge is None else (name, charge)
+                results[result_id][key] = concentration
+        return list(results.values())
+
+    def close(self) -> None:
+        """insert any buffered results and close the connection"""
+        self.flush()
+        self._connection.close()
@@ -33,6 +33,7 @@ class DefectChargeState:
         self._degeneracy = degeneracy
         self._energy = energy
         self._fixed_concentration = fixed_concentration
+        self._version = 0
 
     @property
     def energy(self) -> Optional[float]:
@@ -43,6 +44,17 @@ class DefectChargeState:
         """
         return self._energy
 
+    @property
+    def version(self) -> int:
+        """counter incremented whenever this ``DefectChargeState`` is modified
+        through ``set_energy``, ``set_degeneracy`` or ``fix_concentration``,
+        used to invalidate cached results.
+
+        Returns:
+            int: modification count
+        """
+        return self._version
+
     @property
     def charge(self) -> int:
         """charge of the ``DefectChargeState``
@@ -186,6 +198,25 @@ class DefectChargeState:
             concentration (float): ``DefectChargeState`` concentration per unit cell
         """
         self._fixed_concentration = concentration
+        self._version += 1
+
+    def set_energy(self, energy: float) -> None:
+        """Sets the formation energy (at E[Fermi] = 0) of this ``DefectChargeState``
+
+        Args:
+            energy (float): formation energy
+        """
+        self._energy = energy
+        self._version += 1
+
+    def set_degeneracy(self, degeneracy: float) -> None:
+        """Sets the degeneracy of this ``DefectChargeState``
+
+        Args:
+            degeneracy (float): degeneracy
+        """
+        self._degeneracy = degeneracy  # type: ignore
+        self._version += 1
 
     def get_formation_energy(self, e_fermi: float) -> float:
         """get the formation energy of this ``DefectChargeState`` at a given Fermi
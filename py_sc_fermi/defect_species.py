@@ -1,5 +1,6 @@
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from types import MappingProxyType
+from typing import Any, List, Dict, Mapping, Tuple, Optional
 from py_sc_fermi.defect_charge_state import DefectChargeState
 
 
@@ -14,6 +15,13 @@ class DefectSpecies(object):
         charge_states (Dict[int, DefectChargeState]): A dictionary of
            ``DefectChargeState`` with their charge as the key, i.e.
            {charge : ``DefectChargeState``}
+        fixed_concentration (Optional[float]): fixed concentration per unit
+           cell of this defect species. Defaults to ``None``.
+        stoichiometry (Optional[Dict[str, int]]): number of atoms of each
+           element added to (positive) or removed from (negative) the host to
+           form this defect, e.g. ``{"O": -1}`` for an oxygen vacancy. The
+           formation energies of the charge states are taken to be those at
+           zero chemical potential for every element. Defaults to ``None``.
 
     """
 
@@ -23,13 +31,18 @@ class DefectSpecies(object):
         nsites: int,
         charge_states: Dict[int, DefectChargeState],
         fixed_concentration: Optional[float] = None,
+        stoichiometry: Optional[Dict[str, int]] = None,
     ):
         """Instantiate a DefectSpecies object."""
 
         self._name = name
         self._nsites = nsites
-        self._charge_states = charge_states
+        self._charge_states = dict(charge_states)
         self._fixed_concentration = fixed_concentration
+        self._stoichiometry = dict(stoichiometry) if stoichiometry else {}
+        self._version = 0
+        self._partition_cache: Optional[Tuple[Any, ...]] = None
+        self._ordering_cache: Optional[Tuple[Any, ...]] = None
 
     def fix_concentration(self, concentration: float) -> None:
         """fix the concentration of this ``DefectSpecies``
@@ -38,6 +51,19 @@ class DefectSpecies(object):
             concentration (float): concentration per unit cell
         """
         self._fixed_concentration = concentration
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """counter incremented whenever this ``DefectSpecies`` or one of its
+        ``DefectChargeState`` objects is modified through their methods,
+        used to invalidate cached results. Versions count the modifications
+        of one object, so different ``DefectSpecies`` may share a version.
+
+        Returns:
+            int: modification count
+        """
+        return self._version + sum(cs.version for cs in self._charge_states.values())
 
     @property
     def name(self) -> str:
@@ -60,14 +86,15 @@ class DefectSpecies(object):
     @property
     def charge_states(
         self,
-    ) -> Dict[int, DefectChargeState]:
+    ) -> Mapping[int, DefectChargeState]:
         """
 
         Returns:
-            Dict[int, DefectChargeState]: The charge states of this defect
-            species as a dictionary of ``{charge (int): DefectChargeState}``
-            key-value pairs"""
-        return self._charge_states
+            Mapping[int, DefectChargeState]: The charge states of this defect
+            species as a read-only mapping of ``{charge (int): DefectChargeState}``
+            key-value pairs. The charge states are fixed when the
+            ``DefectSpecies`` is created."""
+        return MappingProxyType(self._charge_states)
 
     @property
     def charges(self) -> List[int]:
@@ -90,6 +117,43 @@ class DefectSpecies(object):
         """
         return self._fixed_concentration
 
+    @property
+    def stoichiometry(self) -> Dict[str, int]:
+        """change in the number of atoms of each element on forming this
+        ``DefectSpecies``, i.e. ``{element: delta_n}``. Empty if not specified.
+
+        Returns:
+            Dict[str, int]: change in number of atoms of each element
+        """
+        return self._stoichiometry
+
+    def chemical_potential_shift(self, chemical_potentials: Dict[str, float]) -> float:
+        """shift in the formation energy of every ``DefectChargeState`` of this
+        ``DefectSpecies`` at the given elemental chemical potentials, i.e.
+        ``-sum(delta_n[element] * mu[element])``.
+
+        Args:
+            chemical_potentials (Dict[str, float]): chemical potential of each
+              element, relative to the references used for the formation
+              energies.
+
+        Raises:
+            ValueError: if no chemical potential is given for an element in
+              ``self.stoichiometry``
+
+        Returns:
+            float: formation energy shift
+        """
+        missing = set(self.stoichiometry) - set(chemical_potentials)
+        if missing:
+            raise ValueError(
+                f"No chemical potential given for {', '.join(sorted(missing))} in {self.name}"
+            )
+        return -sum(
+            delta_n * chemical_potentials[element]
+            for element, delta_n in self.stoichiometry.items()
+        )
+
     def __repr__(self):
         to_return = f"\n{self.name}, nsites={self.nsites}"
         if self.fixed_concentration is not None:
@@ -123,19 +187,13 @@ class DefectSpecies(object):
         defect_charge_states = {
             charge_state.charge: charge_state for charge_state in defect_charge_list
         }
-        if "fixed_concentration" not in defect_species_dict.keys():
-            return cls(
-                name=defect_species_dict["name"],
-                nsites=defect_species_dict["nsites"],
-                charge_states=defect_charge_states,
-            )
-        else:
-            return cls(
-                name=defect_species_dict["name"],
-                nsites=defect_species_dict["nsites"],
-                charge_states=defect_charge_states,
-                fixed_concentration=defect_species_dict["fixed_concentration"],
-            )
+        return cls(
+            name=defect_species_dict["name"],
+            nsites=defect_species_dict["nsites"],
+            charge_states=defect_charge_states,
+            fixed_concentration=defect_species_dict.get("fixed_concentration"),
+            stoichiometry=defect_species_dict.get("stoichiometry"),
+        )
 
     @classmethod
     def _from_list_of_strings(cls, defect_string: List[str]):
@@ -180,10 +238,17 @@ class DefectSpecies(object):
             included in the returned list, even if their formation energy
             is specified.
         """
-        return sorted(
-            self.variable_conc_charge_states().values(),
-            key=lambda x: x.get_formation_energy(e_fermi),
-        )
+        version = self.version
+        if self._ordering_cache is None or self._ordering_cache[:2] != (version, e_fermi):
+            self._ordering_cache = (
+                version,
+                e_fermi,
+                sorted(
+                    self.variable_conc_charge_states().values(),
+                    key=lambda x: x.get_formation_energy(e_fermi),
+                ),
+            )
+        return list(self._ordering_cache[2])
 
     def as_dict(self) -> dict:
         """get representation of ``DefectSpecies`` as a dictionary
@@ -202,6 +267,10 @@ class DefectSpecies(object):
         }
         if self.fixed_concentration is not None:
             defect_dict.update({"fixed_concentration": float(self.fixed_concentration)})
+        if self.stoichiometry:
+            defect_dict.update(
+                {"stoichiometry": {str(k): int(v) for k, v in self.stoichiometry.items()}}
+            )
 
         return defect_dict
 
@@ -216,7 +285,10 @@ class DefectSpecies(object):
             DefectChargeState: the ``DefectChargeState`` of this ``DefectSpecies``
             with the lowest energy at ``e_fermi``.
         """
-        return self.charge_states_by_formation_energy(e_fermi)[0]
+        return min(
+            self.variable_conc_charge_states().values(),
+            key=lambda x: x.get_formation_energy(e_fermi),
+        )
 
     def get_formation_energies(self, e_fermi: float) -> Dict[int, float]:
         """Returns a dictionary of formation energies for all
@@ -242,7 +314,9 @@ class DefectSpecies(object):
 
     def tl_profile(self, efermi_min: float, efermi_max: float) -> np.ndarray:
         """get transition level profile for this ``DefectSpecies`` between a
-        minimum and maximum Fermi energy.
+        minimum and maximum Fermi energy, as the lower envelope of the
+        formation energies of its variable-concentration charge states (see
+        ``lower_envelope``).
 
         Args:
             efermi_min (float): minimum Fermi energy
@@ -252,25 +326,13 @@ class DefectSpecies(object):
             np.ndarray: transition level profile between efermi_min
             and efermi_max.
         """
-        cs = self.min_energy_charge_state(efermi_min)
-        q1 = cs.charge
-        form_e = cs.get_formation_energy(efermi_min)
-        points = [(efermi_min, form_e)]
-        while q1 != min(self.charges):
-            qlist = [q for q in self.charges if q < q1]
-            nextp, nextq = min(
-                ((self.get_transition_level_and_energy(q1, q2), q2) for q2 in qlist),
-                key=lambda p: p[0][0],
-            )
-            if nextp[0] < efermi_max:
-                points.append(nextp)
-                q1 = nextq
-            else:
-                break
-        cs = self.min_energy_charge_state(efermi_max)
-        form_e = cs.get_formation_energy(efermi_max)
-        points.append((efermi_max, form_e))
-        return np.array(points)
+        charge_states = self.variable_conc_charge_states()
+        return lower_envelope(
+            np.array([q for q in charge_states], dtype=float),
+            np.array([cs.energy for cs in charge_states.values()], dtype=float),
+            efermi_min,
+            efermi_max,
+        )
 
     def get_transition_level_and_energy(self, q1: int, q2: int) -> Tuple[float, float]:
         """Calculates the Fermi energy and formation
@@ -313,37 +375,49 @@ class DefectSpecies(object):
 
     def fixed_conc_charge_states(
         self,
-    ) -> Dict[int, DefectChargeState]:
+    ) -> Mapping[int, DefectChargeState]:
         """get ``DefectChargeState`` objects of this ``DefectSpecies`` with fixed
         concentration
         (i.e those for which ``DefectChargeState.fixed_concentration != None``)
 
         Returns:
-            Dict[int, DefectChargeState]: key-value pairs of charge on fixed
-            concentration ``DefectChargeState`` objects, and the charge state
-            which is variable, i.e. ``{DefectChargeState.charge : DefectChargeState}``
+            Mapping[int, DefectChargeState]: read-only key-value pairs of charge
+            on fixed concentration ``DefectChargeState`` objects, and the charge
+            state which is variable, i.e. ``{DefectChargeState.charge : DefectChargeState}``
         """
-        return {
-            q: cs
-            for q, cs in self.charge_states.items()
-            if cs.fixed_concentration is not None
-        }
+        return self._partitions()[0]
 
-    def variable_conc_charge_states(self) -> Dict[int, DefectChargeState]:
+    def variable_conc_charge_states(self) -> Mapping[int, DefectChargeState]:
         """get ``DefectChargeState`` objects in this ``DefectSpecies`` with variable
         concentration (i.e those with ``DefectChargeState.fixed_concentration == None``)
 
         Returns:
-            Dict[int, DefectChargeState]: key-value pairs of charge on variable
-            concentration ``DefectChargeState`` objects within this ``DefectSpecies``,
-            and the charge state which is variable, i.e.
+            Mapping[int, DefectChargeState]: read-only key-value pairs of charge
+            on variable concentration ``DefectChargeState`` objects within this
+            ``DefectSpecies``, and the charge state which is variable, i.e.
             ``{DefectChargeState.charge : DefectChargeState}``
         """
-        return {
-            q: cs
-            for q, cs in self.charge_states.items()
-            if cs.fixed_concentration is None
-        }
+        return self._partitions()[1]
+
+    def _partitions(
+        self,
+    ) -> Tuple[Mapping[int, DefectChargeState], Mapping[int, DefectChargeState]]:
+        """fixed and variable concentration ``DefectChargeState`` objects,
+        cached until ``version`` changes"""
+        version = self.version
+        if self._partition_cache is None or self._partition_cache[0] != version:
+            fixed = {}
+            variable = {}
+            for q, cs in self.charge_states.items():
+                if cs.fixed_concentration is None:
+                    variable[q] = cs
+                else:
+                    fixed[q] = cs
+            self._partition_cache = (version, fixed, variable)
+        return (
+            MappingProxyType(self._partition_cache[1]),
+            MappingProxyType(self._partition_cache[2]),
+        )
 
     def charge_state_concentrations(
         self, e_fermi: float, temperature: float
@@ -372,26 +446,13 @@ class DefectSpecies(object):
         for q, cs in fixed_concs.items():
             cs_concentrations[q] = cs.get_concentration(e_fermi, temperature)
 
-        if self.fixed_concentration is not None and self.variable_conc_charge_states():
-            fixed_conc_chg_states = sum(
-                [
-                    c
-                    for q, c in cs_concentrations.items()
-                    if q in self.fixed_conc_charge_states()
-                ]
-            )
-            variable_conc_chg_states = sum(
-                [
-                    c
-                    for q, c in cs_concentrations.items()
-                    if q in self.variable_conc_charge_states()
-                ]
-            )
+        if self.fixed_concentration is not None and var_concs:
+            fixed_conc_chg_states = sum(cs_concentrations[q] for q in fixed_concs)
+            variable_conc_chg_states = sum(cs_concentrations[q] for q in var_concs)
             constrained_conc = self.fixed_concentration - fixed_conc_chg_states
             scaling = constrained_conc / variable_conc_chg_states
-            for q in cs_concentrations:
-                if q in self.variable_conc_charge_states():
-                    cs_concentrations[q] *= scaling
+            for q in var_concs:
+                cs_concentrations[q] *= scaling
         return cs_concentrations
 
     def defect_charge_contributions(
@@ -419,3 +480,47 @@ class DefectSpecies(object):
             if q > 0:
                 lhs += concd * abs(q)
         return lhs, rhs
+
+
+def lower_envelope(
+    slopes: np.ndarray, intercepts: np.ndarray, x_min: float, x_max: float
+) -> np.ndarray:
+    """lower envelope of the lines ``y = slopes * x + intercepts`` between
+    ``x_min`` and ``x_max``, found in a single sort-and-sweep pass (the convex
+    hull trick). For formation energies, the slopes are the charges and the
+    breakpoints are the transition levels.
+
+    Args:
+        slopes (np.ndarray): slope of each line
+        intercepts (np.ndarray): intercept of each line
+        x_min (float): lower limit of ``x``
+        x_max (float): upper limit of ``x``
+
+    Returns:
+        np.ndarray: points ``(x, y)`` of the envelope: its value at ``x_min``,
+        each breakpoint between ``x_min`` and ``x_max``, and its value at
+        ``x_max``
+    """
+    # sweeping left to right the envelope follows lines of decreasing slope;
+    # of lines with the same slope only the lowest can contribute
+    order = np.lexsort((intercepts, -slopes))
+    hull: List[Tuple[float, float]] = []
+    starts: List[float] = []
+    for m, c in zip(slopes[order], intercepts[order]):
+        if hull and hull[-1][0] == m:
+            continue
+        while hull:
+            x = (c - hull[-1][1]) / (hull[-1][0] - m)
+            if x > starts[-1]:
+                break
+            hull.pop()
+            starts.pop()
+        starts.append((c - hull[-1][1]) / (hull[-1][0] - m) if hull else -np.inf)
+        hull.append((m, c))
+    first = int(np.searchsorted(starts, x_min, side="right")) - 1
+    last = int(np.searchsorted(starts, x_max, side="left")) - 1
+    points = [(x_min, hull[first][0] * x_min + hull[first][1])]
+    for i in range(first + 1, last + 1):
+        points.append((starts[i], hull[i][0] * starts[i] + hull[i][1]))
+    points.append((x_max, hull[last][0] * x_max + hull[last][1]))
+    return np.array(points)
@@ -1,10 +1,20 @@
-from typing import Dict, List, Tuple, Any
-from py_sc_fermi.dos import DOS
+from typing import Dict, List, Tuple, Any, Optional, Mapping, Iterable, Iterator, AsyncIterator, NamedTuple
+from numpy.typing import ArrayLike
+from py_sc_fermi.dos import DOS, kboltz
+from py_sc_fermi.defect_charge_state import DefectChargeState
 from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.defect_table import DefectTable, shared_table
+from py_sc_fermi.cache import ResultCache
 from py_sc_fermi.inputs import InputSet
+from py_sc_fermi import batch
 import numpy as np
+import asyncio
+import hashlib
 import warnings
-
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import islice
 
 
 class CustomWarningManager:
@@ -41,6 +51,20 @@ warning_manager = CustomWarningManager()
 warnings.showwarning = warning_manager.custom_warning
 
 
+class Sensitivities(NamedTuple):
+    """Jacobian of the self-consistent solution of a ``DefectSystem`` with
+    respect to its parameters, ``jacobian[i, j] = d outputs[i] / d parameters[j]``.
+
+    ``outputs`` are ``"Fermi Energy"``, ``"p0"``, ``"n0"`` and each charge
+    state as ``(name, charge)``. ``parameters`` are labelled and ordered as
+    in ``DefectSystem.parameter_layout``.
+    """
+
+    outputs: List[Any]
+    parameters: List[Tuple]
+    jacobian: np.ndarray
+
+
 class DefectSystem(object):
     """This class is used to calculate the self consistent Fermi energy for
     a defective material, observing the condition of charge neutrality and
@@ -58,6 +82,9 @@ class DefectSystem(object):
           self-consistent Fermi energy solver. Defaults to ``1e-18``.
         n_trial_steps (int): the maximum number of steps to take in the
           self-consistent Fermi energy solver. Defaults to 1500.
+        result_cache (Optional[ResultCache]): persistent cache consulted by
+          ``get_sc_fermi`` and ``concentration_dict`` before solving, keyed by
+          ``fingerprint``. Defaults to ``None`` (no caching).
     """
 
     def __init__(
@@ -68,6 +95,7 @@ class DefectSystem(object):
         temperature: float,
         convergence_tolerance: float = 1e-18,
         n_trial_steps: int = 1500,
+        result_cache: Optional[ResultCache] = None,
     ):
         self.defect_species = defect_species
         self.volume = volume
@@ -75,6 +103,10 @@ class DefectSystem(object):
         self.temperature = temperature
         self.convergence_tolerance = convergence_tolerance
         self.n_trial_steps = n_trial_steps
+        self.result_cache = result_cache
+        self._species_cache: Dict[str, Tuple[Any, Any]] = {}
+        self._aggregate: Optional[Tuple[Any, ...]] = None
+        self._last_e_fermi: Optional[float] = None
 
     def __repr__(self):
         to_return = [
@@ -172,6 +204,51 @@ class DefectSystem(object):
             ],
         )
 
+    @classmethod
+    def from_defect_table(
+        cls,
+        table: DefectTable,
+        dos: DOS,
+        volume: float,
+        temperature: float,
+        convergence_tolerance: float = 1e-18,
+        n_trial_steps: int = 1500,
+    ) -> "DefectSystem":
+        """generate ``DefectSystem`` whose ``DefectSpecies`` are views of the
+        rows of a ``DefectTable``, so that their data are stored once in the
+        table's columns.
+
+        Args:
+            table (DefectTable): table of defect charge states
+            dos (DOS): the ``DOS`` object associated with the unit cell
+            volume (float): volume of the unit cell in Angstroms cubed
+            temperature (float): temperature in K
+            convergence_tolerance (float): the charge neutrality tolerance for
+              the self-consistent Fermi energy solver. Defaults to ``1e-18``.
+            n_trial_steps (int): the maximum number of steps to take in the
+              self-consistent Fermi energy solver. Defaults to 1500.
+
+        Returns:
+            DefectSystem: ``DefectSystem`` backed by ``table``
+        """
+        return cls(
+            defect_species=list(table.defect_species()),
+            dos=dos,
+            volume=volume,
+            temperature=temperature,
+            convergence_tolerance=convergence_tolerance,
+            n_trial_steps=n_trial_steps,
+        )
+
+    def to_defect_table(self) -> DefectTable:
+        """tabulate the ``DefectSpecies`` of this ``DefectSystem`` in a new
+        ``DefectTable``.
+
+        Returns:
+            DefectTable: table holding a copy of every charge state
+        """
+        return DefectTable.from_defect_species(self.defect_species)
+
     def defect_species_by_name(self, name: str) -> DefectSpecies:
         """return a ``DefectSpecies`` contained within the ``DefectSystem``
         via its name.
@@ -184,10 +261,155 @@ class DefectSystem(object):
         """
         return [ds for ds in self.defect_species if ds.name == name][0]
 
-    def get_sc_fermi(self) -> Tuple[float, float]:
+    def fingerprint(self) -> str:
+        """stable hash of everything that determines the solution: the
+        ``DOS`` data, volume, temperature, solver settings and the parameters
+        of every ``DefectSpecies`` and ``DefectChargeState``. Identical inputs
+        give the same fingerprint in every run.
+
+        Returns:
+            str: hexadecimal SHA-256 digest
+        """
+
+        def number(value: Any) -> Optional[float]:
+            return None if value is None else float(value)
+
+        digest = hashlib.sha256()
+
+        def add(*values: Any) -> None:
+            digest.update(repr(values).encode())
+
+        for array in (self.dos.dos, self.dos.edos):
+            array = np.ascontiguousarray(array, dtype=float)
+            add(array.shape)
+            digest.update(array.tobytes())
+        add(number(self.dos.bandgap), number(self.dos.nelect), self.dos.spin_polarised)
+        add(
+            number(self.volume),
+            number(self.temperature),
+            number(self.convergence_tolerance),
+            int(self.n_trial_steps),
+        )
+        for ds in self.defect_species:
+            add(
+                ds.name,
+                number(ds.nsites),
+                number(ds.fixed_concentration),
+                sorted((k, int(v)) for k, v in ds.stoichiometry.items()),
+            )
+            for q, cs in ds.charge_states.items():
+                add(
+                    int(q),
+                    number(cs.energy),
+                    number(cs.degeneracy),
+                    number(cs.fixed_concentration),
+                )
+        return digest.hexdigest()
+
+    def with_overrides(
+        self,
+        temperature: Optional[float] = None,
+        fixed: Optional[Mapping[Any, float]] = None,
+        energy_shifts: Optional[Mapping[Any, float]] = None,
+    ) -> "DefectSystem":
+        """a variant of this ``DefectSystem`` under different conditions, as a
+        cheap alternative to ``copy.deepcopy``. The variant shares the ``DOS``
+        and every ``DefectSpecies`` and ``DefectChargeState`` that is not
+        overridden; only the overridden objects are copied.
+
+        Args:
+            temperature (Optional[float]): temperature. Defaults to
+              ``self.temperature``.
+            fixed (Optional[Mapping[Any, float]]): fixed concentrations per
+              unit cell, keyed by ``DefectSpecies.name`` or by
+              ``(name, charge)``. Defaults to ``None``.
+            energy_shifts (Optional[Mapping[Any, float]]): formation energy
+              shifts, keyed by ``DefectSpecies.name`` (applied to every charge
+              state of that species) or by ``(name, charge)``. Defaults to
+              ``None``.
+
+        Raises:
+            ValueError: if a key does not match any charge state
+
+        Returns:
+            DefectSystem: the variant
+
+        Note:
+            Shared objects are not copied when modified, so modifying a
+            ``DefectSpecies`` or ``DefectChargeState`` that was not overridden
+            modifies both systems.
+        """
+        overrides: Dict[str, Dict[Optional[int], Dict[str, float]]] = {}
+        for kind, values in (("fixed", fixed), ("shift", energy_shifts)):
+            for key, value in (values or {}).items():
+                name, charge = key if isinstance(key, tuple) else (key, None)
+                if name not in self.defect_species_names:
+                    raise ValueError(f"{name} is not a defect species of this system")
+                ds = self.defect_species_by_name(name)
+                if charge is not None and charge not in ds.charge_states:
+                    raise ValueError(f"{name} has no charge state with charge {charge}")
+                charges: List[Optional[int]] = (
+                    list(ds.charge_states) if kind == "shift" and charge is None else [charge]
+                )
+                for q in charges:
+                    entry = overrides.setdefault(name, {}).setdefault(q, {})
+                    entry[kind] = entry.get(kind, 0.0) + value if kind == "shift" else value
+
+        defect_species = []
+        for ds in self.defect_species:
+            if ds.name not in overrides:
+                defect_species.append(ds)
+                continue
+            changes = overrides[ds.name]
+            charge_states = dict(ds.charge_states)
+            for q, change in changes.items():
+                if q is None:
+                    continue
+                cs = ds.charge_states[q]
+                energy = cs.energy
+                if energy is not None:
+                    energy += change.get("shift", 0.0)
+                charge_states[q] = DefectChargeState(
+                    charge=q,
+                    degeneracy=cs.degeneracy,
+                    energy=energy,
+                    fixed_concentration=change.get("fixed", cs.fixed_concentration),
+                )
+            defect_species.append(
+                DefectSpecies(
+                    name=ds.name,
+                    nsites=ds.nsites,
+                    charge_states=charge_states,
+                    fixed_concentration=changes.get(None, {}).get(
+                        "fixed", ds.fixed_concentration
+                    ),
+                    stoichiometry=ds.stoichiometry,
+                )
+            )
+        return type(self)(
+            defect_species=defect_species,
+            dos=self.dos,
+            volume=self.volume,
+            temperature=self.temperature if temperature is None else temperature,
+            convergence_tolerance=self.convergence_tolerance,
+            n_trial_steps=self.n_trial_steps,
+            result_cache=self.result_cache,
+        )
+
+    def get_sc_fermi(self, incremental: bool = False) -> Tuple[float, float]:
         """
         Solve to find Fermi energy in for which the ``DefectSystem`` is charge neutral
 
+        Args:
+            incremental (bool): if True, reuse the cached charge contributions
+              of every ``DefectSpecies`` that has not changed since the last
+              incremental solve and start from a bracket around the previous
+              solution (see ``_solve_incremental``). Changes are detected
+              through ``DefectSpecies.version``, so ``DefectSpecies`` and
+              ``DefectChargeState`` objects must be modified through their
+              methods (e.g. ``fix_concentration``, ``set_energy``). Defaults
+              to False.
+
         Returns:
            Tuple[float, float]: Fermi energy, residual
 
@@ -196,6 +418,9 @@ class DefectSystem(object):
             ``self.dos.emin`` and ``self.dos.emax``
 
         Note:
+            If ``self.result_cache`` is set, a result stored for an identical
+            ``DefectSystem`` (see ``fingerprint``) is returned without solving.
+
             The solver will return the Fermi energy either when
             ``self.convergence_tolerance`` is satisfied or when the solver has
             attempted ``self.n_trial_steps``.
@@ -205,6 +430,22 @@ class DefectSystem(object):
             prudent to investigate the convergence of the solver with respect to
             ``self.n_trial_steps`` and ``self.convergence_tolerance``.
         """
+        if self.result_cache is not None:
+            key = f"get_sc_fermi:{self.fingerprint()}"
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached[0], cached[1]
+            e_fermi, residual = self._solve(incremental)
+            self.result_cache.put(key, [float(e_fermi), float(residual)])
+            return e_fermi, residual
+        return self._solve(incremental)
+
+    def _solve(self, incremental: bool) -> Tuple[float, float]:
+        """solve for the self-consistent Fermi energy without consulting
+        ``self.result_cache``"""
+        if incremental:
+            return self._solve_incremental()
+
         # initial guess
         emin = self.dos.emin()
         emax = self.dos.emax()
@@ -249,15 +490,133 @@ class DefectSystem(object):
         residual = abs(q_tot)
         return e_fermi, residual
 
-    def report(self) -> None:
+    def _solve_incremental(self) -> Tuple[float, float]:
+        """solve for the self-consistent Fermi energy using cached charge
+        contributions.
+
+        The charge of every ``DefectSpecies`` without a fixed total
+        concentration is a sum of terms ``q * g * nsites * exp(-(E + q E_F) / kT)``,
+        so the charges of all such species combine into one coefficient per
+        distinct charge ``q``. These coefficients are cached per
+        ``DefectSpecies`` and only recomputed for species whose ``version``
+        (or the temperature) has changed, so each evaluation of the net
+        charge costs the same however many species the system contains.
+        Species with a fixed total concentration are evaluated directly.
+
+        Returns:
+           Tuple[float, float]: Fermi energy, residual
+        """
+        aggregate = self._update_contribution_cache()
+        charges, log_coefficients, constant_lhs, constant_rhs, constrained = aggregate
+        kt = kboltz * self.temperature
+
+        def balance(e: np.ndarray, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            p0, n0 = batch.carrier_concentrations(
+                self.dos, e, np.full(len(e), float(self.temperature))
+            )
+            with np.errstate(over="ignore"):
+                terms = np.abs(charges) * np.exp(
+                    log_coefficients - charges * e[:, None] / kt
+                )
+            positive = p0 + constant_lhs + terms[:, charges > 0].sum(axis=-1)
+            negative = n0 + constant_rhs + terms[:, charges < 0].sum(axis=-1)
+            if constrained is not None:
+                charge = constrained.charges * batch.charge_state_concentrations(
+                    constrained, e, np.full(len(e), float(self.temperature))
+                )
+                positive = positive + np.sum(np.where(charge > 0, charge, 0.0), axis=-1)
+                negative = negative - np.sum(np.where(charge < 0, charge, 0.0), axis=-1)
+            return positive, negative
+
+        e_fermi, residual = batch.find_fermi_energy(
+            balance,
+            self.dos.emin(),
+            self.dos.emax(),
+            1,
+            self.convergence_tolerance,
+            self.n_trial_steps,
+            None if self._last_e_fermi is None else np.array([self._last_e_fermi]),
+        )
+        self._last_e_fermi = float(e_fermi[0])
+        return float(e_fermi[0]), float(residual[0])
+
+    def _update_contribution_cache(self) -> Tuple[Any, ...]:
+        """refresh the cached charge contributions of the ``DefectSpecies``
+        that have changed since they were last cached, and return the
+        contributions combined over all species.
+
+        Returns:
+            Tuple[Any, ...]: distinct charges, log of the combined coefficient
+            of each charge, constant positive and negative charge from fixed
+            charge states, and the ``ChargeStateArrays`` of the species with a
+            fixed total concentration (or ``None``).
+        """
+        kt = kboltz * self.temperature
+        changed = set(self._species_cache) != set(self.defect_species_names)
+        cache = {}
+        for ds in self.defect_species:
+            # versions count the modifications of one object, so the species
+            # itself is part of the key
+            key = (ds, ds.version, ds.nsites, self.temperature)
+            cached = self._species_cache.get(ds.name)
+            if cached is not None and cached[0] == key:
+                cache[ds.name] = cached
+                continue
+            changed = True
+            if ds.fixed_concentration is not None:
+                cache[ds.name] = (key, None)
+                continue
+            log_coefficients: Dict[int, float] = {}
+            lhs, rhs = 0.0, 0.0
+            for q, cs in ds.charge_states.items():
+                if cs.fixed_concentration is not None:
+                    lhs += max(q, 0) * cs.fixed_concentration
+                    rhs += max(-q, 0) * cs.fixed_concentration
+                    continue
+                with np.errstate(divide="ignore"):
+                    log_term = np.log(cs.degeneracy * ds.nsites) - cs.energy / kt
+                log_coefficients[q] = np.logaddexp(
+                    log_coefficients.get(q, -np.inf), log_term
+                )
+            cache[ds.name] = (key, (log_coefficients, lhs, rhs))
+        self._species_cache = cache
+        if changed or self._aggregate is None:
+            unconstrained = [entry[1] for entry in cache.values() if entry[1] is not None]
+            charges = np.array(
+                sorted({q for entry in unconstrained for q in entry[0]}), dtype=float
+            )
+            combined = np.full(len(charges), -np.inf)
+            for coefficients, _, _ in unconstrained:
+                for q, value in coefficients.items():
+                    i = np.searchsorted(charges, q)
+                    combined[i] = np.logaddexp(combined[i], value)
+            constrained = [
+                ds for ds in self.defect_species if ds.fixed_concentration is not None
+            ]
+            self._aggregate = (
+                charges,
+                combined,
+                sum(entry[1] for entry in unconstrained),
+                sum(entry[2] for entry in unconstrained),
+                batch.charge_state_arrays(constrained) if constrained else None,
+            )
+        return self._aggregate
+
+    def report(self, e_fermi: Optional[float] = None) -> None:
         """print a report in the style of `SC-Fermi <https://github.com/jbuckeridge/sc-fermi>`_
-        which summarises key properties of the defect system."""
-        print(self._get_report_string())
+        which summarises key properties of the defect system.
 
-    def _get_report_string(self) -> str:
+        Args:
+            e_fermi (Optional[float]): self-consistent Fermi energy, if it has
+              already been found. Defaults to ``None`` (solve for it).
+        """
+        print(self._get_report_string(e_fermi))
+
+    def _get_report_string(self, e_fermi: Optional[float] = None) -> str:
         """generate string to facilitate self.report()"""
         string = ""
-        e_fermi = self.get_sc_fermi()[0]
+        if e_fermi is None:
+            e_fermi = self.get_sc_fermi()[0]
         string += f"Temperature :      {self.temperature}  (K)\n"
         string += f"SC Fermi level :      {e_fermi}  (eV)\n"
         p0, n0 = self.dos.carrier_concentrations(e_fermi, self.temperature)
@@ -332,29 +691,45 @@ class DefectSystem(object):
         diff = rhs - lhs
         return diff
 
-    def get_transition_levels(self) -> Dict[str, List[List]]:
+    def get_transition_levels(
+        self, energy_shifts: Optional[Mapping[str, ArrayLike]] = None
+    ) -> Dict[str, List]:
         """Return transition_levels transition levels profiles of all ``DefectSpecies``
         all defects as dictionary of ``{DefectSpecies.name : [e_fermi, e_formation]}``
         over the whole density of states energy range.
 
+        Args:
+            energy_shifts (Optional[Mapping[str, ArrayLike]]): formation
+              energy shift of each ``DefectSpecies`` (e.g. from
+              ``chemical_potential_shifts``). A shift applied to every charge
+              state moves the profile without moving the transition levels,
+              so each profile is computed once and shifted for every
+              condition. If given, ``e_formation`` is an array of shape
+              ``shift.shape + (n_points,)``. Defaults to ``None``.
+
         Returns:
-            Dict[str, List[List]]: Dictionary giving per-defect transition-level
+            Dict[str, List]: Dictionary giving per-defect transition-level
             profiles.
         """
         transition_levels = {}
-        for defect_species in self.defect_species_names:
-            transition_level = self.defect_species_by_name(defect_species).tl_profile(
+        for defect_species in self.defect_species:
+            transition_level = defect_species.tl_profile(
                 self.dos.emin(), self.dos.emax()
             )
-            x = [[x_value][0][0] for x_value in transition_level]
-            y = [[y_value][0][1] for y_value in transition_level]
-            transition_levels.update({defect_species: [x, y]})
+            x = [x_value[0] for x_value in transition_level]
+            y = [y_value[1] for y_value in transition_level]
+            if energy_shifts is not None and defect_species.name in energy_shifts:
+                shift = np.asarray(energy_shifts[defect_species.name], dtype=float)
+                transition_levels[defect_species.name] = [x, np.add.outer(shift, y)]
+            else:
+                transition_levels[defect_species.name] = [x, y]
         return transition_levels
 
     def concentration_dict(
         self,
         decomposed: bool = False,
         per_volume: bool = True,
+        e_fermi: Optional[float] = None,
     ) -> Dict[str, Any]:
         """Returns a dictionary of the properties of the ``DefectSystem`` object
         after solving for the self-consistent Fermi energy.
@@ -366,18 +741,42 @@ class DefectSystem(object):
               each ``DefectSpecies``. Defaults to False.
             per_volume (bool, optional): if True, return concentrations in units
               of cm^-3, else returns concentration per unit cell. Defaults to True.
+            e_fermi (Optional[float]): self-consistent Fermi energy, if it has
+              already been found (e.g. by ``get_sc_fermi``). Defaults to
+              ``None`` (solve for it).
 
         Returns:
             Dict[str, Any]: dictionary specifying the Fermi Energy,
             hole concentration (``"p0"``), electron concentration
             (``"n0"``), temperature, and the defect concentrations.
+
+        Note:
+            If ``self.result_cache`` is set, a result stored for an identical
+            ``DefectSystem`` (see ``fingerprint``) is returned without solving.
         """
+        if self.result_cache is not None and e_fermi is None:
+            key = f"concentration_dict:{decomposed}:{per_volume}:{self.fingerprint()}"
+            cached = self.result_cache.get(key)
+            if cached is None:
+                cached = self._concentration_dict(decomposed, per_volume)
+                self.result_cache.put(key, cached)
+            return {
+                k: {int(q): c for q, c in v.items()} if isinstance(v, dict) else v
+                for k, v in cached.items()
+            }
+        return self._concentration_dict(decomposed, per_volume, e_fermi)
+
+    def _concentration_dict(
+        self, decomposed: bool, per_volume: bool, e_fermi: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """``concentration_dict`` without consulting ``self.result_cache``"""
         if per_volume == True:
             scale = 1e24 / self.volume
         else:
             scale = 1
 
-        e_fermi = self.get_sc_fermi()[0]
+        if e_fermi is None:
+            e_fermi = self.get_sc_fermi()[0]
         p0, n0 = self.dos.carrier_concentrations(e_fermi, self.temperature)
         run_stats = {
             "Fermi Energy": float(e_fermi),
@@ -393,18 +792,821 @@ class DefectSystem(object):
             }
             return {**run_stats, **sum_concs}
         else:
-            decomp_concs = {
-                str(ds.name): {
-                    int(q): float(
-                        ds.charge_state_concentrations(e_fermi, self.temperature)[q]
-                        * scale
-                    )
-                    for q in ds.charge_states
+            decomp_concs = {}
+            for ds in self.defect_species:
+                concs = ds.charge_state_concentrations(e_fermi, self.temperature)
+                decomp_concs[str(ds.name)] = {
+                    int(q): float(concs[q] * scale) for q in ds.charge_states
                 }
-                for ds in self.defect_species
-            }
             return {**run_stats, **decomp_concs}
 
+    def chemical_potential_shifts(
+        self, chemical_potentials: Mapping[str, ArrayLike]
+    ) -> Dict[str, np.ndarray]:
+        """formation energy shifts of each ``DefectSpecies`` with a defined
+        stoichiometry at the given elemental chemical potentials. The shifts
+        for all species are computed together as the product of the
+        ``(n_species, n_elements)`` stoichiometry matrix with the chemical
+        potentials, so each chemical potential may be an array (e.g. a grid).
+
+        Args:
+            chemical_potentials (Dict[str, ArrayLike]): chemical potential of
+              each element, relative to the references used for the formation
+              energies. Arrays must broadcast together.
+
+        Raises:
+            ValueError: if no chemical potential is given for an element in the
+              stoichiometry of any ``DefectSpecies``
+
+        Returns:
+            Dict[str, np.ndarray]: formation energy shift of each
+            ``DefectSpecies`` with a defined stoichiometry,
+            ``{DefectSpecies.name: shift}``
+        """
+        species = [ds for ds in self.defect_species if ds.stoichiometry]
+        elements = sorted({element for ds in species for element in ds.stoichiometry})
+        missing = set(elements) - set(chemical_potentials)
+        if missing:
+            raise ValueError(
+                f"No chemical potential given for {', '.join(sorted(missing))}"
+            )
+        if not elements:
+            return {}
+        stoichiometry = np.array(
+            [[ds.stoichiometry.get(element, 0) for element in elements] for ds in species],
+            dtype=float,
+        )
+        mu = np.stack(
+            np.broadcast_arrays(
+                *[np.asarray(chemical_potentials[element], dtype=float) for element in elements]
+            )
+        )
+        shifts = -np.tensordot(stoichiometry, mu, axes=1)
+        return {ds.name: shifts[i] for i, ds in enumerate(species)}
+
+    def solve_batch(
+        self,
+        temperature: Optional[ArrayLike] = None,
+        energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        per_volume: bool = True,
+        warm_start: bool = False,
+        n_jobs: int = 1,
+    ) -> Dict[str, np.ndarray]:
+        """Solve for the self-consistent Fermi energy and concentrations at
+        many conditions in a single vectorised call. All of the given values
+        are broadcast together, and every returned array has the broadcast
+        shape.
+
+        Args:
+            temperature (Optional[ArrayLike]): temperature(s). Defaults to
+              ``self.temperature``.
+            energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy
+              shifts, keyed by ``DefectSpecies.name`` (applied to every
+              charge state of that species) or by ``(name, charge)``.
+              Defaults to ``None``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+              unit cell, keyed by ``DefectSpecies.name`` or by
+              ``(name, charge)``. These replace any fixed concentrations
+              already set. Defaults to ``None``.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+            warm_start (bool, optional): if True, treat the (flattened)
+              conditions as an ordered sweep and start each point from the
+              solutions of its neighbours. Defaults to False.
+            n_jobs (int, optional): number of threads used to solve chunks of
+              the conditions concurrently. Defaults to 1.
+
+        Raises:
+            RuntimeError: if no solution is found between ``self.dos.emin()``
+              and ``self.dos.emax()`` for any of the conditions
+
+        Returns:
+            Dict[str, np.ndarray]: Fermi energy, hole concentration (``"p0"``),
+            electron concentration (``"n0"``), and the concentration of each
+            ``DefectSpecies``, as in ``concentration_dict``.
+        """
+        if temperature is None:
+            temperature = self.temperature
+        arrays = batch.charge_state_arrays(self.defect_species)
+        shape, conditions = batch.build_conditions(
+            arrays, temperature, energy_shifts, fixed
+        )
+        e_fermi, _ = batch.solve(
+            arrays,
+            self.dos,
+            conditions,
+            convergence_tolerance=self.convergence_tolerance,
+            n_trial_steps=self.n_trial_steps,
+            warm_start=warm_start,
+            n_jobs=n_jobs,
+        )
+        return batch.results(
+            arrays, self.dos, self.volume, e_fermi, conditions, shape, per_volume
+        )
+
+    def iter_solutions(
+        self,
+        parameters: Iterable[Mapping[str, Any]],
+        chunk_size: int = 1024,
+        per_volume: bool = True,
+        ordered: bool = True,
+        n_jobs: int = 1,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """Solve for the self-consistent Fermi energy at each point of a
+        (possibly very long, or unbounded) iterable of conditions, yielding
+        the results one chunk at a time so that memory use is bounded by
+        ``chunk_size`` and ``n_jobs`` rather than by the number of points.
+
+        Args:
+            parameters (Iterable[Mapping[str, Any]]): conditions at each
+              point, as a mapping with any of the keys ``"temperature"``
+              (defaults to ``self.temperature``), ``"energy_shifts"`` and
+              ``"fixed"`` (single values, keyed as in ``solve_batch``). A
+              concentration not fixed at a point keeps the value set on the
+              ``DefectSpecies`` or ``DefectChargeState``.
+            chunk_size (int, optional): number of points per chunk. Defaults
+              to 1024.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+            ordered (bool, optional): if True, chunks are yielded in the order
+              of ``parameters``, else as soon as they are solved. Defaults to
+              True.
+            n_jobs (int, optional): number of chunks solved concurrently in
+              separate threads. At most ``2 * n_jobs`` chunks are in flight at
+              once. Defaults to 1.
+
+        Raises:
+            ValueError: if a point has an unrecognised key
+            RuntimeError: if no solution is found for any of the points
+
+        Yields:
+            Dict[str, np.ndarray]: for each chunk, the ``"index"`` of each of
+            its points in ``parameters`` and the results at those points, as
+            returned by ``solve_batch``
+        """
+        arrays = batch.charge_state_arrays(self.defect_species)
+
+        def solve_chunk(start: int, points: List[Mapping[str, Any]]) -> Dict[str, np.ndarray]:
+            return self._solve_points(arrays, start, points, chunk_size, per_volume)
+
+        def chunks() -> Iterator[Tuple[int, List[Mapping[str, Any]]]]:
+            iterator = iter(parameters)
+            start = 0
+            while True:
+                points = list(islice(iterator, chunk_size))
+                if not points:
+                    return
+                yield start, points
+                start += len(points)
+
+        if n_jobs == 1:
+            for start, points in chunks():
+                yield solve_chunk(start, points)
+            return
+
+        pending: "deque[Future]" = deque()
+        executor = ThreadPoolExecutor(max_workers=n_jobs)
+
+        def next_result() -> Dict[str, np.ndarray]:
+            if ordered:
+                return pending.popleft().result()
+            done = next(iter(wait(pending, return_when=FIRST_COMPLETED).done))
+            pending.remove(done)
+            return done.result()
+
+        try:
+            for start, points in chunks():
+                pending.append(executor.submit(solve_chunk, start, points))
+                if len(pending) >= 2 * n_jobs:
+                    yield next_result()
+            while pending:
+                yield next_result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    async def solve_async(
+        self,
+        temperature: Optional[ArrayLike] = None,
+        energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        per_volume: bool = True,
+        executor: Optional[Executor] = None,
+    ) -> Dict[str, np.ndarray]:
+        """``solve_batch`` run in an executor, so that it does not block the
+        ``asyncio`` event loop.
+
+        Args:
+            temperature (Optional[ArrayLike]): temperature(s). Defaults to
+              ``self.temperature``.
+            energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy
+              shifts, as in ``solve_batch``. Defaults to ``None``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+              unit cell, as in ``solve_batch``. Defaults to ``None``.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+            executor (Optional[Executor]): executor to run the solve in.
+              Defaults to ``None`` (the event loop's default executor).
+
+        Returns:
+            Dict[str, np.ndarray]: results, as returned by ``solve_batch``
+
+        Note:
+            Cancelling the awaiting task stops waiting for the result, but a
+            solve that has already started in a thread runs to completion.
+            This ``DefectSystem`` should not be modified while it is being
+            solved.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor,
+            partial(
+                self.solve_batch,
+                temperature=temperature,
+                energy_shifts=energy_shifts,
+                fixed=fixed,
+                per_volume=per_volume,
+            ),
+        )
+
+    async def iter_solutions_async(
+        self,
+        parameters: Iterable[Mapping[str, Any]],
+        chunk_size: int = 1024,
+        per_volume: bool = True,
+        executor: Optional[Executor] = None,
+        max_pending: int = 1,
+    ) -> AsyncIterator[Dict[str, np.ndarray]]:
+        """asynchronous version of ``iter_solutions``, for use with
+        ``async for``. Chunks are solved in an executor, at most
+        ``max_pending`` ahead of the consumer, so a slow consumer throttles
+        the sweep. If the consumer stops iterating (or its task is cancelled)
+        chunks that have not started are cancelled.
+
+        Args:
+            parameters (Iterable[Mapping[str, Any]]): conditions at each point,
+              as in ``iter_solutions``
+            chunk_size (int, optional): number of points per chunk. Defaults
+              to 1024.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+            executor (Optional[Executor]): executor to solve the chunks in.
+              Defaults to ``None`` (the event loop's default executor).
+            max_pending (int, optional): maximum number of chunks submitted
+              but not yet consumed. Defaults to 1.
+
+        Yields:
+            Dict[str, np.ndarray]: results for each chunk, in order, as in
+            ``iter_solutions``
+        """
+        loop = asyncio.get_running_loop()
+        arrays = batch.charge_state_arrays(self.defect_species)
+        iterator = iter(parameters)
+        pending: "deque[asyncio.Future]" = deque()
+        start = 0
+        try:
+            while True:
+                while len(pending) < max_pending:
+                    points = list(islice(iterator, chunk_size))
+                    if not points:
+                        break
+                    pending.append(
+                        loop.run_in_executor(
+                            executor,
+                            self._solve_points,
+                            arrays,
+                            start,
+                            points,
+                            chunk_size,
+                            per_volume,
+                        )
+                    )
+                    start += len(points)
+                if not pending:
+                    return
+                yield await pending.popleft()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _solve_points(
+        self,
+        arrays: batch.ChargeStateArrays,
+        start: int,
+        points: List[Mapping[str, Any]],
+        chunk_size: int,
+        per_volume: bool,
+    ) -> Dict[str, np.ndarray]:
+        """solve one chunk of the points of ``iter_solutions``"""
+
+        def unfixed(key: Any) -> float:
+            mask = batch.charge_state_mask(arrays, key)
+            if isinstance(key, tuple):
+                return float(arrays.charge_state_fixed[mask][0])
+            return float(arrays.species_fixed[arrays.species_names.index(key)])
+
+        for point in points:
+            unknown = set(point) - {"temperature", "energy_shifts", "fixed"}
+            if unknown:
+                raise ValueError(f"Unrecognised conditions {sorted(unknown)}")
+        shifts = [point.get("energy_shifts", {}) for point in points]
+        fixed = [point.get("fixed", {}) for point in points]
+        shape, conditions = batch.build_conditions(
+            arrays,
+            [point.get("temperature", self.temperature) for point in points],
+            {
+                key: [s.get(key, 0.0) for s in shifts]
+                for key in dict.fromkeys(k for s in shifts for k in s)
+            },
+            {
+                key: [f.get(key, unfixed(key)) for f in fixed]
+                for key in dict.fromkeys(k for f in fixed for k in f)
+            },
+        )
+        e_fermi, _ = batch.solve(
+            arrays,
+            self.dos,
+            conditions,
+            convergence_tolerance=self.convergence_tolerance,
+            n_trial_steps=self.n_trial_steps,
+            chunk_size=chunk_size,
+        )
+        results = {"index": np.arange(start, start + len(points))}
+        results.update(
+            batch.results(
+                arrays, self.dos, self.volume, e_fermi, conditions, shape, per_volume
+            )
+        )
+        return results
+
+    def solve_quench(
+        self,
+        anneal_temperature: ArrayLike,
+        quench_temperature: ArrayLike,
+        energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        frozen_species: Optional[Iterable[str]] = None,
+        frozen_charge_states: Optional[Iterable[Any]] = None,
+        per_volume: bool = True,
+        warm_start: bool = False,
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """Solve an anneal-and-quench procedure at many conditions in a single
+        vectorised call. The defects are first equilibrated at
+        ``anneal_temperature``; the total concentration of each frozen
+        ``DefectSpecies`` (and of each frozen charge state) is then held fixed
+        while the Fermi energy, carrier concentrations and the charge state
+        distribution of each species are solved at ``quench_temperature``.
+        The ``DefectSystem`` is not modified.
+
+        Args:
+            anneal_temperature (ArrayLike): anneal temperature(s)
+            quench_temperature (ArrayLike): quench temperature(s)
+            energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy
+              shifts applied at both stages, as in ``solve_batch``. Defaults
+              to ``None``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+              unit cell applied at both stages, as in ``solve_batch``.
+              Defaults to ``None``.
+            frozen_species (Optional[Iterable[str]]): names of the
+              ``DefectSpecies`` whose total concentration is frozen at the
+              anneal stage. Defaults to every ``DefectSpecies``.
+            frozen_charge_states (Optional[Iterable[Any]]): charge states whose
+              concentration is frozen at the anneal stage, keyed by species
+              name (every charge state of that species) or by
+              ``(name, charge)``. Defaults to ``None``.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+            warm_start (bool, optional): if True, treat the (flattened)
+              conditions as an ordered sweep, as in ``solve_batch``. Defaults
+              to False.
+
+        Raises:
+            RuntimeError: if no solution is found at either stage for any of
+              the conditions
+            ValueError: if a frozen species or charge state is not in the
+              ``DefectSystem``
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]: the solutions
+            at the anneal and quench stages, each as returned by
+            ``solve_batch``.
+        """
+        arrays = batch.charge_state_arrays(self.defect_species)
+        anneal_temperature, quench_temperature = np.broadcast_arrays(
+            np.asarray(anneal_temperature, dtype=float),
+            np.asarray(quench_temperature, dtype=float),
+        )
+        shape, anneal_conditions = batch.build_conditions(
+            arrays, anneal_temperature, energy_shifts, fixed
+        )
+        if frozen_species is None:
+            frozen_species = arrays.species_names
+        species_mask = np.zeros(arrays.n_species, dtype=bool)
+        for name in frozen_species:
+            species_mask[arrays.species_index[batch.charge_state_mask(arrays, name)]] = True
+        charge_state_mask = np.zeros(arrays.n_charge_states, dtype=bool)
+        for key in frozen_charge_states or []:
+            charge_state_mask |= batch.charge_state_mask(arrays, key)
+
+        anneal_e_fermi, _ = batch.solve(
+            arrays,
+            self.dos,
+            anneal_conditions,
+            convergence_tolerance=self.convergence_tolerance,
+            n_trial_steps=self.n_trial_steps,
+            warm_start=warm_start,
+        )
+        cs_concs = batch.charge_state_concentrations(
+            arrays, anneal_e_fermi, *anneal_conditions
+        )
+        quench_conditions = batch.quench_conditions(
+            arrays,
+            anneal_conditions,
+            np.broadcast_to(quench_temperature, shape).ravel(),
+            cs_concs,
+            species_mask,
+            charge_state_mask,
+        )
+        quench_e_fermi, _ = batch.solve(
+            arrays,
+            self.dos,
+            quench_conditions,
+            convergence_tolerance=self.convergence_tolerance,
+            n_trial_steps=self.n_trial_steps,
+            warm_start=warm_start,
+        )
+        return (
+            batch.results(
+                arrays,
+                self.dos,
+                self.volume,
+                anneal_e_fermi,
+                anneal_conditions,
+                shape,
+                per_volume,
+            ),
+            batch.results(
+                arrays,
+                self.dos,
+                self.volume,
+                quench_e_fermi,
+                quench_conditions,
+                shape,
+                per_volume,
+            ),
+        )
+
+    def solve_inverse(
+        self,
+        target: str,
+        value: ArrayLike,
+        parameter: Tuple,
+        bounds: Tuple[float, float],
+        temperature: Optional[ArrayLike] = None,
+        energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        per_volume: bool = True,
+        tolerance: float = 1e-8,
+        max_iterations: int = 200,
+    ) -> Dict[str, np.ndarray]:
+        """Find the value of one free parameter for which the self-consistent
+        solution reaches a target value of an observable, e.g. the dopant
+        concentration that gives ``n0 = 1e18`` cm^-3. The parameter is
+        found by a bracketed outer iteration, with each inner Fermi energy
+        solve started from the solution at the previous outer iterate, for
+        every target value (and other condition) at once.
+
+        Args:
+            target (str): observable to match: ``"Fermi Energy"``, ``"p0"``,
+              ``"n0"`` or the name of a ``DefectSpecies``
+            value (ArrayLike): target value(s) of the observable, broadcast
+              with the other conditions
+            parameter (Tuple): free parameter, labelled as in
+              ``Sensitivities``: ``("fixed_concentration", name)``,
+              ``("fixed_concentration", name, charge)``, ``("energy", name)``
+              (an energy shift of every charge state of the species),
+              ``("energy", name, charge)`` or ``("temperature",)``
+            bounds (Tuple[float, float]): bounds of the parameter that bracket
+              the target. Fixed concentrations are searched on a logarithmic
+              scale and must be positive.
+            temperature (Optional[ArrayLike]): temperature(s), unless
+              ``parameter`` is the temperature. Defaults to ``self.temperature``.
+            energy_shifts (Optional[Mapping[Any, ArrayLike]]): other formation
+              energy shifts, as in ``solve_batch``. Defaults to ``None``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): other fixed
+              concentrations per unit cell, as in ``solve_batch``. Defaults to
+              ``None``.
+            per_volume (bool, optional): if True, concentrations (the target
+              and a fixed concentration parameter and its bounds) are in
+              units of cm^-3, else per unit cell. Defaults to True.
+            tolerance (float, optional): tolerance on the observable, relative
+              for concentrations and in eV for the Fermi energy. Defaults to
+              ``1e-8``.
+            max_iterations (int, optional): maximum number of outer
+              iterations. Defaults to 200.
+
+        Raises:
+            ValueError: if ``target`` or ``parameter`` is not recognised
+            RuntimeError: if the bounds do not bracket the target
+
+        Returns:
+            Dict[str, np.ndarray]: the value of the free parameter
+            (``"parameter"``) and the solution at that value, as returned by
+            ``solve_batch``.
+        """
+        arrays = batch.charge_state_arrays(self.defect_species)
+        if target not in ("Fermi Energy", "p0", "n0", *arrays.species_names):
+            raise ValueError(f"Unknown target {target}")
+        # the number of elements each kind of parameter is labelled with
+        arity = {"fixed_concentration": (2, 3), "energy": (2, 3), "temperature": (1,)}
+        kind, key = (parameter[0], parameter[1:]) if parameter else (None, ())
+        if kind not in arity or len(parameter) not in arity[kind]:
+            raise ValueError(f"Unknown parameter {parameter}")
+        mask = batch.charge_state_mask(arrays, key[0] if len(key) == 1 else key) if key else None
+        if temperature is None:
+            temperature = self.temperature
+        scale = 1e24 / self.volume if per_volume else 1
+
+        shape, conditions = batch.build_conditions(
+            arrays,
+            np.broadcast_to(
+                temperature, np.broadcast_shapes(np.shape(temperature), np.shape(value))
+            ),
+            energy_shifts,
+            fixed,
+        )
+        n_points = conditions.n_points
+        conditions = conditions._replace(
+            energy_shifts=np.broadcast_to(
+                0.0 if conditions.energy_shifts is None else conditions.energy_shifts,
+                (n_points, arrays.n_charge_states),
+            ),
+            species_fixed=np.broadcast_to(
+                arrays.species_fixed
+                if conditions.species_fixed is None
+                else conditions.species_fixed,
+                (n_points, arrays.n_species),
+            ),
+            charge_state_fixed=np.broadcast_to(
+                arrays.charge_state_fixed
+                if conditions.charge_state_fixed is None
+                else conditions.charge_state_fixed,
+                (n_points, arrays.n_charge_states),
+            ),
+        )
+        logarithmic = target != "Fermi Energy"
+        goal = np.broadcast_to(np.asarray(value, dtype=float), shape).ravel()
+        if logarithmic:
+            goal = np.log(goal)
+
+        def with_parameter(x: np.ndarray, index: np.ndarray) -> batch.Conditions:
+            selected = conditions.select(index)
+            if kind == "temperature":
+                return selected._replace(temperature=x)
+            if kind == "energy":
+                return selected._replace(
+                    energy_shifts=selected.energy_shifts + x[:, None] * mask
+                )
+            x = np.exp(x) / scale
+            if len(key) == 1:
+                species_fixed = np.array(selected.species_fixed)
+                species_fixed[:, arrays.species_names.index(key[0])] = x
+                return selected._replace(species_fixed=species_fixed)
+            charge_state_fixed = np.array(selected.charge_state_fixed)
+            charge_state_fixed[:, mask] = x[:, None]
+            return selected._replace(charge_state_fixed=charge_state_fixed)
+
+        e_fermi = np.full(n_points, np.nan)
+
+        def observe(x: np.ndarray, index: np.ndarray) -> np.ndarray:
+            trial_conditions = with_parameter(x, index)
+            guess = e_fermi[index]
+            e_fermi[index], _ = batch.solve(
+                arrays,
+                self.dos,
+                trial_conditions,
+                convergence_tolerance=self.convergence_tolerance,
+                n_trial_steps=self.n_trial_steps,
+                e_fermi_guess=None if np.any(np.isnan(guess)) else guess,
+            )
+            if target == "Fermi Energy":
+                return e_fermi[index] - goal[index]
+            p0, n0, _, species_concs = batch.concentrations(
+                arrays, self.dos, e_fermi[index], trial_conditions
+            )
+            if target == "p0":
+                observed = p0
+            elif target == "n0":
+                observed = n0
+            else:
+                observed = species_concs[:, arrays.species_names.index(target)]
+            with np.errstate(divide="ignore"):
+                return np.log(observed * scale) - goal[index]
+
+        lower, upper = (np.full(n_points, float(b)) for b in bounds)
+        if kind == "fixed_concentration":
+            lower, upper = np.log(lower), np.log(upper)
+        x = batch.find_root(observe, lower, upper, tolerance, max_iterations)
+        solution = with_parameter(x, np.arange(n_points))
+        e_fermi, _ = batch.solve(
+            arrays,
+            self.dos,
+            solution,
+            convergence_tolerance=self.convergence_tolerance,
+            n_trial_steps=self.n_trial_steps,
+            e_fermi_guess=e_fermi,
+        )
+        results = {
+            "parameter": (np.exp(x) if kind == "fixed_concentration" else x).reshape(shape)
+        }
+        results.update(
+            batch.results(
+                arrays, self.dos, self.volume, e_fermi, solution, shape, per_volume
+            )
+        )
+        return results
+
+    def parameter_layout(self) -> List[Tuple]:
+        """labels of the entries of the vector returned by ``get_parameters``,
+        which are those of ``Sensitivities.parameters``, in the same order:
+        the formation energy and then the degeneracy of every variable
+        charge state (with a defined energy and no fixed concentration),
+        the temperature, every fixed species concentration and every fixed
+        charge state concentration (all per unit cell). Labels are
+        ``("energy", name, charge)``, ``("degeneracy", name, charge)``,
+        ``("temperature",)``, ``("fixed_concentration", name)`` and
+        ``("fixed_concentration", name, charge)``.
+
+        The layout only changes if charge states are added or removed, or if
+        concentrations are fixed or released.
+
+        Returns:
+            List[Tuple]: parameter labels
+        """
+        return batch.parameter_labels(batch.charge_state_arrays(self.defect_species))
+
+    def get_parameters(self) -> np.ndarray:
+        """all model parameters as a single vector, in the order given by
+        ``parameter_layout``
+
+        Returns:
+            np.ndarray: parameter vector
+        """
+        arrays = batch.charge_state_arrays(self.defect_species)
+        variable, species_fixed, charge_state_fixed = batch.parameter_masks(arrays)
+        return np.concatenate(
+            [
+                arrays.energies[variable],
+                arrays.degeneracies[variable],
+                [self.temperature],
+                arrays.species_fixed[species_fixed],
+                arrays.charge_state_fixed[charge_state_fixed],
+            ]
+        )
+
+    def set_parameters(self, parameters: ArrayLike) -> None:
+        """set all model parameters from a single vector, in the order given
+        by ``parameter_layout``.
+
+        Each group of parameters is written in a single vectorised operation
+        only if every ``DefectSpecies`` is a view of the same ``DefectTable``
+        (see ``defect_table.shared_table``), as for a ``DefectSystem`` built
+        with ``from_defect_table``. Otherwise every charge state is updated
+        through its own setter methods, which is much slower for repeated
+        calls, e.g. in a fitting or sampling loop. Such a system can be
+        converted once beforehand::
+
+            defect_system = DefectSystem.from_defect_table(
+                defect_system.to_defect_table(),
+                defect_system.dos,
+                defect_system.volume,
+                defect_system.temperature,
+                defect_system.convergence_tolerance,
+                defect_system.n_trial_steps,
+            )
+
+        Args:
+            parameters (ArrayLike): parameter vector
+
+        Raises:
+            ValueError: if ``parameters`` does not match ``parameter_layout``
+        """
+        parameters = np.asarray(parameters, dtype=float)
+        arrays = batch.charge_state_arrays(self.defect_species)
+        masks = batch.parameter_masks(arrays)
+        n_variable = int(np.sum(masks[0]))
+        sizes = [n_variable, n_variable, 1, int(np.sum(masks[1])), int(np.sum(masks[2]))]
+        if parameters.shape != (sum(sizes),):
+            raise ValueError(
+                f"Expected {sum(sizes)} parameters, not {parameters.shape}"
+            )
+        energies, degeneracies, temperature, species_fixed, charge_state_fixed = np.split(
+            parameters, np.cumsum(sizes)[:-1]
+        )
+        self.temperature = float(temperature[0])
+
+        table = shared_table(self.defect_species)
+        if table is not None:
+            rows = table.row_indices([ds.index for ds in self.defect_species])  # type: ignore
+            species = np.array([ds.index for ds in self.defect_species], dtype=int)  # type: ignore
+            table.set_values("energies", rows[masks[0]], energies)
+            table.set_values("degeneracies", rows[masks[0]], degeneracies)
+            table.set_values("species_fixed_concentrations", species[masks[1]], species_fixed)
+            table.set_values("fixed_concentrations", rows[masks[2]], charge_state_fixed)
+            return
+
+        charge_states = [
+            cs for ds in self.defect_species for cs in ds.charge_states.values()
+        ]
+        variable = [cs for cs, m in zip(charge_states, masks[0]) if m]
+        for cs, energy, degeneracy in zip(variable, energies, degeneracies):
+            cs.set_energy(float(energy))
+            cs.set_degeneracy(float(degeneracy))
+        for ds, value in zip(
+            [ds for ds, m in zip(self.defect_species, masks[1]) if m], species_fixed
+        ):
+            ds.fix_concentration(float(value))
+        for cs, value in zip(
+            [cs for cs, m in zip(charge_states, masks[2]) if m], charge_state_fixed
+        ):
+            cs.fix_concentration(float(value))
+
+    def sensitivities(
+        self, e_fermi: Optional[float] = None, per_volume: bool = True
+    ) -> Sensitivities:
+        """Jacobian of the Fermi energy, the carrier concentrations and the
+        concentration of every charge state with respect to the formation
+        energies and degeneracies of the variable charge states, the
+        temperature, and any fixed concentrations. Derivatives are evaluated
+        analytically at a single solution by implicit differentiation of the
+        charge neutrality condition,
+        ``dE_F/dtheta = -(dq_tot/dtheta) / (dq_tot/dE_F)``.
+
+        Args:
+            e_fermi (Optional[float]): self-consistent Fermi energy. Defaults
+              to the solution of ``get_sc_fermi``.
+            per_volume (bool, optional): if True, concentrations (both outputs
+              and fixed concentration parameters) are in units of cm^-3, else
+              per unit cell. Defaults to True.
+
+        Returns:
+            Sensitivities: output labels, parameter labels and the Jacobian
+        """
+        if e_fermi is None:
+            e_fermi = self.get_sc_fermi()[0]
+        arrays = batch.charge_state_arrays(self.defect_species)
+        _, conditions = batch.build_conditions(arrays, [self.temperature])
+        jacobian = batch.sensitivities(arrays, self.dos, np.array([e_fermi]), conditions)[0]
+        jacobian = jacobian[:, batch.parameter_columns(arrays)]
+        parameters = batch.parameter_labels(arrays)
+        charge_states = [
+            (arrays.species_names[i], int(q))
+            for i, q in zip(arrays.species_index, arrays.charges)
+        ]
+        outputs: List[Any] = ["Fermi Energy", "p0", "n0", *charge_states]
+
+        scale = 1e24 / self.volume if per_volume else 1
+        jacobian[1:] *= scale
+        # the fixed concentrations follow the temperature
+        jacobian[:, parameters.index(("temperature",)) + 1 :] /= scale
+        return Sensitivities(outputs=outputs, parameters=parameters, jacobian=jacobian)
+
+    def solve_chemical_potentials(
+        self,
+        chemical_potentials: Mapping[str, ArrayLike],
+        temperature: Optional[ArrayLike] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        per_volume: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """Solve for the self-consistent Fermi energy and concentrations over
+        arrays of elemental chemical potentials. The formation energies of
+        each ``DefectSpecies`` are shifted according to its stoichiometry (see
+        ``chemical_potential_shifts``) and every point is solved in a single
+        call to ``solve_batch``.
+
+        Args:
+            chemical_potentials (Dict[str, ArrayLike]): chemical potential of
+              each element, e.g. ``{"O": mu_O_grid, "Ti": mu_Ti_grid}``.
+            temperature (Optional[ArrayLike]): temperature(s). Defaults to
+              ``self.temperature``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+              unit cell, as in ``solve_batch``. Defaults to ``None``.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+
+        Returns:
+            Dict[str, np.ndarray]: as ``solve_batch``, with arrays of the
+            broadcast shape of the chemical potentials and other conditions.
+        """
+        return self.solve_batch(
+            temperature=temperature,
+            energy_shifts=self.chemical_potential_shifts(chemical_potentials),
+            fixed=fixed,
+            per_volume=per_volume,
+        )
+
     def site_percentages(
         self, 
     ) -> Dict[str, float]:
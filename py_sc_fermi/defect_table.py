@@ -0,0 +1,392 @@
+"""Array-backed storage of defect charge states.
+
+A ``DefectTable`` holds every charge state of every defect species as a
+row in a set of compact numpy columns. ``DefectSpeciesView`` and
+``DefectChargeStateView`` behave as ``DefectSpecies`` and
+``DefectChargeState`` objects but read and write the rows of a table rather
+than holding their own data, so a ``DefectSystem`` built from a table
+(``DefectSystem.from_defect_table``) stores each value once, and its
+vectorised solvers read the columns directly.
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies
+
+
+class DefectTable:
+    """Struct-of-arrays table of defect charge states, grouped by species.
+
+    Args:
+        species_names (Sequence[str]): name of each species
+        nsites (ArrayLike): number of sites of each species
+        species_index (ArrayLike): species of each charge state, as an index
+          into ``species_names``. Must be non-decreasing, so that the charge
+          states of each species are contiguous.
+        charges (ArrayLike): charge of each charge state
+        energies (ArrayLike): formation energy of each charge state at
+          E[Fermi] = 0, ``nan`` where undefined
+        degeneracies (ArrayLike): degeneracy of each charge state
+        fixed_concentrations (Optional[ArrayLike]): fixed concentration per
+          unit cell of each charge state, ``nan`` where free to vary. Defaults
+          to ``None`` (all free).
+        species_fixed_concentrations (Optional[ArrayLike]): fixed total
+          concentration per unit cell of each species, ``nan`` where free to
+          vary. Defaults to ``None`` (all free).
+        stoichiometries (Optional[Sequence[Dict[str, int]]]): stoichiometry of
+          each species, as ``DefectSpecies.stoichiometry``. Defaults to
+          ``None``.
+
+    Raises:
+        ValueError: if the columns have inconsistent lengths, the charge
+          states are not grouped by species, or a charge state has neither
+          an energy nor a fixed concentration
+    """
+
+    def __init__(
+        self,
+        species_names: Sequence[str],
+        nsites: ArrayLike,
+        species_index: ArrayLike,
+        charges: ArrayLike,
+        energies: ArrayLike,
+        degeneracies: ArrayLike,
+        fixed_concentrations: Optional[ArrayLike] = None,
+        species_fixed_concentrations: Optional[ArrayLike] = None,
+        stoichiometries: Optional[Sequence[Dict[str, int]]] = None,
+    ):
+        self._species_names = tuple(species_names)
+        n_species = len(self._species_names)
+        self._nsites = np.array(nsites, dtype=float).reshape(n_species)
+        self._species_index = np.array(species_index, dtype=np.int64)
+        n_rows = len(self._species_index)
+        self._charges = np.array(charges, dtype=np.int64).reshape(n_rows)
+        self._energies = np.array(energies, dtype=float).reshape(n_rows)
+        self._degeneracies = np.array(degeneracies, dtype=float).reshape(n_rows)
+        self._fixed = (
+            np.full(n_rows, np.nan)
+            if fixed_concentrations is None
+            else np.array(fixed_concentrations, dtype=float).reshape(n_rows)
+        )
+        self._species_fixed = (
+            np.full(n_species, np.nan)
+            if species_fixed_concentrations is None
+            else np.array(species_fixed_concentrations, dtype=float).reshape(n_species)
+        )
+        self._stoichiometries = (
+            [dict(s) for s in stoichiometries] if stoichiometries else [{} for _ in range(n_species)]
+        )
+        if len(self._stoichiometries) != n_species:
+            raise ValueError("stoichiometries must have one entry per species")
+        if n_rows and (
+            np.any(np.diff(self._species_index) < 0)
+            or self._species_index[0] < 0
+            or self._species_index[-1] >= n_species
+        ):
+            raise ValueError("species_index must be non-decreasing and index species_names")
+        if np.any(np.isnan(self._energies) & np.isnan(self._fixed)):
+            raise ValueError(
+                "Every charge state needs either an energy or a fixed concentration"
+            )
+        counts = np.bincount(self._species_index, minlength=n_species)
+        self._starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self._versions = np.zeros(n_rows, dtype=np.int64)
+        self._species_versions = np.zeros(n_species, dtype=np.int64)
+        self._views: Dict[int, "DefectSpeciesView"] = {}
+
+    @classmethod
+    def from_defect_species(cls, defect_species: List[DefectSpecies]) -> "DefectTable":
+        """build a ``DefectTable`` from ``DefectSpecies`` objects
+
+        Args:
+            defect_species (List[DefectSpecies]): defect species
+
+        Returns:
+            DefectTable: table holding every charge state of ``defect_species``
+        """
+        rows = [
+            (i, q, cs)
+            for i, ds in enumerate(defect_species)
+            for q, cs in ds.charge_states.items()
+        ]
+        return cls(
+            species_names=[ds.name for ds in defect_species],
+            nsites=[ds.nsites for ds in defect_species],
+            species_index=[i for i, _, _ in rows],
+            charges=[q for _, q, _ in rows],
+            energies=[np.nan if cs.energy is None else cs.energy for _, _, cs in rows],
+            degeneracies=[cs.degeneracy for _, _, cs in rows],
+            fixed_concentrations=[
+                np.nan if cs.fixed_concentration is None else cs.fixed_concentration
+                for _, _, cs in rows
+            ],
+            species_fixed_concentrations=[
+                np.nan if ds.fixed_concentration is None else ds.fixed_concentration
+                for ds in defect_species
+            ],
+            stoichiometries=[ds.stoichiometry for ds in defect_species],
+        )
+
+    @property
+    def species_names(self) -> Tuple[str, ...]:
+        """name of each species"""
+        return self._species_names
+
+    @property
+    def nsites(self) -> np.ndarray:
+        """number of sites of each species"""
+        return self._nsites
+
+    @property
+    def species_fixed_concentrations(self) -> np.ndarray:
+        """fixed total concentration of each species, ``nan`` where free"""
+        return self._species_fixed
+
+    @property
+    def stoichiometries(self) -> List[Dict[str, int]]:
+        """stoichiometry of each species"""
+        return self._stoichiometries
+
+    @property
+    def species_index(self) -> np.ndarray:
+        """species of each charge state"""
+        return self._species_index
+
+    @property
+    def charges(self) -> np.ndarray:
+        """charge of each charge state"""
+        return self._charges
+
+    @property
+    def energies(self) -> np.ndarray:
+        """formation energy of each charge state, ``nan`` where undefined"""
+        return self._energies
+
+    @property
+    def degeneracies(self) -> np.ndarray:
+        """degeneracy of each charge state"""
+        return self._degeneracies
+
+    @property
+    def fixed_concentrations(self) -> np.ndarray:
+        """fixed concentration of each charge state, ``nan`` where free"""
+        return self._fixed
+
+    @property
+    def n_species(self) -> int:
+        return len(self._species_names)
+
+    def __len__(self) -> int:
+        return len(self._species_index)
+
+    def rows(self, species: int) -> slice:
+        """rows of the charge states of one species
+
+        Args:
+            species (int): index of the species
+
+        Returns:
+            slice: rows of its charge states
+        """
+        return slice(int(self._starts[species]), int(self._starts[species + 1]))
+
+    def row_indices(self, species: Sequence[int]) -> np.ndarray:
+        """rows of the charge states of several species, in order
+
+        Args:
+            species (Sequence[int]): indices of the species
+
+        Returns:
+            np.ndarray: row indices
+        """
+        return np.concatenate(
+            [np.arange(self._starts[i], self._starts[i + 1]) for i in species]
+            + [np.zeros(0, dtype=np.int64)]
+        )
+
+    def set_values(self, column: str, index: ArrayLike, values: ArrayLike) -> None:
+        """write values into a column in a single operation, marking the
+        affected rows (or species) as modified.
+
+        Args:
+            column (str): ``"energies"``, ``"degeneracies"``,
+              ``"fixed_concentrations"`` or ``"species_fixed_concentrations"``
+            index (ArrayLike): rows (or, for
+              ``"species_fixed_concentrations"``, species) to write
+            values (ArrayLike): new values
+
+        Raises:
+            ValueError: if ``column`` is not recognised
+        """
+        columns = {
+            "energies": self._energies,
+            "degeneracies": self._degeneracies,
+            "fixed_concentrations": self._fixed,
+            "species_fixed_concentrations": self._species_fixed,
+        }
+        if column not in columns:
+            raise ValueError(f"Unrecognised column {column}")
+        index = np.asarray(index, dtype=np.int64)
+        columns[column][index] = values
+        if column == "species_fixed_concentrations":
+            self._species_versions[index] += 1
+        else:
+            self._mark_rows(index)
+
+    def _mark_rows(self, index: Any) -> None:
+        """increment the version counters of modified rows and of the species
+        they belong to
+
+        Args:
+            index (Any): modified row, or array of rows
+        """
+        self._versions[index] += 1
+        self._species_versions[self._species_index[index]] += 1
+
+    def defect_species(self) -> List["DefectSpeciesView"]:
+        """views of every species in the table, which behave as
+        ``DefectSpecies`` objects. The same view is returned for a species on
+        every call.
+
+        Returns:
+            List[DefectSpeciesView]: one view per species
+        """
+        return [self.species_view(i) for i in range(self.n_species)]
+
+    def species_view(self, species: int) -> "DefectSpeciesView":
+        """view of one species
+
+        Args:
+            species (int): index of the species
+
+        Returns:
+            DefectSpeciesView: view of the species
+        """
+        if species not in self._views:
+            self._views[species] = DefectSpeciesView(self, species)
+        return self._views[species]
+
+
+class DefectChargeStateView(DefectChargeState):
+    """``DefectChargeState`` whose data are a row of a ``DefectTable``. The
+    energy, degeneracy and fixed concentration are read from and written to
+    the table.
+
+    Args:
+        table (DefectTable): table holding the data
+        row (int): row of this charge state
+    """
+
+    def __init__(self, table: DefectTable, row: int):
+        self._table = table
+        self._row = row
+        super().__init__(
+            charge=int(table.charges[row]),
+            degeneracy=self.degeneracy,
+            energy=self.energy,
+            fixed_concentration=self.fixed_concentration,
+        )
+
+    @property
+    def energy(self) -> Optional[float]:
+        value = self._table.energies[self._row]
+        return None if np.isnan(value) else float(value)
+
+    @property
+    def degeneracy(self) -> int:
+        value = float(self._table.degeneracies[self._row])
+        return int(value) if value.is_integer() else value  # type: ignore
+
+    @property
+    def fixed_concentration(self) -> Optional[float]:
+        value = self._table.fixed_concentrations[self._row]
+        return None if np.isnan(value) else float(value)
+
+    @property
+    def version(self) -> int:
+        return int(self._table._versions[self._row])
+
+    def fix_concentration(self, concentration: float) -> None:
+        self._table._fixed[self._row] = concentration
+        self._table._mark_rows(self._row)
+
+    def set_energy(self, energy: float) -> None:
+        self._table._energies[self._row] = energy
+        self._table._mark_rows(self._row)
+
+    def set_degeneracy(self, degeneracy: float) -> None:
+        self._table._degeneracies[self._row] = degeneracy
+        self._table._mark_rows(self._row)
+
+
+class DefectSpeciesView(DefectSpecies):
+    """``DefectSpecies`` whose data are the rows of one species of a
+    ``DefectTable``. Its charge states are ``DefectChargeStateView`` objects,
+    and its fixed concentration is read from and written to the table.
+
+    Args:
+        table (DefectTable): table holding the data
+        species (int): index of the species in ``table``
+    """
+
+    def __init__(self, table: DefectTable, species: int):
+        self._table = table
+        self._species = species
+        rows = table.rows(species)
+        nsites = float(table.nsites[species])
+        super().__init__(
+            name=table.species_names[species],
+            nsites=int(nsites) if nsites.is_integer() else nsites,  # type: ignore
+            charge_states={
+                int(table.charges[row]): DefectChargeStateView(table, row)
+                for row in range(rows.start, rows.stop)
+            },
+            fixed_concentration=self.fixed_concentration,
+            stoichiometry=table.stoichiometries[species],
+        )
+
+    @property
+    def table(self) -> DefectTable:
+        """table holding the data of this view"""
+        return self._table
+
+    @property
+    def index(self) -> int:
+        """index of this species in ``table``"""
+        return self._species
+
+    @property
+    def fixed_concentration(self) -> Optional[float]:
+        value = self._table.species_fixed_concentrations[self._species]
+        return None if np.isnan(value) else float(value)
+
+    @property
+    def version(self) -> int:
+        return int(self._table._species_versions[self._species])
+
+    def fix_concentration(self, concentration: float) -> None:
+        self._table._species_fixed[self._species] = concentration
+        self._table._species_versions[self._species] += 1
+
+
+def shared_table(defect_species: Sequence[DefectSpecies]) -> Optional[DefectTable]:
+    """the ``DefectTable`` behind a list of ``DefectSpecies``, if every one of
+    them is a view of the same table
+
+    Args:
+        defect_species (Sequence[DefectSpecies]): defect species
+
+    Returns:
+        Optional[DefectTable]: the shared table, or ``None``
+    """
+    if not defect_species or not all(
+        isinstance(ds, DefectSpeciesView) for ds in defect_species
+    ):
+        return None
+    table = defect_species[0].table  # type: ignore
+    if any(ds.table is not table for ds in defect_species):  # type: ignore
+        return None
+    return table
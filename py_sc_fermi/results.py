@@ -0,0 +1,357 @@
+"""Columnar storage of the results of large sweeps.
+
+A ``SweepResult`` holds the parameters and results of every point of a sweep
+as the columns of a single two-dimensional array, rather than as one
+dictionary per point. Columns are labelled: parameters use the labels of
+``DefectSystem.sensitivities`` (``("temperature",)``, ``("energy", name)``,
+``("fixed_concentration", name, charge)``, ...) and quantities are
+``"Fermi Energy"``, ``"p0"``, ``"n0"``, the name of each ``DefectSpecies`` and,
+optionally, ``(name, charge)`` for each charge state.
+
+Results can be saved to ``.npz`` files, appended chunk by chunk to a
+directory with a ``SweepWriter``, and exported to ``pandas`` or ``xarray``
+without copying. ``sweep`` solves a ``DefectSystem`` directly into a
+``SweepResult``.
+"""
+
+import json
+import os
+import numpy as np
+from numpy.typing import ArrayLike
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_system import DefectSystem
+
+
+def label_name(label: Any) -> str:
+    """string form of a column label, e.g. ``"V_O 2"`` for ``("V_O", 2)``
+
+    Args:
+        label (Any): column label
+
+    Returns:
+        str: column name
+    """
+    return label if isinstance(label, str) else " ".join(str(part) for part in label)
+
+
+def _labels_from_json(labels: List[Any]) -> List[Any]:
+    return [tuple(label) if isinstance(label, list) else label for label in labels]
+
+
+class SweepResult:
+    """Parameters and results of the points of a sweep, stored column-wise.
+
+    Args:
+        parameters (Sequence[Any]): labels of the parameter columns
+        quantities (Sequence[Any]): labels of the result columns
+        data (ArrayLike): values, of shape
+          ``(n_points, len(parameters) + len(quantities))``, parameter columns
+          first
+
+    Raises:
+        ValueError: if ``data`` does not match the labels, or a label is
+          repeated
+    """
+
+    def __init__(self, parameters: Sequence[Any], quantities: Sequence[Any], data: ArrayLike):
+        self.parameters = list(parameters)
+        self.quantities = list(quantities)
+        self.data = np.asarray(data, dtype=float)
+        if self.data.ndim != 2 or self.data.shape[1] != len(self.columns):
+            raise ValueError(
+                f"data must have shape (n_points, {len(self.columns)}), not {self.data.shape}"
+            )
+        self._index = {label: i for i, label in enumerate(self.columns)}
+        if len(self._index) != len(self.columns):
+            raise ValueError("column labels must be unique")
+
+    @classmethod
+    def empty(
+        cls, parameters: Sequence[Any], quantities: Sequence[Any], n_points: int
+    ) -> "SweepResult":
+        """a ``SweepResult`` with preallocated, zeroed storage
+
+        Args:
+            parameters (Sequence[Any]): labels of the parameter columns
+            quantities (Sequence[Any]): labels of the result columns
+            n_points (int): number of points
+
+        Returns:
+            SweepResult: empty result
+        """
+        return cls(
+            parameters, quantities, np.zeros((n_points, len(parameters) + len(quantities)))
+        )
+
+    @property
+    def columns(self) -> List[Any]:
+        """labels of every column: parameters, then quantities"""
+        return self.parameters + self.quantities
+
+    @property
+    def n_points(self) -> int:
+        return self.data.shape[0]
+
+    def __len__(self) -> int:
+        return self.n_points
+
+    def __getitem__(self, label: Any) -> np.ndarray:
+        """values of one column, as a view of ``data``"""
+        if label not in self._index:
+            raise KeyError(label)
+        return self.data[:, self._index[label]]
+
+    def __repr__(self):
+        return (
+            f"SweepResult({self.n_points} points, {len(self.parameters)} parameters, "
+            f"{len(self.quantities)} quantities)"
+        )
+
+    def select(self, index: Any) -> "SweepResult":
+        """the points selected by ``index``
+
+        Args:
+            index (Any): any numpy index over the points
+
+        Returns:
+            SweepResult: result at the selected points (a view of ``data``
+            for slices)
+        """
+        return SweepResult(self.parameters, self.quantities, self.data[index])
+
+    @classmethod
+    def concatenate(cls, results: Sequence["SweepResult"]) -> "SweepResult":
+        """join the points of several results with the same columns
+
+        Args:
+            results (Sequence[SweepResult]): results to join
+
+        Raises:
+            ValueError: if the results have different columns
+
+        Returns:
+            SweepResult: joined result
+        """
+        first = results[0]
+        if any(r.columns != first.columns for r in results):
+            raise ValueError("Results with different columns cannot be concatenated")
+        return cls(first.parameters, first.quantities, np.concatenate([r.data for r in results]))
+
+    def as_dict(self) -> Dict[Any, np.ndarray]:
+        """every column, keyed by label, as views of ``data``"""
+        return {label: self[label] for label in self.columns}
+
+    def save(self, filename: str) -> None:
+        """save to a ``.npz`` file
+
+        Args:
+            filename (str): path to the file
+        """
+        np.savez(
+            filename,
+            data=self.data,
+            labels=np.array(json.dumps([self.parameters, self.quantities])),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "SweepResult":
+        """load a result saved by ``save``, or every chunk written to a
+        directory by a ``SweepWriter``
+
+        Args:
+            path (str): path to a ``.npz`` file or a ``SweepWriter`` directory
+
+        Returns:
+            SweepResult: loaded result
+        """
+        if os.path.isdir(path):
+            chunks = sorted(
+                f for f in os.listdir(path) if f.startswith("chunk_") and f.endswith(".npz")
+            )
+            return cls.concatenate([cls.load(os.path.join(path, f)) for f in chunks])
+        with np.load(path) as archive:
+            parameters, quantities = json.loads(str(archive["labels"]))
+            return cls(
+                _labels_from_json(parameters), _labels_from_json(quantities), archive["data"]
+            )
+
+    def to_pandas(self) -> Any:
+        """a ``pandas.DataFrame`` with one row per point and one column per
+        label (see ``label_name``), sharing memory with ``data``
+
+        Returns:
+            pandas.DataFrame: the result
+        """
+        import pandas as pd  # type: ignore
+
+        return pd.DataFrame(
+            self.data, columns=[label_name(c) for c in self.columns], copy=False
+        )
+
+    def to_xarray(self) -> Any:
+        """an ``xarray.DataArray`` with dimensions ``("point", "column")``,
+        sharing memory with ``data``. Requires the optional ``xarray``
+        package.
+
+        Returns:
+            xarray.DataArray: the result
+        """
+        import xarray as xr  # type: ignore
+
+        return xr.DataArray(
+            self.data,
+            dims=("point", "column"),
+            coords={"column": [label_name(c) for c in self.columns]},
+        )
+
+
+class SweepWriter:
+    """Appends ``SweepResult`` chunks to a directory of ``.npz`` files, so
+    that a sweep can be written to disk as it is solved and resumed or
+    extended later. ``SweepResult.load`` reads the directory back.
+
+    Args:
+        directory (str): directory to write to, created if it does not exist
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.n_chunks = len(
+            [f for f in os.listdir(directory) if f.startswith("chunk_") and f.endswith(".npz")]
+        )
+        self._columns: Optional[List[Any]] = None
+        if self.n_chunks:
+            with np.load(os.path.join(directory, "chunk_00000000.npz")) as archive:
+                parameters, quantities = json.loads(str(archive["labels"]))
+            self._columns = _labels_from_json(parameters) + _labels_from_json(quantities)
+
+    def write(self, result: SweepResult) -> None:
+        """append a chunk
+
+        Args:
+            result (SweepResult): chunk to append
+
+        Raises:
+            ValueError: if its columns differ from the chunks already written
+        """
+        if self._columns is None:
+            self._columns = result.columns
+        elif self._columns != result.columns:
+            raise ValueError("Chunk columns differ from those already written")
+        result.save(os.path.join(self.directory, f"chunk_{self.n_chunks:08d}.npz"))
+        self.n_chunks += 1
+
+
+def sweep(
+    defect_system: DefectSystem,
+    temperature: Optional[ArrayLike] = None,
+    energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+    fixed: Optional[Mapping[Any, ArrayLike]] = None,
+    per_volume: bool = True,
+    decomposed: bool = False,
+    chunk_size: int = 1024,
+    writer: Optional[SweepWriter] = None,
+) -> Optional[SweepResult]:
+    """solve a ``DefectSystem`` at every point of a sweep, writing the
+    results directly into a ``SweepResult``, or chunk by chunk to a
+    ``SweepWriter``.
+
+    Args:
+        defect_system (DefectSystem): defect system
+        temperature (Optional[ArrayLike]): temperature(s). Defaults to
+          ``defect_system.temperature``.
+        energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy
+          shifts, as in ``DefectSystem.solve_batch``. Defaults to ``None``.
+        fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+          unit cell, as in ``DefectSystem.solve_batch``. Defaults to ``None``.
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Fixed
+          concentration parameters are always per unit cell. Defaults to True.
+        decomposed (bool, optional): if True, also return the concentration
+          of every charge state. Defaults to False.
+        chunk_size (int): number of points solved at a time. Defaults to 1024.
+        writer (Optional[SweepWriter]): if given, each chunk is written to
+          disk as soon as it is solved and only the current chunk is held in
+          memory. Defaults to ``None``.
+
+    Raises:
+        RuntimeError: if no solution is found for any of the points
+
+    Returns:
+        Optional[SweepResult]: one row per point of the flattened, broadcast
+        sweep, or ``None`` if the sweep was written to ``writer``; read it
+        back with ``SweepResult.load(writer.directory)``.
+    """
+    arrays = batch.charge_state_arrays(defect_system.defect_species)
+    if temperature is None:
+        temperature = defect_system.temperature
+    energy_shifts = energy_shifts or {}
+    fixed = fixed or {}
+
+    def key_label(kind: str, key: Any) -> tuple:
+        return (kind, *key) if isinstance(key, tuple) else (kind, key)
+
+    parameter_values: Dict[Any, ArrayLike] = {("temperature",): temperature}
+    parameter_values.update({key_label("energy", k): v for k, v in energy_shifts.items()})
+    parameter_values.update(
+        {key_label("fixed_concentration", k): v for k, v in fixed.items()}
+    )
+    shape = np.broadcast_shapes(*[np.shape(v) for v in parameter_values.values()])
+    n_points = int(np.prod(shape))
+    charge_states = [
+        (arrays.species_names[i], int(q))
+        for i, q in zip(arrays.species_index, arrays.charges)
+    ]
+    quantities: List[Any] = ["Fermi Energy", "p0", "n0", *arrays.species_names]
+    if decomposed:
+        quantities += charge_states
+
+    result = None
+    if writer is None:
+        result = SweepResult.empty(list(parameter_values), quantities, n_points)
+
+    scale = 1e24 / defect_system.volume if per_volume else 1
+    first = len(parameter_values)
+    n_species = len(arrays.species_names)
+    for start in range(0, n_points, chunk_size):
+        index = slice(start, min(start + chunk_size, n_points))
+        points = np.unravel_index(np.arange(index.start, index.stop), shape)
+
+        def at_points(value: ArrayLike) -> np.ndarray:
+            return np.broadcast_to(np.asarray(value, dtype=float), shape)[points]
+
+        _, chunk = batch.build_conditions(
+            arrays,
+            at_points(temperature),
+            {k: at_points(v) for k, v in energy_shifts.items()},
+            {k: at_points(v) for k, v in fixed.items()},
+        )
+        e_fermi, _ = batch.solve(
+            arrays,
+            defect_system.dos,
+            chunk,
+            convergence_tolerance=defect_system.convergence_tolerance,
+            n_trial_steps=defect_system.n_trial_steps,
+            chunk_size=chunk_size,
+        )
+        p0, n0, cs_concs, species_concs = batch.concentrations(
+            arrays, defect_system.dos, e_fermi, chunk
+        )
+        if result is None:
+            rows = np.empty((chunk.n_points, first + len(quantities)))
+        else:
+            rows = result.data[index]
+        for i, value in enumerate(parameter_values.values()):
+            rows[:, i] = at_points(value)
+        rows[:, first] = e_fermi
+        rows[:, first + 1] = p0 * scale
+        rows[:, first + 2] = n0 * scale
+        rows[:, first + 3 : first + 3 + n_species] = species_concs * scale
+        if decomposed:
+            rows[:, first + 3 + n_species :] = cs_concs * scale
+        if writer is not None:
+            writer.write(SweepResult(list(parameter_values), quantities, rows))
+    return result
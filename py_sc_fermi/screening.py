@@ -0,0 +1,412 @@
+"""Screening of candidate dopants against a shared host.
+
+The carrier concentrations of the host depend only on the Fermi energy and
+temperature, and are by far the most expensive part of the charge balance,
+so they are tabulated once per temperature on a Fermi energy grid. The
+charge of the native defects and of each candidate dopant ``DefectSpecies``
+is cheap, and is evaluated exactly, so every candidate (at every
+temperature) is solved in a single batched root search. The grid cells
+holding the roots are then tabulated more finely, once for all the
+candidates that share them, and the roots are polished on the finer table.
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike
+from typing import Dict, List, Optional, Tuple
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.dos import DOS, kboltz
+
+
+def _tabulate(
+    dos: DOS, e_fermi: np.ndarray, temperature: np.ndarray, chunk_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """logarithms of the hole and electron concentrations and their
+    derivatives with respect to the Fermi energy, evaluated ``chunk_size``
+    points at a time so that memory use does not grow with the number of
+    points.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: logarithms and their slopes, each of
+        shape ``(N, 2)`` with holes then electrons along the last axis
+    """
+    values = np.empty((len(e_fermi), 2))
+    slopes = np.empty((len(e_fermi), 2))
+    for start in range(0, len(e_fermi), chunk_size):
+        part = slice(start, start + chunk_size)
+        values[part] = np.stack(
+            batch.carrier_concentrations(dos, e_fermi[part], temperature[part]), axis=-1
+        )
+        slopes[part] = np.stack(
+            batch.carrier_derivatives(dos, e_fermi[part], temperature[part])[:2], axis=-1
+        )
+    # concentrations that underflow are deep in the Boltzmann tail, where the
+    # logarithm has a slope of -1/kT for holes and 1/kT for electrons
+    tiny = np.finfo(float).tiny
+    tail = values < tiny
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = np.where(
+            tail, np.array([-1.0, 1.0]) / (kboltz * temperature[:, None]), slopes / values
+        )
+    return np.log(np.fmax(values, tiny)), slopes
+
+
+def _interpolate(
+    values: np.ndarray,
+    slopes: np.ndarray,
+    row: np.ndarray,
+    position: np.ndarray,
+    spacing: float,
+) -> np.ndarray:
+    """cubic Hermite interpolation of tabulated logarithms.
+
+    Args:
+        values (np.ndarray): logarithms, shape ``(n_rows, n_nodes, 2)``
+        slopes (np.ndarray): their slopes, with the same shape
+        row (np.ndarray): row of each point, shape ``(N,)``
+        position (np.ndarray): position of each point along its row, in units
+          of the node spacing, shape ``(N,)``
+        spacing (float): node spacing
+
+    Returns:
+        np.ndarray: interpolated values (not logarithms), shape ``(N, 2)``
+    """
+    lower = np.clip(np.floor(position).astype(int), 0, values.shape[1] - 2)
+    w = (position - lower)[:, None]
+    upper = lower + 1
+    log_values = (
+        (1 + 2 * w) * (1 - w) ** 2 * values[row, lower]
+        + w * (1 - w) ** 2 * spacing * slopes[row, lower]
+        + w**2 * (3 - 2 * w) * values[row, upper]
+        + w**2 * (w - 1) * spacing * slopes[row, upper]
+    )
+    return np.exp(log_values)
+
+
+class HostCharge:
+    """charge densities of a host ``DefectSystem`` at many Fermi energies and
+    temperatures, with the carrier concentrations tabulated on a uniform
+    Fermi energy grid at each temperature.
+
+    The logarithms of the carrier concentrations are interpolated with cubic
+    Hermite polynomials, using their exact derivatives at the grid points,
+    so the interpolation error is fourth order in ``grid_spacing``. With the
+    default spacing it is within about 5e-4 (relative) at 100 K and 3e-6 at
+    300 K. The charge of the native defects is not tabulated, as it is cheap
+    to evaluate exactly. ``refine`` tabulates chosen grid cells
+    ``subdivisions`` times more finely, and with the default subdivisions
+    this reduces the error in those cells to about 1e-9 at 100 K and 3e-12
+    at 300 K.
+
+    The tables are built ``chunk_size`` points at a time, so memory use does
+    not depend on the size of the grid.
+
+    Args:
+        defect_system (DefectSystem): host defect system
+        temperatures (ArrayLike): temperatures to tabulate
+        grid_spacing (float): Fermi energy grid spacing in eV. Defaults to
+          ``1e-2``.
+        subdivisions (int): number of intervals each refined grid cell is
+          divided into. Defaults to 32.
+        chunk_size (int): number of grid points evaluated at once. Defaults
+          to 1024.
+    """
+
+    def __init__(
+        self,
+        defect_system: DefectSystem,
+        temperatures: ArrayLike,
+        grid_spacing: float = 1e-2,
+        subdivisions: int = 32,
+        chunk_size: int = 1024,
+    ):
+        self.defect_system = defect_system
+        self.temperatures = np.atleast_1d(np.asarray(temperatures, dtype=float))
+        self.arrays = batch.charge_state_arrays(defect_system.defect_species)
+        self.subdivisions = subdivisions
+        self.chunk_size = chunk_size
+        emin, emax = defect_system.dos.emin(), defect_system.dos.emax()
+        n_grid = int(np.ceil((emax - emin) / grid_spacing)) + 1
+        self.e_grid, self.grid_spacing = np.linspace(emin, emax, n_grid, retstep=True)
+        values, slopes = _tabulate(
+            defect_system.dos,
+            np.tile(self.e_grid, len(self.temperatures)),
+            np.repeat(self.temperatures, n_grid),
+            chunk_size,
+        )
+        self._values = values.reshape(len(self.temperatures), n_grid, 2)
+        self._slopes = slopes.reshape(len(self.temperatures), n_grid, 2)
+        # refined cells, identified by ``_cells`` keys in ascending order
+        self._refined_keys = np.empty(0, dtype=int)
+        self._refined_values = np.empty((0, subdivisions + 1, 2))
+        self._refined_slopes = np.empty((0, subdivisions + 1, 2))
+
+    def _cells(
+        self, e_fermi: np.ndarray, temperature_index: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """position of each point on the grid, in units of the grid spacing,
+        and a key identifying its grid cell and temperature"""
+        n_cells = len(self.e_grid) - 1
+        position = np.clip((e_fermi - self.e_grid[0]) / self.grid_spacing, 0, n_cells)
+        cell = np.minimum(position.astype(int), n_cells - 1)
+        return position, temperature_index * n_cells + cell
+
+    def carrier_concentrations(
+        self, e_fermi: np.ndarray, temperature_index: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """interpolated hole and electron concentrations of the host
+
+        Args:
+            e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+            temperature_index (np.ndarray): index into ``self.temperatures``
+              of each point, shape ``(N,)``
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: hole and electron concentrations
+            per unit cell, each of shape ``(N,)``
+        """
+        position, key = self._cells(e_fermi, temperature_index)
+        row = np.minimum(
+            np.searchsorted(self._refined_keys, key), max(len(self._refined_keys) - 1, 0)
+        )
+        refined = np.zeros(len(key), dtype=bool)
+        if len(self._refined_keys):
+            refined = self._refined_keys[row] == key
+        carriers = np.empty((len(key), 2))
+        carriers[~refined] = _interpolate(
+            self._values,
+            self._slopes,
+            temperature_index[~refined],
+            position[~refined],
+            self.grid_spacing,
+        )
+        cell = key[refined] % (len(self.e_grid) - 1)
+        carriers[refined] = _interpolate(
+            self._refined_values,
+            self._refined_slopes,
+            row[refined],
+            (position[refined] - cell) * self.subdivisions,
+            self.grid_spacing / self.subdivisions,
+        )
+        return carriers[:, 0], carriers[:, 1]
+
+    def charge_balance(
+        self, e_fermi: np.ndarray, temperature_index: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """positive and negative charge densities of the host, with
+        interpolated carrier concentrations
+
+        Args:
+            e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+            temperature_index (np.ndarray): index into ``self.temperatures``
+              of each point, shape ``(N,)``
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: positive and negative charge
+            densities per unit cell, each of shape ``(N,)``
+        """
+        p0, n0 = self.carrier_concentrations(e_fermi, temperature_index)
+        positive, negative = batch.defect_charge(
+            self.arrays,
+            batch.charge_state_concentrations(
+                self.arrays, e_fermi, self.temperatures[temperature_index]
+            ),
+        )
+        return p0 + positive, n0 + negative
+
+    def refine(self, e_fermi: np.ndarray, temperature_index: np.ndarray) -> np.ndarray:
+        """tabulate the grid cells containing the given Fermi energies
+        ``subdivisions`` times more finely, for every later evaluation that
+        falls in them.
+
+        Args:
+            e_fermi (np.ndarray): Fermi energies, shape ``(N,)``
+            temperature_index (np.ndarray): index into ``self.temperatures``
+              of each point, shape ``(N,)``
+
+        Returns:
+            np.ndarray: whether the cell of each point has been refined by
+            this call (rather than already being refined), shape ``(N,)``
+        """
+        _, key = self._cells(e_fermi, temperature_index)
+        new = np.setdiff1d(key, self._refined_keys)
+        if new.size:
+            n_cells = len(self.e_grid) - 1
+            offsets = np.arange(self.subdivisions + 1) * (self.grid_spacing / self.subdivisions)
+            values, slopes = _tabulate(
+                self.defect_system.dos,
+                (self.e_grid[new % n_cells][:, None] + offsets).ravel(),
+                np.repeat(self.temperatures[new // n_cells], len(offsets)),
+                self.chunk_size,
+            )
+            keys = np.concatenate([self._refined_keys, new])
+            order = np.argsort(keys)
+            self._refined_keys = keys[order]
+            self._refined_values = np.concatenate(
+                [self._refined_values, values.reshape(new.size, -1, 2)]
+            )[order]
+            self._refined_slopes = np.concatenate(
+                [self._refined_slopes, slopes.reshape(new.size, -1, 2)]
+            )[order]
+        return np.isin(key, new)
+
+
+class _PaddedDopants:
+    """the charge states of each candidate dopant in a padded
+    ``(n_candidates, max_charge_states)`` layout, so that each point of a
+    screen only evaluates the charge states of its own candidate. Padding
+    has zero degeneracy, and so zero concentration.
+    """
+
+    def __init__(self, candidates: List[DefectSpecies]):
+        arrays = batch.charge_state_arrays(candidates)
+        counts = np.bincount(arrays.species_index, minlength=len(candidates))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        slot = np.arange(arrays.n_charge_states) - starts[arrays.species_index]
+        shape = (len(candidates), max(int(counts.max(initial=0)), 1))
+        rows = (arrays.species_index, slot)
+        self.charges = np.zeros(shape)
+        self.charges[rows] = arrays.charges
+        self.energies = np.zeros(shape)
+        self.energies[rows] = arrays.energies
+        # the number of sites is folded into the degeneracy, so that each
+        # candidate can be treated as the single species of its point
+        self.degeneracies = np.zeros(shape)
+        self.degeneracies[rows] = arrays.degeneracies * arrays.nsites[arrays.species_index]
+        self.charge_state_fixed = np.full(shape, np.nan)
+        self.charge_state_fixed[rows] = arrays.charge_state_fixed
+        self.species_fixed = arrays.species_fixed[:, None]
+        self.names = np.array(arrays.species_names)
+
+    def arrays(self, candidate: np.ndarray) -> batch.ChargeStateArrays:
+        """the charge states of ``candidate[i]`` at each point ``i``, as a
+        single-species ``ChargeStateArrays`` whose charge state values
+        have a leading point axis
+
+        Args:
+            candidate (np.ndarray): index of the candidate at each point
+
+        Returns:
+            batch.ChargeStateArrays: charge state arrays of the points
+        """
+        return batch.ChargeStateArrays(
+            species_names=("dopant",),
+            species_index=np.zeros(self.charges.shape[1], dtype=int),
+            charges=self.charges[candidate],
+            energies=self.energies[candidate],
+            degeneracies=self.degeneracies[candidate],
+            nsites=np.ones(1),
+            species_fixed=self.species_fixed[candidate],
+            charge_state_fixed=self.charge_state_fixed[candidate],
+        )
+
+
+def screen_dopants(
+    defect_system: DefectSystem,
+    candidates: List[DefectSpecies],
+    temperature: Optional[ArrayLike] = None,
+    rank_by: str = "n0",
+    per_volume: bool = True,
+    grid_spacing: float = 1e-2,
+    subdivisions: int = 32,
+) -> Dict[str, np.ndarray]:
+    """solve a host ``DefectSystem`` with each of many candidate dopants added
+    in turn, and rank the candidates.
+
+    Args:
+        defect_system (DefectSystem): host defect system
+        candidates (List[DefectSpecies]): candidate dopants, each added to
+          the host on its own
+        temperature (Optional[ArrayLike]): temperature(s). Defaults to
+          ``defect_system.temperature``.
+        rank_by (str): ``"n0"``, ``"p0"`` or ``"Fermi Energy"``; candidates
+          are sorted by this value, highest first, within each temperature.
+          Defaults to ``"n0"``.
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Defaults to True.
+        grid_spacing (float): Fermi energy grid spacing, in eV, on which the
+          host carrier concentrations are tabulated to locate each root.
+          Defaults to ``1e-2``.
+        subdivisions (int): number of intervals each grid cell holding a
+          root is divided into to polish the roots. See ``HostCharge`` for
+          the resulting accuracy. Defaults to 32.
+
+    Raises:
+        ValueError: if ``rank_by`` is not recognised
+        RuntimeError: if no solution is found for any candidate
+
+    Returns:
+        Dict[str, np.ndarray]: table with one row per candidate and
+        temperature: ``"dopant"``, ``"temperature"``, ``"Fermi Energy"``,
+        ``"Fermi Energy shift"`` (relative to the host alone), ``"p0"``,
+        ``"n0"``, ``"dopant concentration"`` and the concentration of each
+        native ``DefectSpecies``.
+    """
+    if rank_by not in ("n0", "p0", "Fermi Energy"):
+        raise ValueError(f"rank_by must be n0, p0 or Fermi Energy, not {rank_by}")
+    if temperature is None:
+        temperature = defect_system.temperature
+    host = HostCharge(defect_system, temperature, grid_spacing, subdivisions)
+    dopants = _PaddedDopants(candidates)
+    n_temperatures, n_candidates = len(host.temperatures), len(candidates)
+    temperature_index = np.repeat(np.arange(n_temperatures), n_candidates)
+    candidate_index = np.tile(np.arange(n_candidates), n_temperatures)
+    temperatures = host.temperatures[temperature_index]
+
+    def balance(e: np.ndarray, index: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        positive, negative = host.charge_balance(e, temperature_index[index])
+        arrays = dopants.arrays(candidate_index[index])
+        dopant_positive, dopant_negative = batch.defect_charge(
+            arrays, batch.charge_state_concentrations(arrays, e, temperatures[index])
+        )
+        return positive + dopant_positive, negative + dopant_negative
+
+    search = (
+        defect_system.dos.emin(),
+        defect_system.dos.emax(),
+        len(candidate_index),
+        defect_system.convergence_tolerance,
+        defect_system.n_trial_steps,
+    )
+    e_fermi, _ = batch.find_fermi_energy(balance, *search)
+    # the cells holding the roots are refined once for every candidate that
+    # shares them, and the roots polished within a grid spacing. A polished
+    # root can cross into a neighbouring cell, which is then refined in turn
+    while np.any(host.refine(e_fermi, temperature_index)):
+        e_fermi, _ = batch.find_fermi_energy(
+            balance, *search, e_fermi_guess=e_fermi, window=host.grid_spacing
+        )
+    _, host_conditions = batch.build_conditions(host.arrays, host.temperatures)
+    host_e_fermi, _ = batch.solve(
+        host.arrays,
+        defect_system.dos,
+        host_conditions,
+        convergence_tolerance=defect_system.convergence_tolerance,
+        n_trial_steps=defect_system.n_trial_steps,
+    )
+
+    p0, n0 = host.carrier_concentrations(e_fermi, temperature_index)
+    native = batch.species_concentrations(
+        host.arrays, batch.charge_state_concentrations(host.arrays, e_fermi, temperatures)
+    )
+    arrays = dopants.arrays(candidate_index)
+    dopant_totals = batch.species_concentrations(
+        arrays, batch.charge_state_concentrations(arrays, e_fermi, temperatures)
+    )[:, 0]
+
+    scale = 1e24 / defect_system.volume if per_volume else 1
+    table = {
+        "dopant": dopants.names[candidate_index],
+        "temperature": temperatures,
+        "Fermi Energy": e_fermi,
+        "Fermi Energy shift": e_fermi - host_e_fermi[temperature_index],
+        "p0": p0 * scale,
+        "n0": n0 * scale,
+        "dopant concentration": dopant_totals * scale,
+    }
+    for i, name in enumerate(host.arrays.species_names):
+        table[name] = native[:, i] * scale
+    order = np.lexsort((-table[rank_by], temperatures))
+    return {key: value[order] for key, value in table.items()}
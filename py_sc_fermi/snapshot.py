@@ -0,0 +1,192 @@
+"""Immutable snapshots of a ``DefectSystem`` for concurrent solving.
+
+A ``SolverSnapshot`` copies everything the solver needs out of a
+``DefectSystem`` into read-only arrays when it is created. Its methods take
+all conditions as arguments and never modify the snapshot, so a single
+snapshot can be shared between threads (e.g. the workers of a
+``concurrent.futures.ThreadPoolExecutor``), and later changes to the
+``DefectSystem`` do not affect it.
+"""
+
+import numpy as np
+from copy import deepcopy
+from numpy.typing import ArrayLike
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from py_sc_fermi import batch
+from py_sc_fermi.dos import DOS
+from py_sc_fermi.defect_system import DefectSystem
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array = np.array(array)
+    array.setflags(write=False)
+    return array
+
+
+class SolverSnapshot:
+    """Frozen copy of the data of a ``DefectSystem``.
+
+    Args:
+        defect_system (DefectSystem): system to take a snapshot of
+
+    Raises:
+        AttributeError: on any attempt to set an attribute
+    """
+
+    __slots__ = (
+        "_arrays",
+        "_dos",
+        "_volume",
+        "_temperature",
+        "_convergence_tolerance",
+        "_n_trial_steps",
+    )
+    _arrays: batch.ChargeStateArrays
+    _dos: DOS
+    _volume: float
+    _temperature: float
+    _convergence_tolerance: float
+    _n_trial_steps: int
+
+    def __init__(self, defect_system: DefectSystem):
+        arrays = batch.charge_state_arrays(defect_system.defect_species)
+        arrays = batch.ChargeStateArrays(
+            arrays.species_names,
+            *[_read_only(value) for value in arrays[1:]],
+        )
+        dos = deepcopy(defect_system.dos)
+        dos.dos.setflags(write=False)
+        dos.edos.setflags(write=False)
+        for name, value in (
+            ("_arrays", arrays),
+            ("_dos", dos),
+            ("_volume", float(defect_system.volume)),
+            ("_temperature", float(defect_system.temperature)),
+            ("_convergence_tolerance", defect_system.convergence_tolerance),
+            ("_n_trial_steps", defect_system.n_trial_steps),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return (
+            f"SolverSnapshot({len(self._arrays.species_names)} defect species, "
+            f"{self._arrays.n_charge_states} charge states, T = {self._temperature} K)"
+        )
+
+    @property
+    def arrays(self) -> batch.ChargeStateArrays:
+        """read-only charge state arrays"""
+        return self._arrays
+
+    @property
+    def dos(self) -> DOS:
+        """copy of the ``DOS`` of the ``DefectSystem``"""
+        return self._dos
+
+    @property
+    def volume(self) -> float:
+        """volume of the unit cell in Angstroms cubed"""
+        return self._volume
+
+    @property
+    def temperature(self) -> float:
+        """default temperature"""
+        return self._temperature
+
+    @property
+    def defect_species_names(self) -> Tuple[str, ...]:
+        """names of the ``DefectSpecies``"""
+        return self._arrays.species_names
+
+    def solve_batch(
+        self,
+        temperature: Optional[ArrayLike] = None,
+        energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        per_volume: bool = True,
+        warm_start: bool = False,
+    ) -> Dict[str, np.ndarray]:
+        """solve for the self-consistent Fermi energy and concentrations at
+        many conditions, as ``DefectSystem.solve_batch``
+
+        Args:
+            temperature (Optional[ArrayLike]): temperature(s). Defaults to
+              ``self.temperature``.
+            energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy
+              shifts, keyed by ``DefectSpecies.name`` or by ``(name, charge)``.
+              Defaults to ``None``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+              unit cell, keyed by ``DefectSpecies.name`` or by
+              ``(name, charge)``. Defaults to ``None``.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+            warm_start (bool, optional): if True, treat the (flattened)
+              conditions as an ordered sweep. Defaults to False.
+
+        Raises:
+            RuntimeError: if no solution is found for any of the conditions
+
+        Returns:
+            Dict[str, np.ndarray]: Fermi energy, ``"p0"``, ``"n0"`` and the
+            concentration of each ``DefectSpecies``
+        """
+        shape, conditions = batch.build_conditions(
+            self._arrays,
+            self._temperature if temperature is None else temperature,
+            energy_shifts,
+            fixed,
+        )
+        e_fermi, _ = batch.solve(
+            self._arrays,
+            self._dos,
+            conditions,
+            convergence_tolerance=self._convergence_tolerance,
+            n_trial_steps=self._n_trial_steps,
+            warm_start=warm_start,
+        )
+        return batch.results(
+            self._arrays, self._dos, self._volume, e_fermi, conditions, shape, per_volume
+        )
+
+    def evaluate(
+        self,
+        e_fermi: ArrayLike,
+        temperature: Optional[ArrayLike] = None,
+        energy_shifts: Optional[Mapping[Any, ArrayLike]] = None,
+        fixed: Optional[Mapping[Any, ArrayLike]] = None,
+        per_volume: bool = True,
+    ) -> Dict[str, np.ndarray]:
+        """carrier and defect concentrations at given Fermi energies, which
+        need not be self-consistent
+
+        Args:
+            e_fermi (ArrayLike): Fermi energy (or energies)
+            temperature (Optional[ArrayLike]): temperature(s). Defaults to
+              ``self.temperature``.
+            energy_shifts (Optional[Mapping[Any, ArrayLike]]): formation energy
+              shifts, as in ``solve_batch``. Defaults to ``None``.
+            fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+              unit cell, as in ``solve_batch``. Defaults to ``None``.
+            per_volume (bool, optional): if True, return concentrations in units
+              of cm^-3, else returns concentration per unit cell. Defaults to True.
+
+        Returns:
+            Dict[str, np.ndarray]: Fermi energy, ``"p0"``, ``"n0"`` and the
+            concentration of each ``DefectSpecies``, broadcast together
+        """
+        temperature = self._temperature if temperature is None else temperature
+        e_fermi = np.asarray(e_fermi, dtype=float)
+        shape, conditions = batch.build_conditions(
+            self._arrays,
+            np.broadcast_arrays(temperature, e_fermi)[0],
+            energy_shifts,
+            fixed,
+        )
+        e_fermi = np.broadcast_to(e_fermi, shape).ravel()
+        return batch.results(
+            self._arrays, self._dos, self._volume, e_fermi, conditions, shape, per_volume
+        )
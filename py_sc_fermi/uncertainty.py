@@ -0,0 +1,136 @@
+"""Monte Carlo propagation of formation energy uncertainties.
+
+Each uncertain formation energy is treated as a normally distributed shift,
+keyed by ``DefectSpecies.name`` (one shift shared by every charge state of
+the species) or by ``(name, charge)``. Shifts may be correlated. The
+sampled shifts are solved in a single call to ``DefectSystem.solve_batch``
+and summarised as percentile bands.
+"""
+
+import numpy as np
+from numpy.typing import ArrayLike
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_system import DefectSystem
+
+
+def sample_energy_shifts(
+    defect_system: DefectSystem,
+    standard_deviations: Mapping[Any, float],
+    n_samples: int,
+    correlation: Optional[ArrayLike] = None,
+    seed: Optional[int] = None,
+) -> Dict[Tuple[str, int], np.ndarray]:
+    """draw normally distributed formation energy shifts
+
+    Args:
+        defect_system (DefectSystem): defect system
+        standard_deviations (Mapping[Any, float]): standard deviation of each
+          uncertain formation energy, keyed by ``DefectSpecies.name`` or by
+          ``(name, charge)``. Shifts of keys that share a charge state add.
+        n_samples (int): number of samples
+        correlation (Optional[ArrayLike]): correlation matrix between the
+          keys of ``standard_deviations``, in the order of its keys. Defaults
+          to ``None`` (independent shifts).
+        seed (Optional[int]): seed for ``numpy.random.default_rng``. Defaults
+          to ``None``.
+
+    Raises:
+        ValueError: if ``correlation`` does not match ``standard_deviations``
+
+    Returns:
+        Dict[Tuple[str, int], np.ndarray]: shift of every charge state, keyed
+        by ``(name, charge)``, each of shape ``(n_samples,)``
+    """
+    arrays = batch.charge_state_arrays(defect_system.defect_species)
+    keys = list(standard_deviations)
+    sigma = np.array([standard_deviations[k] for k in keys], dtype=float)
+    masks = np.array([batch.charge_state_mask(arrays, k) for k in keys], dtype=float)
+    masks = masks.reshape(len(keys), arrays.n_charge_states)
+    rng = np.random.default_rng(seed)
+    if correlation is None:
+        draws = rng.standard_normal((n_samples, len(keys))) * sigma
+    else:
+        correlation = np.asarray(correlation, dtype=float)
+        if correlation.shape != (len(keys), len(keys)):
+            raise ValueError(
+                f"correlation must have shape {(len(keys), len(keys))}, not {correlation.shape}"
+            )
+        draws = rng.multivariate_normal(
+            np.zeros(len(keys)), correlation * np.outer(sigma, sigma), size=n_samples
+        )
+    shifts = draws @ masks
+    return {
+        (arrays.species_names[i], int(q)): shifts[:, j]
+        for j, (i, q) in enumerate(zip(arrays.species_index, arrays.charges))
+    }
+
+
+def percentile_bands(
+    samples: Mapping[str, np.ndarray], percentiles: Sequence[float] = (2.5, 50, 97.5)
+) -> Dict[str, np.ndarray]:
+    """percentiles of each sampled quantity
+
+    Args:
+        samples (Mapping[str, np.ndarray]): samples of each quantity
+        percentiles (Sequence[float]): percentiles to evaluate. Defaults to
+          ``(2.5, 50, 97.5)``.
+
+    Returns:
+        Dict[str, np.ndarray]: percentiles of each quantity, each of shape
+        ``(len(percentiles),)``
+    """
+    return {k: np.percentile(v, percentiles) for k, v in samples.items()}
+
+
+def propagate_uncertainty(
+    defect_system: DefectSystem,
+    standard_deviations: Mapping[Any, float],
+    n_samples: int = 1000,
+    correlation: Optional[ArrayLike] = None,
+    seed: Optional[int] = None,
+    percentiles: Sequence[float] = (2.5, 50, 97.5),
+    temperature: Optional[float] = None,
+    fixed: Optional[Mapping[Any, ArrayLike]] = None,
+    per_volume: bool = True,
+    n_jobs: int = 1,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    """propagate formation energy uncertainties to the Fermi energy and the
+    carrier and defect concentrations by Monte Carlo sampling.
+
+    Args:
+        defect_system (DefectSystem): defect system
+        standard_deviations (Mapping[Any, float]): standard deviation of each
+          uncertain formation energy, as in ``sample_energy_shifts``
+        n_samples (int): number of samples. Defaults to 1000.
+        correlation (Optional[ArrayLike]): correlation matrix between the
+          keys of ``standard_deviations``. Defaults to ``None``.
+        seed (Optional[int]): random seed. Defaults to ``None``.
+        percentiles (Sequence[float]): percentiles to report. Defaults to
+          ``(2.5, 50, 97.5)``.
+        temperature (Optional[float]): temperature. Defaults to
+          ``defect_system.temperature``.
+        fixed (Optional[Mapping[Any, ArrayLike]]): fixed concentrations per
+          unit cell, as in ``DefectSystem.solve_batch``. Defaults to ``None``.
+        per_volume (bool, optional): if True, return concentrations in units
+          of cm^-3, else returns concentration per unit cell. Defaults to True.
+        n_jobs (int, optional): number of threads used to solve the samples.
+          Defaults to 1.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]: the solution for
+        every sample, as returned by ``DefectSystem.solve_batch``, and the
+        requested percentiles of each quantity.
+    """
+    energy_shifts = sample_energy_shifts(
+        defect_system, standard_deviations, n_samples, correlation, seed
+    )
+    samples = defect_system.solve_batch(
+        temperature=temperature,
+        energy_shifts=energy_shifts,
+        fixed=fixed,
+        per_volume=per_volume,
+        n_jobs=n_jobs,
+    )
+    return samples, percentile_bands(samples, percentiles)
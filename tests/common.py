@@ -0,0 +1,20 @@
+"""Test data shared between test modules."""
+
+import os
+
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.inputs import InputSet
+
+test_data_dir = os.path.join(os.path.dirname(__file__), "dummy_inputs")
+test_sc_fermi_input_filename = os.path.join(test_data_dir, "input_fermi.dat")
+test_unitcell_filename = os.path.join(test_data_dir, "unitcell.dat")
+test_dos_filename = os.path.join(test_data_dir, "totdos.dat")
+test_yaml_filename = os.path.join(test_data_dir, "defect_system.yaml")
+
+
+def example_defect_system() -> DefectSystem:
+    """the ``DefectSystem`` defined by the SC-Fermi inputs in ``dummy_inputs``"""
+    input_set = InputSet.from_sc_fermi_inputs(
+        test_sc_fermi_input_filename, test_unitcell_filename, test_dos_filename
+    )
+    return DefectSystem.from_input_set(input_set)
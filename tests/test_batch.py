@@ -0,0 +1,166 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies
+from tests.common import example_defect_system
+
+
+class TestChargeStateArrays(unittest.TestCase):
+    def setUp(self):
+        self.defect_species = [
+            DefectSpecies(
+                "v_O",
+                2,
+                {
+                    0: DefectChargeState(0, energy=1.0, degeneracy=2),
+                    2: DefectChargeState(2, fixed_concentration=0.1),
+                },
+                fixed_concentration=0.5,
+            ),
+            DefectSpecies("O_i", 1, {-2: DefectChargeState(-2, energy=2.0)}),
+        ]
+        self.arrays = batch.charge_state_arrays(self.defect_species)
+
+    def test_charge_state_arrays(self):
+        self.assertEqual(self.arrays.species_names, ("v_O", "O_i"))
+        np.testing.assert_equal(self.arrays.species_index, [0, 0, 1])
+        np.testing.assert_equal(self.arrays.charges, [0, 2, -2])
+        np.testing.assert_equal(self.arrays.energies, [1.0, np.nan, 2.0])
+        np.testing.assert_equal(self.arrays.degeneracies, [2, 1, 1])
+        np.testing.assert_equal(self.arrays.nsites, [2, 1])
+        np.testing.assert_equal(self.arrays.species_fixed, [0.5, np.nan])
+        np.testing.assert_equal(self.arrays.charge_state_fixed, [np.nan, 0.1, np.nan])
+
+    def test_species_sum(self):
+        np.testing.assert_equal(
+            batch.species_sum(self.arrays, np.array([[1.0, 2.0, 3.0]])), [[3.0, 3.0]]
+        )
+
+    def test_charge_state_concentrations_match_defect_species(self):
+        e_fermi = np.array([0.1, 0.5])
+        temperature = np.array([300.0, 1000.0])
+        concs = batch.charge_state_concentrations(self.arrays, e_fermi, temperature)
+        for row, (e, t) in enumerate(zip(e_fermi, temperature)):
+            expected = [
+                c
+                for ds in self.defect_species
+                for c in ds.charge_state_concentrations(e, t).values()
+            ]
+            np.testing.assert_allclose(concs[row], expected)
+
+    def test_build_conditions(self):
+        shape, conditions = batch.build_conditions(
+            self.arrays,
+            [300, 400],
+            energy_shifts={"v_O": [[0.1], [0.2], [0.3]], ("O_i", -2): 1.0},
+            fixed={"O_i": 0.2, ("v_O", 0): 0.3},
+        )
+        self.assertEqual(shape, (3, 2))
+        self.assertEqual(conditions.n_points, 6)
+        np.testing.assert_equal(conditions.temperature, [300, 400] * 3)
+        np.testing.assert_equal(conditions.energy_shifts[2], [0.2, 0.2, 1.0])
+        np.testing.assert_equal(conditions.species_fixed[0], [0.5, 0.2])
+        np.testing.assert_equal(conditions.charge_state_fixed[0], [0.3, 0.1, np.nan])
+
+    def test_charge_state_mask_raises_for_unknown_key(self):
+        with self.assertRaises(ValueError):
+            batch.charge_state_mask(self.arrays, "Foo")
+        with self.assertRaises(ValueError):
+            batch.charge_state_mask(self.arrays, ("O_i", 1))
+
+
+class TestSolve(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = example_defect_system()
+
+    def test_solve_matches_get_sc_fermi(self):
+        arrays = batch.charge_state_arrays(self.defect_system.defect_species)
+        temperatures = [100, 300, 1200]
+        _, conditions = batch.build_conditions(arrays, temperatures)
+        e_fermi, _ = batch.solve(arrays, self.defect_system.dos, conditions)
+        for t, e in zip(temperatures, e_fermi):
+            self.defect_system.temperature = t
+            self.assertAlmostEqual(e, self.defect_system.get_sc_fermi()[0], places=10)
+
+    def test_solve_with_guess(self):
+        arrays = batch.charge_state_arrays(self.defect_system.defect_species)
+        _, conditions = batch.build_conditions(arrays, [300, 600])
+        e_fermi, _ = batch.solve(arrays, self.defect_system.dos, conditions)
+        warm, _ = batch.solve(
+            arrays, self.defect_system.dos, conditions, e_fermi_guess=e_fermi + 0.01
+        )
+        np.testing.assert_allclose(warm, e_fermi, atol=1e-10)
+
+    def test_warm_start_matches_cold_solve(self):
+        arrays = batch.charge_state_arrays(self.defect_system.defect_species)
+        _, conditions = batch.build_conditions(arrays, np.linspace(100, 1500, 50))
+        cold, _ = batch.solve(arrays, self.defect_system.dos, conditions)
+        warm, _ = batch.solve(arrays, self.defect_system.dos, conditions, warm_start=True)
+        np.testing.assert_allclose(warm, cold, atol=1e-10)
+
+    def test_threaded_chunks_match_serial_solve(self):
+        arrays = batch.charge_state_arrays(self.defect_system.defect_species)
+        _, conditions = batch.build_conditions(arrays, np.linspace(100, 1500, 20))
+        serial, _ = batch.solve(arrays, self.defect_system.dos, conditions)
+        threaded, _ = batch.solve(
+            arrays, self.defect_system.dos, conditions, chunk_size=3, n_jobs=3
+        )
+        np.testing.assert_allclose(threaded, serial, atol=1e-10)
+
+    def test_results_match_concentration_dict(self):
+        arrays = batch.charge_state_arrays(self.defect_system.defect_species)
+        temperature = self.defect_system.temperature
+        _, conditions = batch.build_conditions(arrays, [temperature, temperature])
+        e_fermi, _ = batch.solve(arrays, self.defect_system.dos, conditions)
+        dos, volume = self.defect_system.dos, self.defect_system.volume
+        results = batch.results(arrays, dos, volume, e_fermi, conditions, (1, 2))
+        per_cell = batch.results(
+            arrays, dos, volume, e_fermi, conditions, (2,), per_volume=False
+        )
+        expected = self.defect_system.concentration_dict()
+        self.assertEqual(list(results), list(expected))
+        for key, value in expected.items():
+            self.assertEqual(results[key].shape, (1, 2))
+            np.testing.assert_allclose(results[key], value, rtol=1e-8)
+        np.testing.assert_allclose(
+            per_cell["V_Ga"] * 1e24 / volume, results["V_Ga"].ravel()
+        )
+
+    def test_carrier_derivatives_match_finite_differences(self):
+        dos = self.defect_system.dos
+        e_fermi, temperature, h = np.array([0.3]), np.array([600.0]), 1e-6
+        p0, n0 = batch.carrier_concentrations(dos, e_fermi, temperature)
+        p_e, n_e = batch.carrier_concentrations(dos, e_fermi + h, temperature)
+        p_t, n_t = batch.carrier_concentrations(dos, e_fermi, temperature + h)
+        expected = [(p_e - p0) / h, (n_e - n0) / h, (p_t - p0) / h, (n_t - n0) / h]
+        for value, fd in zip(batch.carrier_derivatives(dos, e_fermi, temperature), expected):
+            np.testing.assert_allclose(value, fd, rtol=1e-4)
+
+    def test_solve_raises_without_solution(self):
+        arrays = batch.charge_state_arrays(self.defect_system.defect_species)
+        _, conditions = batch.build_conditions(arrays, 300, fixed={("V_Ga", -1): 1e3})
+        with self.assertRaises(RuntimeError):
+            batch.solve(arrays, self.defect_system.dos, conditions)
+
+
+class TestFindRoot(unittest.TestCase):
+    def test_find_root_increasing_and_decreasing(self):
+        targets = np.array([1.5, 2.0, 3.0])
+        sign = np.array([1.0, -1.0, 1.0])
+
+        def objective(x, index):
+            return sign[index] * (np.exp(x) - targets[index])
+
+        root = batch.find_root(objective, np.zeros(3), np.full(3, 2.0), tolerance=1e-14)
+        np.testing.assert_allclose(root, np.log(targets), rtol=1e-12)
+
+    def test_find_root_raises_when_not_bracketed(self):
+        with self.assertRaises(RuntimeError):
+            batch.find_root(lambda x, index: x - 3.0, np.zeros(2), np.ones(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
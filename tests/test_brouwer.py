@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi.brouwer import brouwer_diagram, gas_chemical_potential
+from py_sc_fermi.dos import kboltz
+from tests.common import example_defect_system
+
+
+class TestGasChemicalPotential(unittest.TestCase):
+    def test_gas_chemical_potential(self):
+        mu = gas_chemical_potential([1.0, np.e ** 2], 500, reference_chemical_potential=-1.0)
+        np.testing.assert_allclose(mu, [-1.0, -1.0 + kboltz * 500])
+
+
+class TestBrouwerDiagram(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = example_defect_system()
+        self.defect_system.defect_species_by_name("V_Ga")._stoichiometry = {"Ga": -1}
+        self.defect_system.defect_species_by_name("Ga_Sb")._stoichiometry = {
+            "Ga": 1,
+            "Sb": -1,
+        }
+        self.pressures = np.logspace(-20, 0, 41)
+
+    def test_brouwer_diagram_matches_single_solves(self):
+        results = brouwer_diagram(
+            self.defect_system,
+            "Sb",
+            self.pressures,
+            temperature=800,
+            reference_chemical_potential=-0.2,
+            host_composition={"Ga": 1, "Sb": 1},
+            host_formation_energy=-0.5,
+        )
+        self.assertEqual(results["Fermi Energy"].shape, self.pressures.shape)
+        for i in [0, 17, 40]:
+            mu_sb = results["chemical potential"][i]
+            expected = self.defect_system.solve_chemical_potentials(
+                {"Ga": -0.5 - mu_sb, "Sb": mu_sb}, temperature=800
+            )
+            for key in ["Fermi Energy", "p0", "n0", "V_Ga", "Ga_Sb"]:
+                self.assertAlmostEqual(
+                    results[key][i] / float(expected[key]), 1.0, places=8
+                )
+
+    def test_brouwer_diagram_with_quench(self):
+        results = brouwer_diagram(
+            self.defect_system,
+            "Sb",
+            self.pressures,
+            temperature=800,
+            chemical_potentials={"Ga": -0.25},
+            quench_temperature=300,
+            per_volume=False,
+        )
+        annealed = brouwer_diagram(
+            self.defect_system,
+            "Sb",
+            self.pressures,
+            temperature=800,
+            chemical_potentials={"Ga": -0.25},
+            per_volume=False,
+        )
+        np.testing.assert_allclose(results["V_Ga"], annealed["V_Ga"], rtol=1e-10)
+        self.assertFalse(np.allclose(results["Fermi Energy"], annealed["Fermi Energy"]))
+
+    def test_brouwer_diagram_raises_for_underdetermined_host(self):
+        with self.assertRaises(ValueError):
+            brouwer_diagram(
+                self.defect_system,
+                "Sb",
+                self.pressures,
+                host_composition={"Ga": 1, "Sb": 1, "As": 1},
+                host_formation_energy=-0.5,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
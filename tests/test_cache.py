@@ -0,0 +1,51 @@
+import unittest
+import os
+import tempfile
+from copy import deepcopy
+
+from py_sc_fermi.cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    def test_put_and_get(self):
+        with ResultCache(":memory:") as cache:
+            self.assertIsNone(cache.get("a"))
+            cache.put("a", {"Fermi Energy": 0.5, "p0": 1e10})
+            self.assertIn("a", cache)
+            self.assertEqual(cache.get("a"), {"Fermi Energy": 0.5, "p0": 1e10})
+            cache.put("a", [1.0, 2.0])
+            self.assertEqual(cache.get("a"), [1.0, 2.0])
+            self.assertEqual(len(cache), 1)
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        with ResultCache(":memory:", max_entries=2) as cache:
+            cache.put("a", 1)
+            cache.put("b", 2)
+            cache.get("a")
+            cache.put("c", 3)
+            self.assertEqual(len(cache), 2)
+            self.assertNotIn("b", cache)
+            self.assertEqual(cache.get("a"), 1)
+            self.assertEqual(cache.get("c"), 3)
+
+    def test_results_persist_across_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "results.sqlite")
+            with ResultCache(path) as cache:
+                cache.put("a", {"n0": 1e12})
+            with ResultCache(path) as cache:
+                self.assertEqual(cache.get("a"), {"n0": 1e12})
+
+    def test_copies_share_the_cache(self):
+        with ResultCache(":memory:") as cache:
+            self.assertIs(deepcopy(cache), cache)
+
+    def test_invalid_max_entries_raises(self):
+        with self.assertRaises(ValueError):
+            ResultCache(":memory:", max_entries=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
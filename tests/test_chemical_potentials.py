@@ -0,0 +1,135 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from scipy.optimize import OptimizeResult  # type: ignore
+
+from py_sc_fermi.chemical_potentials import (
+    StabilityRegion,
+    doping_limit,
+    solve_stability_region,
+)
+from tests.common import example_defect_system
+
+
+class TestStabilityRegion(unittest.TestCase):
+    def setUp(self):
+        self.region = StabilityRegion(
+            {"Ti": 1, "O": 2},
+            -9.7,
+            competing_phases={"Ti2O3": ({"Ti": 2, "O": 3}, -15.8)},
+        )
+
+    def test_elements(self):
+        self.assertEqual(self.region.elements, ["Ti", "O"])
+
+    def test_vertices_of_binary(self):
+        vertices = self.region.vertices()
+        order = np.argsort(vertices["Ti"])
+        np.testing.assert_allclose(vertices["Ti"][order], [-9.7, -2.5])
+        np.testing.assert_allclose(vertices["O"][order], [0.0, -3.6])
+
+    def test_vertices_of_ternary(self):
+        region = StabilityRegion({"A": 1, "B": 1, "C": 1}, -3.0)
+        vertices = np.column_stack([region.vertices()[e] for e in "ABC"])
+        self.assertEqual(len(vertices), 3)
+        for expected in ([-3, 0, 0], [0, -3, 0], [0, 0, -3]):
+            self.assertTrue(np.any(np.all(np.isclose(vertices, expected), axis=1)))
+
+    def test_unstable_host_raises(self):
+        with self.assertRaises(ValueError):
+            StabilityRegion({"Ti": 1, "O": 2}, -9.7, {"TiO2-b": ({"Ti": 1, "O": 2}, -10.0)})
+
+    def test_phase_with_extra_element_raises(self):
+        with self.assertRaises(ValueError):
+            StabilityRegion({"Ti": 1, "O": 2}, -9.7, {"NbO": ({"Nb": 1, "O": 1}, -4.0)})
+
+    def test_grid_and_sample_are_inside_region(self):
+        grid = self.region.grid(0.5)
+        self.assertTrue(np.all(self.region.contains(grid)))
+        self.assertGreater(len(grid["Ti"]), 10)
+        sample = self.region.sample(20, seed=0)
+        self.assertEqual(len(sample["O"]), 20)
+        self.assertTrue(np.all(self.region.contains(sample)))
+        np.testing.assert_equal(sample["O"], self.region.sample(20, seed=0)["O"])
+
+    def test_sample_of_degenerate_regions(self):
+        point = StabilityRegion(
+            {"Ti": 1, "O": 2}, -9.7, competing_phases={"Ti2O3": ({"Ti": 2, "O": 3}, -19.4)}
+        )
+        sample = point.sample(5, seed=0)
+        np.testing.assert_allclose(sample["Ti"], -9.7)
+        np.testing.assert_allclose(sample["O"], 0.0)
+        segment = StabilityRegion(
+            {"A": 1, "B": 1, "C": 1}, -3.0, competing_phases={"AB": ({"A": 1, "B": 1}, -3.0)}
+        )
+        with self.assertRaises(ValueError):
+            segment.sample(5, seed=0, max_draws=3)
+
+    def test_contains(self):
+        np.testing.assert_equal(
+            self.region.contains({"Ti": np.array([-5.0, -1.0]), "O": np.array([-2.35, -4.35])}),
+            [True, False],
+        )
+
+
+class TestSolveStabilityRegion(unittest.TestCase):
+    def test_solve_stability_region(self):
+        defect_system = example_defect_system()
+        defect_system.defect_species_by_name("V_Ga")._stoichiometry = {"Ga": -1}
+        defect_system.defect_species_by_name("Ga_Sb")._stoichiometry = {"Ga": 1, "Sb": -1}
+        region = StabilityRegion({"Ga": 1, "Sb": 1}, -0.5)
+        mu, results = solve_stability_region(defect_system, region, spacing=0.1)
+        self.assertEqual(len(mu["Ga"]), len(results["Fermi Energy"]))
+        self.assertEqual(len(mu["Ga"]), 2 + 6)
+        expected = defect_system.solve_chemical_potentials({"Ga": mu["Ga"][0], "Sb": mu["Sb"][0]})
+        self.assertAlmostEqual(results["Fermi Energy"][0], float(expected["Fermi Energy"]))
+
+
+class TestDopingLimit(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = example_defect_system()
+        self.defect_system.temperature = 600
+        self.defect_system.defect_species_by_name("V_Ga")._stoichiometry = {"Ga": -1}
+        self.defect_system.defect_species_by_name("Ga_Sb")._stoichiometry = {"Ga": 1, "Sb": -1}
+        self.region = StabilityRegion(
+            {"Ga": 1, "Sb": 1, "X": 1},
+            -0.9,
+            competing_phases={"GaSb2": ({"Ga": 1, "Sb": 2}, -0.6)},
+        )
+
+    def test_doping_limit_beats_grid_search(self):
+        grid = self.region.grid(0.05)
+        grid_results = self.defect_system.solve_chemical_potentials(grid)
+        for target in ["n0", "p0"]:
+            mu, results = doping_limit(self.defect_system, self.region, target=target)
+            self.assertTrue(
+                self.region.contains({e: np.array([v]) for e, v in mu.items()})[0]
+            )
+            self.assertGreaterEqual(
+                float(results[target]), np.max(grid_results[target]) * (1 - 1e-8)
+            )
+
+    def test_doping_limit_rejects_infeasible_optimum(self):
+        infeasible = OptimizeResult(
+            x=np.array([5.0, 5.0]), fun=-1e3, success=False, message="failed"
+        )
+        with patch("py_sc_fermi.chemical_potentials.minimize", return_value=infeasible):
+            with self.assertWarns(UserWarning):
+                mu, _ = doping_limit(self.defect_system, self.region)
+        self.assertTrue(self.region.contains({e: np.array([v]) for e, v in mu.items()})[0])
+
+    def test_reduced_constraints_and_expand(self):
+        a, b = self.region.reduced_constraints()
+        vertices = self.region.vertices()
+        x = np.column_stack([vertices[e] for e in self.region.elements[:-1]])
+        self.assertTrue(np.all(x @ a.T <= b + self.region.tolerance))
+        np.testing.assert_allclose(self.region.expand(x)[:, -1], vertices["X"])
+
+    def test_doping_limit_raises_for_unknown_target(self):
+        with self.assertRaises(ValueError):
+            doping_limit(self.defect_system, self.region, target="V_Ga")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from py_sc_fermi.database import ResultsDatabase
+from tests.common import example_defect_system
+
+
+def write_results(path: str, worker: int) -> None:
+    with ResultsDatabase(path, batch_size=7) as database:
+        for i in range(20):
+            database.add(
+                f"material {worker}",
+                300.0 + i,
+                {"Fermi Energy": 0.1, "p0": 1.0, "n0": 2.0, "V_O": {0: 1.0, 2: 3.0}},
+            )
+
+
+class TestResultsDatabase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "results.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_record_and_query(self):
+        defect_system = example_defect_system()
+        with ResultsDatabase(self.path) as database:
+            expected = database.record("GaSb", defect_system, {"Ga": -0.1}, decomposed=True)
+            defect_system.temperature = 600
+            database.record("GaSb", defect_system, {"Ga": -0.2})
+            database.record("InSb", defect_system, {"In": 0.0})
+
+        with ResultsDatabase(self.path) as database:
+            self.assertEqual(len(database), 3)
+            (result,) = database.query(material="GaSb", chemical_potentials={"Ga": -0.1})
+            self.assertEqual(result["Fermi Energy"], expected["Fermi Energy"])
+            self.assertEqual(result["chemical_potentials"], {"Ga": -0.1})
+            for q, c in expected["V_Ga"].items():
+                self.assertEqual(result[("V_Ga", q)], c)
+            self.assertAlmostEqual(result["V_Ga"], sum(expected["V_Ga"].values()))
+            self.assertEqual(len(database.query(temperature=600)), 2)
+            self.assertEqual(len(database.query(temperature=(50, 400))), 1)
+            (result,) = database.query(material="InSb", species=["Ga_Sb"])
+            self.assertIn("Ga_Sb", result)
+            self.assertNotIn("V_Ga", result)
+            self.assertEqual(
+                len(database.query(fingerprint=defect_system.fingerprint())), 2
+            )
+
+    def test_add_batch(self):
+        defect_system = example_defect_system()
+        temperature = np.array([300.0, 600.0])
+        results = defect_system.solve_batch(temperature=temperature)
+        with ResultsDatabase(self.path) as database:
+            database.add_batch("GaSb", temperature, results, {"Ga": [-0.1, -0.2]})
+            stored = database.query(chemical_potentials={"Ga": -0.2})
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(stored[0]["temperature"], 600.0)
+        self.assertEqual(stored[0]["n0"], results["n0"][1])
+
+    def test_add_large_batch(self):
+        n_points = 1201
+        results = {
+            "Fermi Energy": np.linspace(0, 1, n_points),
+            "p0": 1.0,
+            "n0": 2.0,
+            "V_O": np.arange(n_points),
+        }
+        with ResultsDatabase(self.path, batch_size=500) as database:
+            database.add("other", 300.0, {"Fermi Energy": 0.0, "p0": 0.0, "n0": 0.0})
+            database.add_batch("TiO2", 300.0, results, {"O": -np.arange(n_points)})
+            stored = database.query(material="TiO2")
+        self.assertEqual(len(stored), n_points)
+        self.assertEqual([r["V_O"] for r in stored], list(range(n_points)))
+        self.assertEqual(
+            [r["chemical_potentials"]["O"] for r in stored], list(-np.arange(n_points))
+        )
+
+    def test_concurrent_writers(self):
+        with ProcessPoolExecutor(max_workers=3) as executor:
+            list(executor.map(write_results, [self.path] * 3, range(3)))
+        with ResultsDatabase(self.path) as database:
+            self.assertEqual(len(database), 60)
+            results = database.query(material="material 1", temperature=305)
+            self.assertEqual(len(results), 1)
+            self.assertEqual(results[0]["V_O"], 4.0)
+            self.assertEqual(results[0][("V_O", 2)], 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
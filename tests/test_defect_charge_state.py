@@ -79,6 +79,13 @@ class TestDefectChargeStateFixConcentration(unittest.TestCase):
         self.defect_charge_state.fix_concentration(1)
         self.assertEqual(self.defect_charge_state.fixed_concentration, 1)
 
+    def test_set_energy_and_version(self):
+        self.assertEqual(self.defect_charge_state.version, 0)
+        self.defect_charge_state.set_energy(0.5)
+        self.assertEqual(self.defect_charge_state.energy, 0.5)
+        self.defect_charge_state.fix_concentration(1)
+        self.assertEqual(self.defect_charge_state.version, 2)
+
 
 class TestDefectChargeStateGetFormationEnergy(unittest.TestCase):
     def setUp(self):
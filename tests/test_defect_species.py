@@ -3,9 +3,10 @@ from unittest.mock import Mock, PropertyMock, patch
 
 from copy import deepcopy
 
+import numpy as np
 from numpy.testing import assert_equal
 
-from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.defect_species import DefectSpecies, lower_envelope
 from py_sc_fermi.defect_charge_state import DefectChargeState
 
 
@@ -63,6 +64,8 @@ class TestDefectSpecies(unittest.TestCase):
         mock_charge_states[0].charge = 0
         mock_charge_states[1].charge = 1
         mock_charge_states[2].charge = 2
+        for charge_state in mock_charge_states.values():
+            charge_state.version = 0
         self.defect_species = DefectSpecies(
             name=name, nsites=nsites, charge_states=mock_charge_states
         )
@@ -90,6 +93,30 @@ class TestDefectSpecies(unittest.TestCase):
         self.defect_species.fix_concentration(0.1234)
         self.assertEqual(self.defect_species.fixed_concentration, 0.1234)
 
+    def test_version(self):
+        charge_states = {q: DefectChargeState(q, energy=1.0) for q in (0, 1)}
+        defect_species = DefectSpecies("V_O", 1, charge_states)
+        versions = [defect_species.version]
+        defect_species.charge_states[1].set_energy(0.5)
+        versions.append(defect_species.version)
+        defect_species.fix_concentration(0.1234)
+        versions.append(defect_species.version)
+        defect_species.charge_states[0].set_degeneracy(2)
+        versions.append(defect_species.version)
+        self.assertEqual(versions, sorted(set(versions)))
+        copy = deepcopy(defect_species)
+        copy.charge_states[1].set_energy(0.0)
+        self.assertEqual(defect_species.version, versions[-1])
+        self.assertGreater(copy.version, versions[-1])
+
+    def test_charge_states_are_read_only(self):
+        charge_states = {0: DefectChargeState(0, energy=1.0)}
+        defect_species = DefectSpecies("V_O", 1, charge_states)
+        with self.assertRaises(TypeError):
+            defect_species.charge_states[1] = DefectChargeState(1, energy=1.0)  # type: ignore
+        charge_states[1] = DefectChargeState(1, energy=1.0)
+        self.assertEqual(list(defect_species.charge_states), [0])
+
     def test_charge_states_by_formation_energy(self):
         self.defect_species.charge_states[0].get_formation_energy = Mock(
             return_value=0.3
@@ -300,6 +327,54 @@ class TestDefectSpecies(unittest.TestCase):
         self.assertEqual(tl_profile[2][0], 5)
         self.assertEqual(tl_profile[2][1], 2)
 
+    def test_tl_profile_skips_charge_states_above_the_envelope(self):
+        defect = DefectSpecies(
+            "foo",
+            1,
+            {
+                1: DefectChargeState(1, energy=1.0),
+                0: DefectChargeState(0, energy=2.5),
+                -1: DefectChargeState(-1, energy=3.0),
+            },
+        )
+        np.testing.assert_allclose(
+            defect.tl_profile(0, 2), [[0, 1.0], [1.0, 2.0], [2, 1.0]]
+        )
+
+    def test_lower_envelope(self):
+        envelope = lower_envelope(
+            np.array([1.0, 1.0, 0.0, -1.0]), np.array([0.5, 0.0, 1.0, 3.0]), -1, 3
+        )
+        np.testing.assert_allclose(envelope, [[-1, -1], [1, 1], [2, 1], [3, 0]])
+
+    def test_partitions_are_cached_until_modified(self):
+        defect_species = DefectSpecies(
+            "V_O",
+            1,
+            {
+                0: DefectChargeState(0, energy=1.0),
+                1: DefectChargeState(1, energy=0.5),
+                2: DefectChargeState(2, energy=0.2),
+            },
+        )
+        variable = defect_species.variable_conc_charge_states()
+        self.assertEqual(list(variable), [0, 1, 2])
+        with self.assertRaises(TypeError):
+            del variable[0]  # type: ignore
+        ordered = defect_species.charge_states_by_formation_energy(0.0)
+        self.assertEqual([cs.charge for cs in ordered], [2, 1, 0])
+        ordered.pop()
+        self.assertEqual(len(defect_species.charge_states_by_formation_energy(0.0)), 3)
+
+        defect_species.charge_states[0].fix_concentration(0.1)
+        self.assertEqual(list(defect_species.variable_conc_charge_states()), [1, 2])
+        self.assertEqual(list(defect_species.fixed_conc_charge_states()), [0])
+        defect_species.charge_states[2].set_energy(2.0)
+        self.assertEqual(
+            [cs.charge for cs in defect_species.charge_states_by_formation_energy(0.0)],
+            [1, 2],
+        )
+
     def test__repr__(self):
         self.defect_species._charge_states = {
             2: DefectChargeState(2, energy=-1, degeneracy=1)
@@ -368,6 +443,28 @@ class TestDefectSpecies(unittest.TestCase):
         # Verify the result
         self.assertEqual(result, expected_result)
 
+    def test_from_dict_with_stoichiometry(self):
+        d = {
+            "name": "V_O",
+            "nsites": 2,
+            "charge_states": {1: {"charge": 1, "energy": 0, "degeneracy": 1}},
+            "stoichiometry": {"O": -1},
+        }
+        self.assertEqual(DefectSpecies.from_dict(d).stoichiometry, {"O": -1})
+        self.assertEqual(DefectSpecies.from_dict(d).as_dict()["stoichiometry"], {"O": -1})
+
+    def test_stoichiometry_defaults_to_empty(self):
+        self.assertEqual(self.defect_species.stoichiometry, {})
+        self.assertNotIn("stoichiometry", self.defect_species.as_dict())
+
+    def test_chemical_potential_shift(self):
+        self.defect_species._stoichiometry = {"O": -1, "Ti": 1}
+        self.assertEqual(
+            self.defect_species.chemical_potential_shift({"O": -2.0, "Ti": -1.0}), -1.0
+        )
+        with self.assertRaises(ValueError):
+            self.defect_species.chemical_potential_shift({"O": -2.0})
+
     def test__from_string(self):
         string = "V_O 1 2\n2 2 2"
         string = string.splitlines()
@@ -1,6 +1,9 @@
+import asyncio
 import unittest
+from copy import deepcopy
 from unittest.mock import Mock, patch
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import os
@@ -9,6 +12,8 @@ from py_sc_fermi.defect_species import DefectSpecies
 from py_sc_fermi.dos import DOS
 from py_sc_fermi.defect_system import DefectSystem, CustomWarningManager
 from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.inputs import InputSet
+from py_sc_fermi.cache import ResultCache
 
 
 input_string = "1\n12\n0.1\n298\n1\nv_O 1 1\n 1 1 1\n1\nO_i 1e+22\n1\nO_i 1 1e+22\n"
@@ -25,6 +30,13 @@ test_yaml_filename = os.path.join(
 test_exception_yaml_filename = os.path.join(
     os.path.dirname(__file__), test_data_dir, "bad_yaml.yaml"
 )
+test_sc_fermi_input_filename = os.path.join(
+    os.path.dirname(__file__), test_data_dir, "input_fermi.dat"
+)
+test_unitcell_filename = os.path.join(
+    os.path.dirname(__file__), test_data_dir, "unitcell.dat"
+)
+test_dos_filename = os.path.join(os.path.dirname(__file__), test_data_dir, "totdos.dat")
 test_vasprun_filename = os.path.join(
     os.path.dirname(__file__), test_data_dir, "vasprun_nsp.xml"
 )
@@ -235,6 +247,20 @@ class TestDefectSystem(unittest.TestCase):
             {"v_O": [[1, 1], [2, 2]], "O_i": [[1, 1], [2, 2]]},
         )
 
+    def test_get_transition_levels_with_energy_shifts(self):
+        self.defect_system.defect_species_by_name("v_O").tl_profile = Mock(
+            return_value=[[1, 2], [3, 4]]
+        )
+        self.defect_system.defect_species_by_name("O_i").tl_profile = Mock(
+            return_value=[[1, 2], [3, 4]]
+        )
+        transition_levels = self.defect_system.get_transition_levels(
+            energy_shifts={"v_O": np.array([0.0, 1.0])}
+        )
+        self.assertEqual(transition_levels["v_O"][0], [1, 3])
+        np.testing.assert_equal(transition_levels["v_O"][1], [[2, 4], [3, 5]])
+        self.assertEqual(transition_levels["O_i"], [[1, 3], [2, 4]])
+
     def test_concentration_dict(self):
         self.defect_system.get_sc_fermi = Mock(return_value=[1, {}])
         self.defect_system.dos.carrier_concentrations = Mock(return_value=(1, 1))
@@ -270,6 +296,17 @@ class TestDefectSystem(unittest.TestCase):
 
 
 
+    def test_chemical_potential_shifts(self):
+        self.defect_system.defect_species[0].stoichiometry = {"O": -1}
+        self.defect_system.defect_species[1].stoichiometry = {"O": 1, "Ti": -1}
+        shifts = self.defect_system.chemical_potential_shifts(
+            {"O": np.array([0.0, -1.0]), "Ti": -2.0}
+        )
+        np.testing.assert_equal(shifts["v_O"], [0.0, -1.0])
+        np.testing.assert_equal(shifts["O_i"], [-2.0, -1.0])
+        with self.assertRaises(ValueError):
+            self.defect_system.chemical_potential_shifts({"O": 0.0})
+
     def test__repr__(self):
         self.defect_system.defect_species = []
         self.defect_system.dos.nelect = 100
@@ -280,5 +317,365 @@ class TestDefectSystem(unittest.TestCase):
         )
 
 
+class TestDefectSystemBatch(unittest.TestCase):
+    def setUp(self):
+        input_set = InputSet.from_sc_fermi_inputs(
+            test_sc_fermi_input_filename, test_unitcell_filename, test_dos_filename
+        )
+        self.defect_system = DefectSystem.from_input_set(input_set)
+
+    def test_solve_batch_matches_concentration_dict(self):
+        results = self.defect_system.solve_batch(temperature=[300, 600])
+        self.assertEqual(results["Fermi Energy"].shape, (2,))
+        for i, t in enumerate([300, 600]):
+            self.defect_system.temperature = t
+            expected = self.defect_system.concentration_dict()
+            for key, value in expected.items():
+                self.assertAlmostEqual(results[key][i] / value, 1.0, places=6)
+
+    def test_solve_batch_with_fixed_and_energy_shifts(self):
+        results = self.defect_system.solve_batch(
+            energy_shifts={"Ga_Sb": -1.5}, fixed={"V_Ga": 1e-4}, per_volume=False
+        )
+        self.defect_system.defect_species_by_name("V_Ga").fix_concentration(1e-4)
+        for cs in self.defect_system.defect_species_by_name("Ga_Sb").charge_states.values():
+            cs._energy -= 1.5
+        expected = self.defect_system.concentration_dict(per_volume=False)
+        self.assertEqual(results["Fermi Energy"].shape, ())
+        for key, value in expected.items():
+            self.assertAlmostEqual(float(results[key]) / value, 1.0, places=6)
+
+    def test_solve_chemical_potentials(self):
+        self.defect_system.defect_species_by_name("V_Ga")._stoichiometry = {"Ga": -1}
+        self.defect_system.defect_species_by_name("Ga_Sb")._stoichiometry = {"Ga": 1, "Sb": -1}
+        mu_ga = np.linspace(-0.5, 0.0, 3)
+        results = self.defect_system.solve_chemical_potentials(
+            {"Ga": mu_ga[:, None], "Sb": np.linspace(-0.5, 0.0, 4)}
+        )
+        self.assertEqual(results["Fermi Energy"].shape, (3, 4))
+        shifted = self.defect_system.solve_batch(
+            energy_shifts={"V_Ga": mu_ga[1], "Ga_Sb": -mu_ga[1] + 0.5 / 3}
+        )
+        self.assertAlmostEqual(results["Fermi Energy"][1, 1], shifted["Fermi Energy"], places=10)
+
+    def test_solve_quench_matches_fix_concentration(self):
+        anneal, quench = self.defect_system.solve_quench(
+            [800, 1200], 300, per_volume=False
+        )
+        self.assertEqual(quench["Fermi Energy"].shape, (2,))
+        for i, t in enumerate([800, 1200]):
+            defect_system = deepcopy(self.defect_system)
+            defect_system.temperature = t
+            annealed = defect_system.concentration_dict(per_volume=False)
+            for ds in defect_system.defect_species:
+                ds.fix_concentration(annealed[ds.name])
+            defect_system.temperature = 300
+            expected = defect_system.concentration_dict(per_volume=False)
+            for key, value in annealed.items():
+                self.assertAlmostEqual(anneal[key][i] / value, 1.0, places=6)
+            for key, value in expected.items():
+                self.assertAlmostEqual(quench[key][i] / value, 1.0, places=6)
+
+    def test_solve_quench_with_frozen_charge_states(self):
+        anneal, quench = self.defect_system.solve_quench(
+            1000,
+            [100, 300],
+            frozen_species=[],
+            frozen_charge_states=[("V_Ga", -3)],
+            per_volume=False,
+        )
+        annealed = self.defect_system.defect_species_by_name(
+            "V_Ga"
+        ).charge_state_concentrations(float(anneal["Fermi Energy"][0]), 1000)
+        self.defect_system.defect_species_by_name("V_Ga").charge_states[
+            -3
+        ].fix_concentration(annealed[-3])
+        self.defect_system.temperature = 300
+        self.assertAlmostEqual(
+            quench["Fermi Energy"][1], self.defect_system.get_sc_fermi()[0], places=8
+        )
+
+    def test_solve_quench_raises_for_unknown_species(self):
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_quench(1000, 300, frozen_species=["Foo"])
+
+    def test_sensitivities_match_finite_differences(self):
+        self.defect_system.temperature = 700
+        self.defect_system.defect_species_by_name("Ga_Sb").fix_concentration(1e-4)
+        sensitivities = self.defect_system.sensitivities(per_volume=False)
+        self.assertEqual(sensitivities.jacobian.shape, (10, 16))
+        self.assertNotIn(("fixed_concentration", "V_Ga"), sensitivities.parameters)
+        base = self.defect_system.solve_batch(per_volume=False)
+        h = 1e-5
+        perturbations = {
+            ("energy", "V_Ga", -2): dict(energy_shifts={("V_Ga", -2): h}),
+            ("temperature",): dict(temperature=700 + h),
+            ("fixed_concentration", "Ga_Sb"): dict(fixed={"Ga_Sb": 1e-4 + 1e-9}),
+        }
+        for parameter, kwargs in perturbations.items():
+            step = 1e-9 if "fixed" in kwargs else h
+            perturbed = self.defect_system.solve_batch(per_volume=False, **kwargs)
+            column = sensitivities.parameters.index(parameter)
+            for key in ["Fermi Energy", "p0", "n0"]:
+                row = sensitivities.outputs.index(key)
+                self.assertAlmostEqual(
+                    sensitivities.jacobian[row, column],
+                    (perturbed[key] - base[key]) / step,
+                    delta=1e-3 * abs(sensitivities.jacobian[row, column]) + 1e-12,
+                )
+
+    def test_sensitivities_per_volume(self):
+        per_cell = self.defect_system.sensitivities(per_volume=False)
+        per_volume = self.defect_system.sensitivities()
+        scale = 1e24 / self.defect_system.volume
+        np.testing.assert_allclose(per_volume.jacobian[0], per_cell.jacobian[0])
+        np.testing.assert_allclose(per_volume.jacobian[1], per_cell.jacobian[1] * scale)
+
+    def test_solve_inverse_energy_shift(self):
+        self.defect_system.temperature = 300
+        results = self.defect_system.solve_inverse(
+            "p0", [1e16, 1e17], ("energy", "V_Ga"), (-1, 2)
+        )
+        np.testing.assert_allclose(results["p0"], [1e16, 1e17], rtol=1e-6)
+        check = self.defect_system.solve_batch(
+            energy_shifts={"V_Ga": results["parameter"]}
+        )
+        np.testing.assert_allclose(check["p0"], [1e16, 1e17], rtol=1e-6)
+
+    def test_solve_inverse_fixed_concentration_and_temperature(self):
+        self.defect_system.temperature = 300
+        results = self.defect_system.solve_inverse(
+            "p0", 1e15, ("fixed_concentration", "V_Ga"), (1e10, 1e22)
+        )
+        self.assertAlmostEqual(float(results["p0"]) / 1e15, 1.0, places=6)
+        self.assertAlmostEqual(
+            float(results["V_Ga"]) / float(results["parameter"]), 1.0, places=10
+        )
+        results = self.defect_system.solve_inverse(
+            "Fermi Energy", -0.05, ("temperature",), (100, 1500)
+        )
+        self.assertAlmostEqual(float(results["Fermi Energy"]), -0.05, places=6)
+
+    def test_solve_inverse_raises(self):
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_inverse("Foo", 1e16, ("energy", "V_Ga"), (-1, 2))
+        with self.assertRaises(ValueError):
+            self.defect_system.solve_inverse("p0", 1e16, ("volume",), (-1, 2))
+        for parameter in [(), ("energy",), ("temperature", "V_Ga"), ("energy", "V_Ga", 0, 1)]:
+            with self.assertRaises(ValueError):
+                self.defect_system.solve_inverse("p0", 1e16, parameter, (-1, 2))
+        with self.assertRaises(RuntimeError):
+            self.defect_system.solve_inverse("n0", 1e16, ("energy", "V_Ga"), (-1, 1))
+
+    def test_incremental_get_sc_fermi(self):
+        self.defect_system.temperature = 600
+        e_fermi, _ = self.defect_system.get_sc_fermi(incremental=True)
+        self.assertAlmostEqual(e_fermi, self.defect_system.get_sc_fermi()[0], places=8)
+        v_ga = self.defect_system.defect_species_by_name("V_Ga")
+        v_ga.charge_states[-1].set_energy(v_ga.charge_states[-1].energy + 0.3)
+        self.defect_system.defect_species_by_name("Ga_Sb").fix_concentration(1e-4)
+        e_fermi, _ = self.defect_system.get_sc_fermi(incremental=True)
+        self.assertAlmostEqual(e_fermi, self.defect_system.get_sc_fermi()[0], places=8)
+        self.defect_system.temperature = 300
+        e_fermi, _ = self.defect_system.get_sc_fermi(incremental=True)
+        self.assertAlmostEqual(e_fermi, self.defect_system.get_sc_fermi()[0], places=8)
+
+    def test_incremental_cache_only_updates_changed_species(self):
+        self.defect_system.get_sc_fermi(incremental=True)
+        cached = dict(self.defect_system._species_cache)
+        self.defect_system.defect_species_by_name("V_Ga").charge_states[0].set_energy(1.0)
+        self.defect_system.get_sc_fermi(incremental=True)
+        self.assertIs(self.defect_system._species_cache["Ga_Sb"], cached["Ga_Sb"])
+        self.assertIsNot(self.defect_system._species_cache["V_Ga"], cached["V_Ga"])
+
+    def test_incremental_cache_detects_replaced_species(self):
+        v_ga = self.defect_system.defect_species_by_name("V_Ga")
+        replacement = deepcopy(v_ga)
+        replacement.charge_states[-1].set_energy(v_ga.charge_states[-1].energy + 0.3)
+        v_ga.charge_states[0].set_energy(v_ga.charge_states[0].energy)
+        self.assertEqual(replacement.version, v_ga.version)
+        self.defect_system.get_sc_fermi(incremental=True)
+        index = self.defect_system.defect_species.index(v_ga)
+        self.defect_system.defect_species[index] = replacement
+        e_fermi, _ = self.defect_system.get_sc_fermi(incremental=True)
+        self.assertAlmostEqual(e_fermi, self.defect_system.get_sc_fermi()[0], places=8)
+
+    def test_with_overrides_matches_modified_copy(self):
+        variant = self.defect_system.with_overrides(
+            temperature=600,
+            fixed={"Ga_Sb": 1e-4},
+            energy_shifts={"V_Ga": 0.1, ("V_Ga", -1): 0.2},
+        )
+        expected = deepcopy(self.defect_system)
+        expected.temperature = 600
+        expected.defect_species_by_name("Ga_Sb").fix_concentration(1e-4)
+        for q, cs in expected.defect_species_by_name("V_Ga").charge_states.items():
+            cs.set_energy(cs.energy + (0.3 if q == -1 else 0.1))
+        self.assertAlmostEqual(
+            variant.get_sc_fermi()[0], expected.get_sc_fermi()[0], places=10
+        )
+
+        self.assertIs(variant.dos, self.defect_system.dos)
+        for name in variant.defect_species_names:
+            shared = variant.defect_species_by_name(name)
+            original = self.defect_system.defect_species_by_name(name)
+            self.assertEqual(shared is original, name not in ("Ga_Sb", "V_Ga"))
+        self.assertIsNone(self.defect_system.defect_species_by_name("Ga_Sb").fixed_concentration)
+        with self.assertRaises(ValueError):
+            self.defect_system.with_overrides(fixed={"Foo": 1e-4})
+        with self.assertRaises(ValueError):
+            self.defect_system.with_overrides(energy_shifts={("V_Ga", 7): 0.1})
+
+    def test_fingerprint(self):
+        fingerprint = self.defect_system.fingerprint()
+        self.assertEqual(deepcopy(self.defect_system).fingerprint(), fingerprint)
+        self.assertEqual(
+            DefectSystem.from_defect_table(
+                self.defect_system.to_defect_table(),
+                self.defect_system.dos,
+                self.defect_system.volume,
+                self.defect_system.temperature,
+                self.defect_system.convergence_tolerance,
+                self.defect_system.n_trial_steps,
+            ).fingerprint(),
+            fingerprint,
+        )
+        self.assertNotEqual(
+            self.defect_system.with_overrides(energy_shifts={("V_Ga", 0): 1e-6}).fingerprint(),
+            fingerprint,
+        )
+        self.assertNotEqual(
+            self.defect_system.with_overrides(temperature=301).fingerprint(), fingerprint
+        )
+
+    def test_result_cache_skips_repeated_solves(self):
+        self.defect_system.result_cache = ResultCache(":memory:")
+        e_fermi = self.defect_system.get_sc_fermi()
+        concentrations = self.defect_system.concentration_dict(decomposed=True)
+        variant = deepcopy(self.defect_system)
+        variant.result_cache = self.defect_system.result_cache
+        with patch.object(DefectSystem, "_solve") as solve:
+            self.assertEqual(variant.get_sc_fermi(), e_fermi)
+            self.assertEqual(variant.concentration_dict(decomposed=True), concentrations)
+            solve.assert_not_called()
+        variant.temperature = 600
+        self.assertNotEqual(variant.get_sc_fermi(), e_fermi)
+
+    def test_iter_solutions_matches_solve_batch(self):
+        temperatures = np.linspace(300, 900, 11)
+        points = [
+            {"temperature": t, "energy_shifts": {"V_Ga": 0.05 * (i % 3)}}
+            for i, t in enumerate(temperatures)
+        ]
+        points[4]["fixed"] = {"Ga_Sb": 1e-4}
+        expected = [
+            self.defect_system.solve_batch(
+                temperature=p["temperature"],
+                energy_shifts=p["energy_shifts"],
+                fixed=p.get("fixed"),
+            )
+            for p in points
+        ]
+        for ordered, n_jobs in ((True, 1), (True, 3), (False, 3)):
+            chunks = list(
+                self.defect_system.iter_solutions(
+                    iter(points), chunk_size=3, ordered=ordered, n_jobs=n_jobs
+                )
+            )
+            self.assertEqual(sorted(len(c["index"]) for c in chunks), [2, 3, 3, 3])
+            if ordered:
+                np.testing.assert_equal(
+                    np.concatenate([c["index"] for c in chunks]), np.arange(11)
+                )
+            for chunk in chunks:
+                for j, i in enumerate(chunk["index"]):
+                    for key, value in expected[i].items():
+                        self.assertAlmostEqual(chunk[key][j] / value, 1.0, places=8)
+        with self.assertRaises(ValueError):
+            next(self.defect_system.iter_solutions([{"pressure": 1.0}]))
+
+    def test_solve_async_matches_solve_batch(self):
+        temperature = np.array([300.0, 600.0])
+        expected = self.defect_system.solve_batch(temperature=temperature)
+
+        async def main():
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                return await asyncio.gather(
+                    self.defect_system.solve_async(temperature=temperature),
+                    self.defect_system.solve_async(
+                        temperature=temperature, executor=executor
+                    ),
+                )
+
+        for result in asyncio.run(main()):
+            for key, value in expected.items():
+                np.testing.assert_allclose(result[key], value, rtol=1e-12)
+
+    def test_iter_solutions_async(self):
+        points = [{"temperature": t} for t in np.linspace(300, 900, 7)]
+        expected = list(self.defect_system.iter_solutions(points, chunk_size=3))
+
+        async def collect(max_pending):
+            return [
+                chunk
+                async for chunk in self.defect_system.iter_solutions_async(
+                    iter(points), chunk_size=3, max_pending=max_pending
+                )
+            ]
+
+        for max_pending in (1, 3):
+            chunks = asyncio.run(collect(max_pending))
+            self.assertEqual(len(chunks), len(expected))
+            for chunk, reference in zip(chunks, expected):
+                for key, value in reference.items():
+                    np.testing.assert_allclose(chunk[key], value, rtol=1e-12)
+
+        async def first_chunk():
+            solutions = self.defect_system.iter_solutions_async(
+                iter(points), chunk_size=1, max_pending=2
+            )
+            chunk = await solutions.__anext__()
+            await solutions.aclose()
+            return chunk
+
+        np.testing.assert_equal(asyncio.run(first_chunk())["index"], [0])
+
+    def test_parameter_round_trip(self):
+        self.defect_system.defect_species_by_name("Ga_Sb").fix_concentration(1e-4)
+        self.defect_system.defect_species_by_name("V_Ga").charge_states[-3].fix_concentration(1e-6)
+        layout = self.defect_system.parameter_layout()
+        parameters = self.defect_system.get_parameters()
+        self.assertEqual(len(layout), len(parameters))
+        self.assertEqual(layout, self.defect_system.sensitivities().parameters)
+        self.assertIn(("fixed_concentration", "Ga_Sb"), layout)
+        self.assertIn(("fixed_concentration", "V_Ga", -3), layout)
+        self.assertNotIn(("energy", "V_Ga", -3), layout)
+        self.assertEqual(parameters[layout.index(("temperature",))], self.defect_system.temperature)
+
+        table_system = DefectSystem.from_defect_table(
+            self.defect_system.to_defect_table(),
+            self.defect_system.dos,
+            self.defect_system.volume,
+            self.defect_system.temperature,
+        )
+        np.testing.assert_equal(table_system.get_parameters(), parameters)
+        updated = parameters.copy()
+        updated[layout.index(("energy", "V_Ga", -1))] += 0.2
+        updated[layout.index(("degeneracy", "V_Ga", 0))] = 3
+        updated[layout.index(("temperature",))] = 500
+        for system in (self.defect_system, table_system):
+            system.set_parameters(updated)
+            np.testing.assert_equal(system.get_parameters(), updated)
+            self.assertEqual(system.temperature, 500)
+            self.assertEqual(
+                system.defect_species_by_name("V_Ga").charge_states[0].degeneracy, 3
+            )
+        self.assertAlmostEqual(
+            table_system.get_sc_fermi()[0], self.defect_system.get_sc_fermi()[0], places=10
+        )
+        with self.assertRaises(ValueError):
+            self.defect_system.set_parameters(updated[:-1])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.defect_table import DefectTable, DefectSpeciesView
+from tests.common import example_defect_system
+
+
+class TestDefectTable(unittest.TestCase):
+    def setUp(self):
+        self.defect_species = [
+            DefectSpecies(
+                "v_O",
+                2,
+                {
+                    0: DefectChargeState(0, energy=1.0, degeneracy=2),
+                    2: DefectChargeState(2, fixed_concentration=0.1),
+                },
+                fixed_concentration=0.5,
+            ),
+            DefectSpecies("O_i", 1, {-2: DefectChargeState(-2, energy=2.0)}),
+        ]
+        self.table = DefectTable.from_defect_species(self.defect_species)
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.species_names, ("v_O", "O_i"))
+        np.testing.assert_equal(self.table.species_index, [0, 0, 1])
+        np.testing.assert_equal(self.table.charges, [0, 2, -2])
+        np.testing.assert_equal(self.table.energies, [1.0, np.nan, 2.0])
+        np.testing.assert_equal(self.table.fixed_concentrations, [np.nan, 0.1, np.nan])
+        np.testing.assert_equal(self.table.species_fixed_concentrations, [0.5, np.nan])
+        self.assertEqual(self.table.rows(1), slice(2, 3))
+
+    def test_ungrouped_species_raise(self):
+        with self.assertRaises(ValueError):
+            DefectTable(["a", "b"], [1, 1], [1, 0], [0, 0], [1.0, 1.0], [1, 1])
+
+    def test_undefined_charge_state_raises(self):
+        with self.assertRaises(ValueError):
+            DefectTable(["a"], [1], [0], [0], [np.nan], [1])
+
+    def test_views_match_defect_species(self):
+        for view, ds in zip(self.table.defect_species(), self.defect_species):
+            self.assertIsInstance(view, DefectSpecies)
+            self.assertEqual(view.as_dict(), ds.as_dict())
+            for e_fermi in (0.0, 0.5):
+                self.assertEqual(
+                    view.get_concentration(e_fermi, 300),
+                    ds.get_concentration(e_fermi, 300),
+                )
+
+    def test_views_write_to_table(self):
+        view = self.table.defect_species()[1]
+        self.assertIs(view, self.table.species_view(1))
+        version = view.version
+        view.charge_states[-2].set_energy(3.0)
+        self.assertEqual(self.table.energies[2], 3.0)
+        self.assertNotEqual(view.version, version)
+        view.fix_concentration(0.2)
+        self.assertEqual(self.table.species_fixed_concentrations[1], 0.2)
+        self.assertEqual(view.fixed_concentration, 0.2)
+        self.table.set_values("degeneracies", [2], [4])
+        self.assertEqual(view.charge_states[-2].degeneracy, 4)
+
+    def test_view_charge_states_are_read_only(self):
+        view = self.table.species_view(0)
+        with self.assertRaises(TypeError):
+            view.charge_states[1] = DefectChargeState(1, energy=1.0)  # type: ignore
+        with self.assertRaises(TypeError):
+            del view.charge_states[0]  # type: ignore
+        self.assertEqual(list(view.charge_states), [0, 2])
+
+    def test_charge_state_arrays_from_views(self):
+        views = self.table.defect_species()
+        expected = batch.charge_state_arrays(self.defect_species)
+        for arrays in (batch.charge_state_arrays(views), batch.table_arrays(self.table)):
+            for field, value in zip(expected._fields, expected):
+                np.testing.assert_equal(getattr(arrays, field), value)
+        reordered = batch.charge_state_arrays(views[::-1])
+        self.assertEqual(reordered.species_names, ("O_i", "v_O"))
+        np.testing.assert_equal(reordered.species_index, [0, 1, 1])
+        np.testing.assert_equal(reordered.charges, [-2, 0, 2])
+
+
+class TestDefectSystemFromTable(unittest.TestCase):
+    def test_round_trip_matches_defect_system(self):
+        defect_system = example_defect_system()
+        table = defect_system.to_defect_table()
+        from_table = DefectSystem.from_defect_table(
+            table, defect_system.dos, defect_system.volume, defect_system.temperature
+        )
+        self.assertTrue(
+            all(isinstance(ds, DefectSpeciesView) for ds in from_table.defect_species)
+        )
+        self.assertEqual(from_table.as_dict()["defect_species"], defect_system.as_dict()["defect_species"])
+        self.assertAlmostEqual(
+            from_table.get_sc_fermi()[0], defect_system.get_sc_fermi()[0], places=10
+        )
+        np.testing.assert_allclose(
+            from_table.solve_batch(temperature=[300, 600])["Fermi Energy"],
+            defect_system.solve_batch(temperature=[300, 600])["Fermi Energy"],
+            atol=1e-10,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import os
+import tempfile
+
+import numpy as np
+
+from py_sc_fermi.results import SweepResult, SweepWriter, label_name, sweep
+from tests.common import example_defect_system
+
+
+try:
+    import xarray  # type: ignore  # noqa: F401
+
+    xarray_available = True
+except ImportError:
+    xarray_available = False
+
+
+
+class TestSweepResult(unittest.TestCase):
+    def setUp(self):
+        self.result = SweepResult(
+            [("temperature",)],
+            ["Fermi Energy", ("V_O", 2)],
+            np.arange(9, dtype=float).reshape(3, 3),
+        )
+
+    def test_columns(self):
+        self.assertEqual(len(self.result), 3)
+        np.testing.assert_equal(self.result[("V_O", 2)], [2, 5, 8])
+        self.assertTrue(np.shares_memory(self.result["Fermi Energy"], self.result.data))
+        self.assertEqual(label_name(("V_O", 2)), "V_O 2")
+        with self.assertRaises(KeyError):
+            self.result["p0"]
+
+    def test_invalid_data_raises(self):
+        with self.assertRaises(ValueError):
+            SweepResult(["a"], ["b"], np.zeros((2, 3)))
+        with self.assertRaises(ValueError):
+            SweepResult(["a"], ["a"], np.zeros((2, 2)))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "sweep.npz")
+            self.result.save(filename)
+            loaded = SweepResult.load(filename)
+        self.assertEqual(loaded.columns, self.result.columns)
+        np.testing.assert_equal(loaded.data, self.result.data)
+
+    def test_writer_appends_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            SweepWriter(directory).write(self.result.select(slice(0, 2)))
+            writer = SweepWriter(directory)
+            writer.write(self.result.select(slice(2, 3)))
+            with self.assertRaises(ValueError):
+                writer.write(SweepResult(["a"], ["b"], np.zeros((1, 2))))
+            loaded = SweepResult.load(directory)
+        np.testing.assert_equal(loaded.data, self.result.data)
+
+    def test_to_pandas_shares_memory(self):
+        frame = self.result.to_pandas()
+        self.assertEqual(list(frame.columns), ["temperature", "Fermi Energy", "V_O 2"])
+        self.assertTrue(np.shares_memory(frame.to_numpy(), self.result.data))
+
+    @unittest.skipUnless(xarray_available, "xarray is not installed")
+    def test_to_xarray_shares_memory(self):
+        array = self.result.to_xarray()
+        self.assertEqual(array.dims, ("point", "column"))
+        self.assertTrue(np.shares_memory(array.values, self.result.data))
+
+
+class TestSweep(unittest.TestCase):
+    def test_sweep_matches_solve_batch(self):
+        defect_system = example_defect_system()
+        temperature = np.array([[300.0], [600.0]])
+        shifts = {"V_Ga": np.array([0.0, 0.1, 0.2])}
+        expected = defect_system.solve_batch(temperature=temperature, energy_shifts=shifts)
+        result = sweep(
+            defect_system, temperature=temperature, energy_shifts=shifts, decomposed=True
+        )
+        self.assertEqual(result.parameters, [("temperature",), ("energy", "V_Ga")])
+        np.testing.assert_equal(result[("energy", "V_Ga")], [0.0, 0.1, 0.2] * 2)
+        for key, value in expected.items():
+            np.testing.assert_allclose(result[key], value.ravel(), rtol=1e-10)
+        decomposed = sum(result[("V_Ga", q)] for q in defect_system.defect_species_by_name("V_Ga").charges)
+        np.testing.assert_allclose(decomposed, result["V_Ga"], rtol=1e-10)
+
+    def test_sweep_writes_chunks_to_writer(self):
+        defect_system = example_defect_system()
+        temperature = np.array([[300.0], [600.0]])
+        shifts = {"V_Ga": np.array([0.0, 0.1, 0.2])}
+        expected = sweep(defect_system, temperature=temperature, energy_shifts=shifts)
+        with tempfile.TemporaryDirectory() as directory:
+            writer = SweepWriter(directory)
+            result = sweep(
+                defect_system,
+                temperature=temperature,
+                energy_shifts=shifts,
+                chunk_size=4,
+                writer=writer,
+            )
+            self.assertIsNone(result)
+            self.assertEqual(writer.n_chunks, 2)
+            loaded = SweepResult.load(directory)
+        self.assertEqual(loaded.columns, expected.columns)
+        np.testing.assert_allclose(loaded.data, expected.data, rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+import csv
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import yaml
+
+from py_sc_fermi.cli import sc_fermi_solve
+from py_sc_fermi.cli.sc_fermi_solve import expand_inputs, output_filenames, solve_input
+from py_sc_fermi.cli import load_defect_system
+from py_sc_fermi.defect_system import DefectSystem
+from py_sc_fermi.results import SweepResult
+from tests.common import (
+    test_sc_fermi_input_filename,
+    test_unitcell_filename,
+    test_dos_filename,
+)
+
+
+class TestBatchCli(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inputs = []
+        for name in ("a", "b"):
+            path = os.path.join(self.directory.name, f"{name}.yaml")
+            open(path, "w").close()
+            self.inputs.append(path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_expand_inputs(self):
+        pattern = os.path.join(self.directory.name, "*.yaml")
+        self.assertEqual(expand_inputs([pattern]), self.inputs)
+        self.assertEqual(expand_inputs([self.directory.name, self.inputs[0]]), self.inputs)
+        self.assertEqual(expand_inputs(["missing.yaml"]), ["missing.yaml"])
+
+    def test_output_filenames(self):
+        self.assertEqual(output_filenames(self.inputs[:1]), ["py_sc_fermi_out.yaml"])
+        self.assertEqual(
+            output_filenames(self.inputs[:1], output_format="json"), ["py_sc_fermi_out.json"]
+        )
+        self.assertEqual(
+            output_filenames(self.inputs),
+            [os.path.join(self.directory.name, f"{n}_py_sc_fermi_out.yaml") for n in "ab"],
+        )
+        with self.assertRaises(ValueError):
+            output_filenames(["x/a.yaml", "y/a.yaml"], output_dir="out")
+
+    def test_solve_input_records_failures(self):
+        output = os.path.join(self.directory.name, "out.yaml")
+        summary = solve_input("missing.yaml", output, report=False)
+        self.assertEqual(summary["status"], "failed")
+        self.assertIn("missing.yaml", summary["error"])
+        self.assertFalse(os.path.exists(output))
+
+    def test_main_batch(self):
+        inputs = []
+        for name in "abc":
+            inputs.append(os.path.join(self.directory.name, f"{name}.dat"))
+            shutil.copy(test_sc_fermi_input_filename, inputs[-1])
+        open(inputs[-1], "w").close()
+        output_dir = os.path.join(self.directory.name, "out")
+        summary_file = os.path.join(self.directory.name, "summary.csv")
+        argv = [
+            "sc_fermi_solve",
+            os.path.join(self.directory.name, "*.dat"),
+            "-s",
+            test_unitcell_filename,
+            "-d",
+            test_dos_filename,
+            "-j",
+            "2",
+            "-o",
+            output_dir,
+            "--summary",
+            summary_file,
+        ]
+        with patch("sys.argv", argv), patch("sys.stdout"), patch("sys.stderr"):
+            with self.assertRaises(SystemExit) as exit:
+                sc_fermi_solve.main()
+        self.assertEqual(exit.exception.code, 1)
+        with open(summary_file) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r["status"] for r in rows], ["ok", "ok", "failed"])
+        with open(os.path.join(output_dir, "a_py_sc_fermi_out.yaml")) as f:
+            output = yaml.safe_load(f)
+        self.assertAlmostEqual(float(rows[0]["Fermi Energy"]), output["Fermi Energy"])
+        self.assertAlmostEqual(
+            float(rows[0]["V_Ga"]) / sum(output["V_Ga"].values()), 1.0, places=10
+        )
+
+    def test_solve_input_formats(self):
+        expected = load_defect_system(
+            test_sc_fermi_input_filename, test_unitcell_filename, test_dos_filename
+        ).concentration_dict(decomposed=True)
+        outputs = {}
+        for output_format in ("yaml", "json", "npz"):
+            outputs[output_format] = os.path.join(
+                self.directory.name, f"out.{output_format}"
+            )
+            with patch("sys.stdout"):
+                summary = solve_input(
+                    test_sc_fermi_input_filename,
+                    outputs[output_format],
+                    test_unitcell_filename,
+                    test_dos_filename,
+                    output_format=output_format,
+                )
+            self.assertEqual(summary["status"], "ok")
+        with open(outputs["yaml"]) as f:
+            self.assertEqual(yaml.safe_load(f)["V_Ga"], expected["V_Ga"])
+        with open(outputs["json"]) as f:
+            output = json.load(f)
+        self.assertEqual(output["Fermi Energy"], expected["Fermi Energy"])
+        self.assertEqual(output["V_Ga"]["-3"], expected["V_Ga"][-3])
+        result = SweepResult.load(outputs["npz"])
+        self.assertEqual(result[("V_Ga", -3)][0], expected["V_Ga"][-3])
+        self.assertEqual(result[("temperature",)][0], output["temperature"])
+
+    def test_solve_input_solves_once(self):
+        output = os.path.join(self.directory.name, "out.yaml")
+        with patch.object(
+            DefectSystem, "get_sc_fermi", autospec=True, side_effect=DefectSystem.get_sc_fermi
+        ) as get_sc_fermi, patch("sys.stdout") as stdout:
+            summary = solve_input(
+                test_sc_fermi_input_filename,
+                output,
+                test_unitcell_filename,
+                test_dos_filename,
+            )
+        self.assertEqual(summary["status"], "ok")
+        self.assertEqual(get_sc_fermi.call_count, 1)
+        self.assertTrue(stdout.write.called)
+
+    def test_main_quiet(self):
+        argv = [
+            "sc_fermi_solve",
+            test_sc_fermi_input_filename,
+            "-s",
+            test_unitcell_filename,
+            "-d",
+            test_dos_filename,
+            "--format",
+            "json",
+            "-q",
+            "-o",
+            self.directory.name,
+        ]
+        with patch("sys.argv", argv), patch("sys.stdout") as stdout:
+            sc_fermi_solve.main()
+        self.assertFalse(stdout.write.called)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.directory.name, "input_fermi_py_sc_fermi_out.json"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from copy import deepcopy
+
+import numpy as np
+
+from py_sc_fermi import batch
+from py_sc_fermi.defect_charge_state import DefectChargeState
+from py_sc_fermi.defect_species import DefectSpecies
+from py_sc_fermi.screening import HostCharge, screen_dopants
+from tests.common import example_defect_system
+
+
+class TestScreening(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = example_defect_system()
+        self.candidates = [
+            DefectSpecies(
+                "D_a",
+                1,
+                {
+                    0: DefectChargeState(0, energy=1.5, degeneracy=1),
+                    1: DefectChargeState(1, energy=0.6, degeneracy=2),
+                },
+            ),
+            DefectSpecies(
+                "D_b",
+                1,
+                {
+                    0: DefectChargeState(0, energy=1.2, degeneracy=1),
+                    1: DefectChargeState(1, energy=0.9, degeneracy=1),
+                },
+            ),
+            DefectSpecies(
+                "D_c",
+                1,
+                {
+                    0: DefectChargeState(0, energy=1.0, degeneracy=1),
+                    -1: DefectChargeState(-1, energy=1.1, degeneracy=1),
+                },
+                fixed_concentration=1e-5,
+            ),
+        ]
+
+    def test_host_charge_interpolation(self):
+        host = HostCharge(self.defect_system, [300, 600])
+        e_fermi = np.array([0.1234, 0.3456])
+        positive, negative = host.charge_balance(e_fermi, np.array([0, 1]))
+        exact = batch.charge_balance(
+            host.arrays, self.defect_system.dos, e_fermi, np.array([300.0, 600.0])
+        )
+        np.testing.assert_allclose(positive, exact[0], rtol=1e-5)
+        np.testing.assert_allclose(negative, exact[1], rtol=1e-5)
+
+    def test_host_charge_refine(self):
+        host = HostCharge(self.defect_system, [100, 300], chunk_size=100)
+        e_fermi = np.array([0.1234, 0.1236, 0.3456])
+        temperature_index = np.array([0, 0, 1])
+        np.testing.assert_equal(host.refine(e_fermi, temperature_index), [True, True, True])
+        np.testing.assert_equal(host.refine(e_fermi[:2], np.array([0, 1])), [False, True])
+        self.assertEqual(len(host._refined_keys), 3)
+        exact = batch.carrier_concentrations(
+            self.defect_system.dos, e_fermi, host.temperatures[temperature_index]
+        )
+        for interpolated, expected in zip(
+            host.carrier_concentrations(e_fermi, temperature_index), exact
+        ):
+            np.testing.assert_allclose(interpolated, expected, rtol=1e-9)
+
+    def test_screen_dopants_matches_full_solve(self):
+        table = screen_dopants(self.defect_system, self.candidates, temperature=[300, 900])
+        self.assertEqual(len(table["dopant"]), 6)
+        np.testing.assert_equal(table["temperature"], [300, 300, 300, 900, 900, 900])
+        for t in [300, 900]:
+            n0 = table["n0"][table["temperature"] == t]
+            self.assertTrue(np.all(np.diff(n0) <= 0))
+        host = self.defect_system.solve_batch(temperature=[300, 900])
+        for i, name in enumerate(table["dopant"]):
+            defect_system = deepcopy(self.defect_system)
+            defect_system.defect_species.append(
+                next(c for c in self.candidates if c.name == name)
+            )
+            expected = defect_system.solve_batch(temperature=table["temperature"][i])
+            self.assertAlmostEqual(
+                table["Fermi Energy"][i], float(expected["Fermi Energy"]), places=8
+            )
+            self.assertAlmostEqual(table["n0"][i] / float(expected["n0"]), 1.0, places=8)
+            self.assertAlmostEqual(
+                table["dopant concentration"][i] / float(expected[name]), 1.0, places=8
+            )
+            self.assertAlmostEqual(
+                table["Fermi Energy shift"][i],
+                table["Fermi Energy"][i]
+                - host["Fermi Energy"][int(table["temperature"][i] == 900)],
+            )
+
+    def test_screen_dopants_raises_for_unknown_rank(self):
+        with self.assertRaises(ValueError):
+            screen_dopants(self.defect_system, self.candidates, rank_by="V_Ga")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+import unittest
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+
+from py_sc_fermi.cli import load_defect_system
+from py_sc_fermi.cli.server import SolverServer
+from tests.common import (
+    test_sc_fermi_input_filename,
+    test_unitcell_filename,
+    test_dos_filename,
+    test_yaml_filename,
+)
+
+sc_fermi_request = {
+    "system": test_sc_fermi_input_filename,
+    "structure_file": test_unitcell_filename,
+    "dos_file": test_dos_filename,
+}
+
+
+class TestSolverServer(unittest.TestCase):
+    def setUp(self):
+        self.server = SolverServer(max_systems=1, convergence_tolerance=1e-18)
+
+    def test_solve(self):
+        expected = load_defect_system(
+            test_sc_fermi_input_filename,
+            test_unitcell_filename,
+            test_dos_filename,
+            convergence_tolerance=1e-18,
+        ).concentration_dict()
+        response = self.server.handle({"id": 7, "command": "solve", **sc_fermi_request})
+        self.assertEqual(response["id"], 7)
+        self.assertEqual(response["status"], "ok")
+        self.assertEqual(response["result"]["Fermi Energy"], expected["Fermi Energy"])
+        self.assertEqual(len(self.server), 1)
+
+    def test_sweep(self):
+        temperature = [300.0, 600.0]
+        response = self.server.handle(
+            {
+                "command": "sweep",
+                "temperature": temperature,
+                "energy_shifts": {"V_Ga": [0.0, 0.1], "Ga_Sb -2": 0.05},
+                **sc_fermi_request,
+            }
+        )
+        self.assertEqual(response["status"], "ok")
+        defect_system = load_defect_system(
+            test_sc_fermi_input_filename,
+            test_unitcell_filename,
+            test_dos_filename,
+            convergence_tolerance=1e-18,
+        )
+        expected = defect_system.solve_batch(
+            temperature=temperature,
+            energy_shifts={"V_Ga": [0.0, 0.1], ("Ga_Sb", -2): 0.05},
+        )
+        for key, value in expected.items():
+            np.testing.assert_allclose(response["result"][key], value, rtol=1e-12)
+
+    def test_update_modifies_resident_system(self):
+        request = {"command": "update", **sc_fermi_request}
+        first = self.server.handle({**request, "energies": {"V_Ga -3": 0.2}})
+        second = self.server.handle({**request, "temperature": 500})
+        defect_system = load_defect_system(
+            test_sc_fermi_input_filename,
+            test_unitcell_filename,
+            test_dos_filename,
+            convergence_tolerance=1e-18,
+        )
+        defect_system.defect_species_by_name("V_Ga").charge_states[-3].set_energy(0.2)
+        self.assertAlmostEqual(
+            first["result"]["Fermi Energy"], defect_system.get_sc_fermi()[0], places=8
+        )
+        defect_system.temperature = 500
+        self.assertAlmostEqual(
+            second["result"]["Fermi Energy"], defect_system.get_sc_fermi()[0], places=8
+        )
+        self.assertEqual(second["result"]["temperature"], 500)
+
+    def test_least_recently_used_system_is_evicted(self):
+        self.server.handle({"command": "solve", **sc_fermi_request})
+        self.server.handle({"command": "solve", "system": test_yaml_filename})
+        self.assertEqual(len(self.server), 1)
+        response = self.server.handle({"command": "solve", **sc_fermi_request})
+        self.assertEqual(response["status"], "ok")
+
+    def test_errors_are_reported(self):
+        for request in (
+            {"command": "melt", **sc_fermi_request},
+            {"command": "solve"},
+            {"command": "update", "energies": {"V_Ga": 0.2}, **sc_fermi_request},
+            {"command": "solve", "system": "missing.yaml"},
+        ):
+            response = self.server.handle(request)
+            self.assertEqual(response["status"], "error")
+            self.assertIn("error", response)
+        response = json.loads(self.server.handle_line("[1, 2]"))
+        self.assertEqual(response["status"], "error")
+
+    def test_serve_stream(self):
+        requests = [
+            json.dumps({"id": i, "command": "solve", **sc_fermi_request})
+            for i in range(4)
+        ]
+        outfile = StringIO()
+        self.server.serve_stream(StringIO("\n".join(requests) + "\n\n"), outfile, n_jobs=2)
+        responses = [json.loads(line) for line in outfile.getvalue().splitlines()]
+        self.assertEqual(sorted(r["id"] for r in responses), [0, 1, 2, 3])
+        self.assertTrue(all(r["status"] == "ok" for r in responses))
+
+    def test_serve_stream_bounds_requests_in_progress(self):
+        lock = threading.Lock()
+        counts = {"read": 0, "done": 0, "most_ahead": 0}
+
+        def requests():
+            for i in range(8):
+                with lock:
+                    counts["most_ahead"] = max(
+                        counts["most_ahead"], counts["read"] - counts["done"]
+                    )
+                    counts["read"] += 1
+                yield json.dumps({"id": i}) + "\n"
+
+        def slow_handle_line(line):
+            time.sleep(0.01)
+            with lock:
+                counts["done"] += 1
+            return line.strip()
+
+        outfile = StringIO()
+        with patch.object(self.server, "handle_line", side_effect=slow_handle_line):
+            self.server.serve_stream(requests(), outfile, n_jobs=2)  # type: ignore
+        self.assertEqual(len(outfile.getvalue().splitlines()), 8)
+        self.assertLessEqual(counts["most_ahead"], 2)
+        with self.assertRaises(ValueError):
+            self.server.serve_stream(StringIO(), StringIO(), n_jobs=0)
+
+    def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "solver.sock")
+            server = self.server.unix_socket_server(path)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.connect(path)
+                    stream = client.makefile("rw")
+                    for i in range(2):
+                        stream.write(
+                            json.dumps({"id": i, "command": "solve", **sc_fermi_request})
+                            + "\n"
+                        )
+                    stream.flush()
+                    responses = [json.loads(stream.readline()) for _ in range(2)]
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+        self.assertEqual([r["id"] for r in responses], [0, 1])
+        self.assertTrue(all(r["status"] == "ok" for r in responses))
+
+    def test_unix_socket_jobs(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def handle(request):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return {"id": request["id"], "status": "ok"}
+
+        def client(path, i):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(path)
+                stream = connection.makefile("rw")
+                stream.write(json.dumps({"id": i}) + "\n")
+                stream.flush()
+                stream.readline()
+
+        with tempfile.TemporaryDirectory() as directory, patch.object(
+            self.server, "handle", side_effect=handle
+        ):
+            path = os.path.join(directory, "solver.sock")
+            server = self.server.unix_socket_server(path, n_jobs=1)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                clients = [
+                    threading.Thread(target=client, args=(path, i)) for i in range(3)
+                ]
+                for c in clients:
+                    c.start()
+                for c in clients:
+                    c.join()
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+        self.assertEqual(peak[0], 1)
+        with self.assertRaises(ValueError):
+            self.server.unix_socket_server("unused.sock", n_jobs=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
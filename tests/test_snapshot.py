@@ -0,0 +1,57 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from py_sc_fermi.snapshot import SolverSnapshot
+from tests.common import example_defect_system
+
+
+class TestSolverSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = example_defect_system()
+        self.snapshot = SolverSnapshot(self.defect_system)
+
+    def test_snapshot_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.snapshot.temperature = 600
+        with self.assertRaises(AttributeError):
+            self.snapshot._volume = 1.0
+        with self.assertRaises(ValueError):
+            self.snapshot.arrays.energies[0] = 0.0
+
+    def test_snapshot_is_independent_of_defect_system(self):
+        expected = self.snapshot.solve_batch()["Fermi Energy"]
+        self.defect_system.temperature = 600
+        self.defect_system.defect_species[0].fix_concentration(1e-3)
+        np.testing.assert_equal(self.snapshot.solve_batch()["Fermi Energy"], expected)
+
+    def test_solve_batch_matches_defect_system(self):
+        temperatures = np.array([300, 600, 900])
+        expected = self.defect_system.solve_batch(temperature=temperatures)
+        results = self.snapshot.solve_batch(temperature=temperatures)
+        for key, value in expected.items():
+            np.testing.assert_allclose(results[key], value, rtol=1e-10)
+
+    def test_evaluate_matches_concentration_dict(self):
+        e_fermi = self.defect_system.get_sc_fermi()[0]
+        expected = self.defect_system.concentration_dict()
+        results = self.snapshot.evaluate(e_fermi)
+        for key, value in expected.items():
+            self.assertAlmostEqual(float(results[key]) / value, 1.0, places=8)
+
+    def test_concurrent_solves_match_serial_solves(self):
+        temperatures = np.linspace(300, 1200, 16)
+        serial = [self.snapshot.solve_batch(temperature=t)["Fermi Energy"] for t in temperatures]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            threaded = list(
+                executor.map(
+                    lambda t: self.snapshot.solve_batch(temperature=t)["Fermi Energy"],
+                    temperatures,
+                )
+            )
+        np.testing.assert_equal(threaded, serial)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import unittest
+import argparse
+import os
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import yaml
+
+from py_sc_fermi.cli import load_defect_system
+from py_sc_fermi.cli.sweep import (
+    grid,
+    main,
+    parse_chemical_potential,
+    parse_range,
+    parse_shift,
+)
+from py_sc_fermi.results import SweepResult
+from tests.common import (
+    example_defect_system,
+    test_sc_fermi_input_filename,
+    test_unitcell_filename,
+    test_dos_filename,
+    test_yaml_filename,
+)
+
+input_arguments = [
+    test_sc_fermi_input_filename,
+    "-s",
+    test_unitcell_filename,
+    "-d",
+    test_dos_filename,
+    "-c",
+    "1e-18",
+]
+
+
+class TestSweepArguments(unittest.TestCase):
+    def test_parse_range(self):
+        np.testing.assert_allclose(parse_range("300:500:100"), [300, 400, 500])
+        np.testing.assert_allclose(parse_range("0.5:0:-0.25"), [0.5, 0.25, 0.0])
+        np.testing.assert_allclose(parse_range("1,2.5"), [1, 2.5])
+        np.testing.assert_allclose(parse_range("300"), [300])
+        for text in ("300:500", "300:500:0", "500:300:100", "hot"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_range(text)
+
+    def test_parse_shift(self):
+        key, values = parse_shift("V_Ga -3=0,0.1")
+        self.assertEqual(key, ("V_Ga", -3))
+        np.testing.assert_allclose(values, [0, 0.1])
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_shift("0:1:0.1")
+
+    def test_parse_chemical_potential(self):
+        element, values = parse_chemical_potential("Ga=-0.2:0:0.1")
+        self.assertEqual(element, "Ga")
+        np.testing.assert_allclose(values, [-0.2, -0.1, 0.0])
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_chemical_potential("-0.2:0:0.1")
+
+    def test_grid(self):
+        points = grid([("a", np.array([1.0, 2.0])), ("b", np.array([3.0, 4.0, 5.0]))])
+        np.testing.assert_equal(points["a"], [1, 1, 1, 2, 2, 2])
+        np.testing.assert_equal(points["b"], [3, 4, 5, 3, 4, 5])
+
+
+class TestSweepCli(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_sweep(self, *arguments, output="sweep.npz"):
+        output = os.path.join(self.directory.name, output)
+        with patch("sys.stdout"):
+            main([*input_arguments, *arguments, "-o", output])
+        return output
+
+    def test_sweep_matches_solve_batch(self):
+        output = self.run_sweep("-t", "300:900:300", "-e", "V_Ga=0,0.1")
+        result = SweepResult.load(output)
+        self.assertEqual(result.parameters, [("temperature",), ("energy", "V_Ga")])
+        np.testing.assert_equal(result[("temperature",)], [300, 300, 600, 600, 900, 900])
+        expected = example_defect_system().solve_batch(
+            temperature=result[("temperature",)],
+            energy_shifts={"V_Ga": result[("energy", "V_Ga")]},
+        )
+        for key, value in expected.items():
+            np.testing.assert_allclose(result[key], value, rtol=1e-8)
+
+    def test_anneal_and_quench(self):
+        output = self.run_sweep(
+            "--anneal_temperature", "800,1000", "--quench_temperature", "300"
+        )
+        result = SweepResult.load(output)
+        anneal, quench = example_defect_system().solve_quench([800, 1000], 300)
+        np.testing.assert_allclose(result["Fermi Energy"], quench["Fermi Energy"], rtol=1e-8)
+        np.testing.assert_allclose(
+            result[("anneal", "Fermi Energy")], anneal["Fermi Energy"], rtol=1e-8
+        )
+
+    def test_csv_output(self):
+        output = self.run_sweep("-t", "300,600", output="sweep.csv")
+        with open(output) as f:
+            header = f.readline().strip().split(",")
+        self.assertEqual(header[:3], ["temperature", "Fermi Energy", "p0"])
+        self.assertEqual(np.loadtxt(output, delimiter=",", skiprows=1).shape[0], 2)
+
+    def test_npz_suffix_is_appended(self):
+        with patch("sys.stdout") as stdout:
+            main([*input_arguments, "-o", os.path.join(self.directory.name, "sweep")])
+        output = os.path.join(self.directory.name, "sweep.npz")
+        self.assertEqual(len(SweepResult.load(output)), 1)
+        printed = "".join(call.args[0] for call in stdout.write.call_args_list)
+        self.assertIn(output, printed)
+
+    def test_chemical_potential(self):
+        with open(test_yaml_filename) as f:
+            input_dict = yaml.safe_load(f)
+        stoichiometries = {"Ga_Sb": {"Ga": 1, "Sb": -1}, "Ga_i": {"Ga": 1}}
+        for species in input_dict["defect_species"]:
+            species["stoichiometry"] = stoichiometries.get(species["name"])
+        input_file = os.path.join(self.directory.name, "defect_system.yaml")
+        with open(input_file, "w") as f:
+            yaml.safe_dump(input_dict, f)
+        output = os.path.join(self.directory.name, "sweep.npz")
+        arguments = [
+            input_file,
+            "-s",
+            test_unitcell_filename,
+            "-d",
+            test_dos_filename,
+            "-o",
+            output,
+            "--chemical_potential",
+            "Ga=-0.2,0",
+        ]
+        with patch("sys.stdout"):
+            main([*arguments, "--chemical_potential", "Sb=-0.1,0", "-e", "Ga_Sb=0.1"])
+        result = SweepResult.load(output)
+        self.assertEqual(
+            result.parameters,
+            [
+                ("temperature",),
+                ("energy", "Ga_Sb"),
+                ("chemical_potential", "Ga"),
+                ("chemical_potential", "Sb"),
+            ],
+        )
+        defect_system = load_defect_system(
+            input_file, test_unitcell_filename, test_dos_filename
+        )
+        mu = {
+            "Ga": result[("chemical_potential", "Ga")],
+            "Sb": result[("chemical_potential", "Sb")],
+        }
+        shifts = defect_system.chemical_potential_shifts(mu)
+        shifts["Ga_Sb"] = shifts["Ga_Sb"] + 0.1
+        expected = defect_system.solve_batch(energy_shifts=shifts)
+        self.assertTrue(np.all(np.isfinite(result.data)))
+        self.assertEqual(len(set(result["Fermi Energy"])), 4)
+        for key, value in expected.items():
+            np.testing.assert_allclose(result[key], value, rtol=1e-8)
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            main(arguments)
+
+    def test_invalid_arguments(self):
+        for arguments in (
+            ["--anneal_temperature", "800"],
+            ["-t", "300", "--anneal_temperature", "800", "--quench_temperature", "300"],
+            ["-e", "V_Ga=0", "-e", "V_Ga=0.1"],
+            ["--chemical_potential", "Ga=0", "--chemical_potential", "Ga=0.1"],
+        ):
+            with patch("sys.stderr"), self.assertRaises(SystemExit):
+                main([*input_arguments, *arguments])
+
+
+if __name__ == "__main__":
+    unittest.main()
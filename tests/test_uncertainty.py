@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+from py_sc_fermi.uncertainty import (
+    percentile_bands,
+    propagate_uncertainty,
+    sample_energy_shifts,
+)
+from tests.common import example_defect_system
+
+
+class TestUncertainty(unittest.TestCase):
+    def setUp(self):
+        self.defect_system = example_defect_system()
+        self.defect_system.temperature = 600
+
+    def test_sample_energy_shifts(self):
+        shifts = sample_energy_shifts(
+            self.defect_system, {"V_Ga": 0.1, ("Ga_Sb", -1): 0.2}, 5000, seed=1
+        )
+        self.assertEqual(len(shifts), 7)
+        np.testing.assert_equal(shifts[("V_Ga", 0)], shifts[("V_Ga", -3)])
+        np.testing.assert_equal(shifts[("Ga_Sb", 0)], 0.0)
+        self.assertAlmostEqual(np.std(shifts[("Ga_Sb", -1)]), 0.2, places=2)
+        repeat = sample_energy_shifts(
+            self.defect_system, {"V_Ga": 0.1, ("Ga_Sb", -1): 0.2}, 5000, seed=1
+        )
+        np.testing.assert_equal(shifts[("V_Ga", -1)], repeat[("V_Ga", -1)])
+
+    def test_sample_correlated_energy_shifts(self):
+        shifts = sample_energy_shifts(
+            self.defect_system,
+            {"V_Ga": 0.1, "Ga_Sb": 0.1},
+            5000,
+            correlation=[[1.0, -0.9], [-0.9, 1.0]],
+            seed=0,
+        )
+        r = np.corrcoef(shifts[("V_Ga", 0)], shifts[("Ga_Sb", 0)])[0, 1]
+        self.assertAlmostEqual(r, -0.9, places=1)
+        with self.assertRaises(ValueError):
+            sample_energy_shifts(
+                self.defect_system, {"V_Ga": 0.1}, 10, correlation=np.eye(2)
+            )
+
+    def test_percentile_bands(self):
+        bands = percentile_bands({"a": np.arange(101)}, (10, 50))
+        np.testing.assert_allclose(bands["a"], [10, 50])
+
+    def test_propagate_uncertainty(self):
+        samples, bands = propagate_uncertainty(
+            self.defect_system, {"V_Ga": 0.1, "Ga_Sb": 0.1}, n_samples=200, seed=0
+        )
+        self.assertEqual(samples["Fermi Energy"].shape, (200,))
+        e_fermi = self.defect_system.get_sc_fermi()[0]
+        low, median, high = bands["Fermi Energy"]
+        self.assertLess(low, e_fermi)
+        self.assertGreater(high, e_fermi)
+        self.assertLess(low, median)
+        self.assertEqual(set(bands), set(samples))
+        threaded, _ = propagate_uncertainty(
+            self.defect_system,
+            {"V_Ga": 0.1, "Ga_Sb": 0.1},
+            n_samples=200,
+            seed=0,
+            n_jobs=2,
+        )
+        np.testing.assert_equal(threaded["Fermi Energy"], samples["Fermi Energy"])
+
+
+if __name__ == "__main__":
+    unittest.main()